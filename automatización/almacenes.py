@@ -0,0 +1,166 @@
+"""
+Almacenes (warehouses) de destino para la ingesta.
+
+Todos exponen la misma interfaz para que la lógica delta de ingestadatos.py no
+dependa de BigQuery: así puede probarse y medirse en local con SQLite o DuckDB.
+Cada tabla guarda una columna `_row_hash` (int64) con la huella de cada fila.
+"""
+import sqlite3
+
+import pandas as pd
+
+COLUMNA_HASH = "_row_hash"
+
+
+class Almacen:
+    """Interfaz común. `tabla` es el nombre lógico (sin proyecto ni dataset)."""
+
+    # ¿admite llamadas desde varios hilos a la vez? (si no, la ingesta las serializa)
+    concurrente = False
+
+    def hashes_filas(self, tabla: str) -> set[int] | None:
+        """Huellas ya cargadas; None si la tabla no existe o no tiene `_row_hash`."""
+        raise NotImplementedError
+
+    def agregar(self, tabla: str, df: pd.DataFrame):
+        """Inserta filas al final (append)."""
+        raise NotImplementedError
+
+    def eliminar_hashes(self, tabla: str, hashes: list[int]):
+        """Borra las filas cuyas huellas ya no están en el archivo."""
+        raise NotImplementedError
+
+    def reemplazar(self, tabla: str, df: pd.DataFrame):
+        """Reemplaza la tabla completa (primera carga o registro antiguo)."""
+        raise NotImplementedError
+
+
+# ===================== BigQuery =====================
+
+class AlmacenBigQuery(Almacen):
+    concurrente = True
+
+    def __init__(self, cliente, proyecto: str, conjunto: str):
+        self.cliente = cliente
+        self.prefijo = f"{proyecto}.{conjunto}"
+
+    def _ref(self, tabla: str) -> str:
+        return f"{self.prefijo}.{tabla}"
+
+    def _cargar(self, tabla: str, df: pd.DataFrame, disposicion: str):
+        from google.cloud import bigquery
+        job = self.cliente.load_table_from_dataframe(
+            df, self._ref(tabla),
+            job_config=bigquery.LoadJobConfig(write_disposition=disposicion),
+        )
+        job.result()
+
+    def hashes_filas(self, tabla):
+        from google.api_core.exceptions import NotFound
+        try:
+            esquema = self.cliente.get_table(self._ref(tabla)).schema
+        except NotFound:
+            return None
+        if COLUMNA_HASH not in {c.name for c in esquema}:
+            return None
+        filas = self.cliente.query(f"SELECT {COLUMNA_HASH} FROM `{self._ref(tabla)}`").result()
+        return {r[0] for r in filas}
+
+    def agregar(self, tabla, df):
+        self._cargar(tabla, df, "WRITE_APPEND")
+
+    def eliminar_hashes(self, tabla, hashes):
+        from google.cloud import bigquery
+        if not hashes:
+            return
+        job = self.cliente.query(
+            f"DELETE FROM `{self._ref(tabla)}` WHERE {COLUMNA_HASH} IN UNNEST(@hashes)",
+            job_config=bigquery.QueryJobConfig(query_parameters=[
+                bigquery.ArrayQueryParameter("hashes", "INT64", list(hashes)),
+            ]),
+        )
+        job.result()
+
+    def reemplazar(self, tabla, df):
+        self._cargar(tabla, df, "WRITE_TRUNCATE")
+
+
+# ===================== SQLite (local, sin dependencias) =====================
+
+class AlmacenSQLite(Almacen):
+    def __init__(self, ruta: str):
+        self.con = sqlite3.connect(ruta, check_same_thread=False)
+
+    def _columnas(self, tabla):
+        return [r[1] for r in self.con.execute(f'PRAGMA table_info("{tabla}")')]
+
+    def hashes_filas(self, tabla):
+        if COLUMNA_HASH not in self._columnas(tabla):
+            return None
+        return {r[0] for r in self.con.execute(f'SELECT {COLUMNA_HASH} FROM "{tabla}"')}
+
+    def agregar(self, tabla, df):
+        df.to_sql(tabla, self.con, if_exists="append", index=False)
+        self.con.commit()
+
+    def eliminar_hashes(self, tabla, hashes):
+        if not hashes:
+            return
+        with self.con:
+            self.con.execute("CREATE TEMP TABLE IF NOT EXISTS _borrar (h INTEGER)")
+            self.con.execute("DELETE FROM _borrar")
+            self.con.executemany("INSERT INTO _borrar VALUES (?)", [(int(h),) for h in hashes])
+            self.con.execute(f'DELETE FROM "{tabla}" WHERE {COLUMNA_HASH} IN (SELECT h FROM _borrar)')
+
+    def reemplazar(self, tabla, df):
+        df.to_sql(tabla, self.con, if_exists="replace", index=False)
+        self.con.commit()
+
+
+# ===================== DuckDB (local, opcional) =====================
+
+class AlmacenDuckDB(Almacen):
+    def __init__(self, ruta: str):
+        import duckdb   # opcional: pip install duckdb
+        self.con = duckdb.connect(ruta)
+
+    def _existe(self, tabla):
+        return bool(self.con.execute(
+            "SELECT count(*) FROM information_schema.tables WHERE table_name = ?", [tabla]
+        ).fetchone()[0])
+
+    def hashes_filas(self, tabla):
+        if not self._existe(tabla):
+            return None
+        cols = [r[0] for r in self.con.execute(f'DESCRIBE "{tabla}"').fetchall()]
+        if COLUMNA_HASH not in cols:
+            return None
+        return {r[0] for r in self.con.execute(f'SELECT {COLUMNA_HASH} FROM "{tabla}"').fetchall()}
+
+    def agregar(self, tabla, df):
+        self.con.register("_nuevas", df)
+        if self._existe(tabla):
+            self.con.execute(f'INSERT INTO "{tabla}" SELECT * FROM _nuevas')
+        else:
+            self.con.execute(f'CREATE TABLE "{tabla}" AS SELECT * FROM _nuevas')
+        self.con.unregister("_nuevas")
+
+    def eliminar_hashes(self, tabla, hashes):
+        if not hashes:
+            return
+        self.con.register("_borrar", pd.DataFrame({"h": pd.Series(list(hashes), dtype="int64")}))
+        self.con.execute(f'DELETE FROM "{tabla}" WHERE {COLUMNA_HASH} IN (SELECT h FROM _borrar)')
+        self.con.unregister("_borrar")
+
+    def reemplazar(self, tabla, df):
+        self.con.register("_nuevas", df)
+        self.con.execute(f'CREATE OR REPLACE TABLE "{tabla}" AS SELECT * FROM _nuevas')
+        self.con.unregister("_nuevas")
+
+
+def crear_almacen(tipo: str, **kwargs) -> Almacen:
+    """tipo: 'bigquery' (cliente, proyecto, conjunto), 'sqlite' o 'duckdb' (ruta)."""
+    tipos = {"bigquery": AlmacenBigQuery, "sqlite": AlmacenSQLite, "duckdb": AlmacenDuckDB}
+    if tipo not in tipos:
+        raise ValueError(f"Almacén desconocido: {tipo} (usa {', '.join(tipos)})")
+    return tipos[tipo](**kwargs)
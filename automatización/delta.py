@@ -0,0 +1,228 @@
+"""
+Ingesta delta: decide qué filas de un CSV hay que cargar comparándolo con lo
+que ya se cargó (registro_ingesta.json + huellas `_row_hash` del almacén).
+
+- Sin cambios: el sha256 del archivo coincide con el registro.
+- Solo se agregaron filas al final: los primeros `bytes` del archivo tienen el
+  mismo sha256 que la última carga -> se parsea y carga solo la cola (append).
+- Cualquier otra edición: se comparan huellas por fila (merge): se insertan las
+  filas nuevas y se borran las que desaparecieron, aunque el total no cambie.
+
+Los tipos de columna se deciden una vez por archivo (una pasada previa en texto)
+y se guardan en el registro; cada lote se convierte a esos tipos, así todos los
+lotes de una tabla tienen el mismo esquema. Si el archivo cambia el tipo de una
+columna (p. ej. aparece "Unknown" en una numérica) la tabla se recarga completa.
+
+El archivo se lee desde disco en lotes de `lote` filas: los datos en memoria
+dependen del lote y no del tamaño del archivo. El append y el merge además
+mantienen el conjunto de huellas ya cargadas, que es O(filas de la tabla).
+"""
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from almacenes import COLUMNA_HASH, Almacen
+
+LOTE_FILAS = 200_000
+_BLOQUE = 1 << 20
+
+
+def sha256_archivo(ruta: Path, limite: int | None = None) -> str:
+    """sha256 de `ruta` (o de sus primeros `limite` bytes) leyendo por bloques."""
+    h = hashlib.sha256()
+    restante = limite
+    with open(ruta, "rb") as f:
+        while restante is None or restante > 0:
+            bloque = f.read(_BLOQUE if restante is None else min(_BLOQUE, restante))
+            if not bloque:
+                break
+            h.update(bloque)
+            if restante is not None:
+                restante -= len(bloque)
+    return h.hexdigest()
+
+def _normalizar_columnas(cols) -> list[str]:
+    return [c.strip().lower().replace(" ", "_") for c in cols]
+
+_ORDEN_TIPOS = ["int64", "float64", "str"]
+
+def _tipo_columna(texto: pd.Series) -> str:
+    """Tipo más estrecho que admite todos los valores (en texto) de la columna."""
+    num = pd.to_numeric(texto, errors="coerce")
+    if num.isna().sum() > texto.isna().sum():
+        return "str"                    # hay algún valor no numérico
+    if texto.isna().any() or (num.dropna() % 1 != 0).any():
+        return "float64"
+    return "int64"
+
+def _lotes_texto(ruta: Path, desde_byte: int = 0, lote: int = LOTE_FILAS):
+    """Lotes del CSV con todo en texto y columnas normalizadas."""
+    columnas = _normalizar_columnas(pd.read_csv(ruta, nrows=0).columns)
+    with open(ruta, "rb") as f:
+        if desde_byte:
+            f.seek(desde_byte)
+            lector = pd.read_csv(f, dtype=str, header=None, names=columnas, chunksize=lote)
+        else:
+            lector = pd.read_csv(f, dtype=str, chunksize=lote)
+        for df in lector:
+            df.columns = columnas
+            yield df
+
+def tipos_archivo(ruta: Path, desde_byte: int = 0, lote: int = LOTE_FILAS,
+                  base: dict[str, str] | None = None) -> dict[str, str]:
+    """
+    Primera pasada: decide el tipo de cada columna para todo el archivo (o solo
+    la cola desde `desde_byte`). Con `base` parte de tipos ya decididos y solo
+    los ensancha (int64 -> float64 -> str).
+    """
+    tipos = dict(base or {})
+    for df in _lotes_texto(ruta, desde_byte, lote):
+        for c in df.columns:
+            t = _tipo_columna(df[c])
+            if c not in tipos or _ORDEN_TIPOS.index(t) > _ORDEN_TIPOS.index(tipos[c]):
+                tipos[c] = t
+    return tipos
+
+def _tipar(df: pd.DataFrame, tipos: dict[str, str]) -> pd.DataFrame:
+    for c in df.columns:
+        if tipos.get(c, "str") != "str":
+            df[c] = pd.to_numeric(df[c]).astype(tipos[c])
+    return df
+
+def leer_lotes(ruta: Path, tipos: dict[str, str], desde_byte: int = 0, lote: int = LOTE_FILAS):
+    """
+    Itera (df tipado, huella base por fila) en lotes. Cada lote se convierte a
+    `tipos` (de tipos_archivo), no a lo que pandas infiera en ese lote. La huella
+    se calcula sobre el texto de cada campo. `desde_byte` > 0 lee solo la cola
+    del archivo (append).
+    """
+    for df in _lotes_texto(ruta, desde_byte, lote):
+        base = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        yield _tipar(df, tipos), base
+
+def _combinar(base: np.ndarray, n: np.ndarray) -> np.ndarray:
+    par = pd.DataFrame({"h": base, "n": n.astype("uint64")})
+    return pd.util.hash_pandas_object(par, index=False).to_numpy().view("int64")
+
+
+class Apariciones:
+    """
+    Huella final por fila = (contenido, n° de aparición), para distinguir filas
+    idénticas. Lleva la cuenta entre lotes; con `ocupados` (huellas ya cargadas
+    en el almacén, caso append) las apariciones continúan desde las existentes.
+    """
+
+    def __init__(self, ocupados: set[int] | None = None):
+        self.conteo: dict[int, int] = {}
+        self.ocupados = (np.fromiter(ocupados, dtype="int64", count=len(ocupados))
+                         if ocupados else None)
+
+    def _sondear(self, uniq: np.ndarray) -> np.ndarray:
+        offset = np.zeros(len(uniq), dtype="int64")
+        pendiente = np.ones(len(uniq), dtype=bool)
+        while pendiente.any():
+            idx = np.flatnonzero(pendiente)
+            choca = np.isin(_combinar(uniq[idx], offset[idx]), self.ocupados)
+            offset[idx[choca]] += 1
+            pendiente[idx[~choca]] = False
+        return offset
+
+    def huellas(self, base: np.ndarray) -> np.ndarray:
+        uniq, inversa, cuenta = np.unique(base, return_inverse=True, return_counts=True)
+        previo = pd.Series(uniq).map(self.conteo)
+        offset = previo.fillna(0).to_numpy(dtype="int64")
+        nuevos = previo.isna().to_numpy()
+        if self.ocupados is not None and nuevos.any():
+            offset[nuevos] = self._sondear(uniq[nuevos])
+        n = offset[inversa] + pd.Series(base).groupby(base).cumcount().to_numpy()
+        self.conteo.update(zip(uniq.tolist(), (offset + cuenta).tolist()))
+        return _combinar(base, n)
+
+
+def _es_append(ruta: Path, tamano: int, previo: dict) -> bool:
+    corte = previo.get("bytes", 0)
+    return (
+        0 < corte < tamano
+        and previo.get("termina_en_salto", False)
+        and sha256_archivo(ruta, corte) == previo.get("hash")
+    )
+
+def _termina_en_salto(ruta: Path, tamano: int) -> bool:
+    if tamano == 0:
+        return False
+    with open(ruta, "rb") as f:
+        f.seek(tamano - 1)
+        return f.read(1) == b"\n"
+
+def aplicar_delta(almacen: Almacen, tabla: str, ruta: Path, previo: dict | None,
+                  lote: int = LOTE_FILAS) -> tuple[dict, str]:
+    """
+    Carga en `almacen` solo lo que cambió en el CSV `ruta`. Devuelve (nueva
+    entrada del registro, descripción de la acción).
+    """
+    ruta = Path(ruta)
+    if not isinstance(previo, dict):
+        previo = None          # registro antiguo (solo conteo de filas) o archivo nuevo
+    tamano = ruta.stat().st_size
+    sha = sha256_archivo(ruta)
+    if previo and previo.get("hash") == sha:
+        return previo, "sin cambios"
+
+    filas = None
+    accion = None
+    tipos_previos = (previo or {}).get("tipos")
+    if previo and tipos_previos and _es_append(ruta, tamano, previo):
+        tipos = tipos_archivo(ruta, previo["bytes"], lote, base=tipos_previos)
+        existentes = almacen.hashes_filas(tabla) if tipos == tipos_previos else None
+        if existentes is not None:
+            apariciones = Apariciones(existentes)
+            nuevas = 0
+            for df, base in leer_lotes(ruta, tipos, desde_byte=previo["bytes"], lote=lote):
+                df[COLUMNA_HASH] = apariciones.huellas(base)
+                almacen.agregar(tabla, df)
+                nuevas += len(df)
+            filas = previo.get("filas", 0) + nuevas
+            accion = f"append de {nuevas} filas nuevas"
+
+    if accion is None:
+        tipos = tipos_archivo(ruta, lote=lote)
+        # con otro esquema (o uno desconocido) no se puede agregar a la tabla: se recarga
+        existentes = almacen.hashes_filas(tabla) if tipos == tipos_previos else None
+        apariciones = Apariciones()
+        insertadas = 0
+        filas = 0
+        for i, (df, base) in enumerate(leer_lotes(ruta, tipos, lote=lote)):
+            df[COLUMNA_HASH] = apariciones.huellas(base)
+            filas += len(df)
+            if existentes is None:
+                # carga completa: el primer lote reemplaza la tabla, el resto se agrega
+                (almacen.reemplazar if i == 0 else almacen.agregar)(tabla, df)
+                continue
+            huellas = df[COLUMNA_HASH].tolist()
+            ya_cargada = np.fromiter((h in existentes for h in huellas), dtype=bool, count=len(huellas))
+            # cada huella es única en el archivo: lo visto se quita de `existentes`
+            # y al final quedan solo las filas que desaparecieron
+            existentes.difference_update(huellas)
+            nuevas = df[~ya_cargada]
+            if len(nuevas):
+                almacen.agregar(tabla, nuevas)
+                insertadas += len(nuevas)
+        if existentes is None:
+            accion = f"carga completa de {filas} filas"
+        else:
+            almacen.eliminar_hashes(tabla, list(existentes))
+            accion = f"merge: {insertadas} filas nuevas/modificadas, {len(existentes)} eliminadas"
+
+    entrada = {
+        "tabla": tabla,
+        "bytes": tamano,
+        "hash": sha,
+        "filas": filas,
+        "tipos": tipos,
+        "termina_en_salto": _termina_en_salto(ruta, tamano),
+        "actualizado": datetime.now().isoformat(timespec="seconds"),
+    }
+    return entrada, accion
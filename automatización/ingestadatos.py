@@ -1,80 +1,141 @@
-from pydrive2.auth import GoogleAuth
-from pydrive2.drive import GoogleDrive
-from google.cloud import bigquery
-import pandas as pd
-import json, io, os, datetime
+import argparse
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from pathlib import Path
+
+from almacenes import crear_almacen
+from delta import LOTE_FILAS, aplicar_delta
 
 # -----------------------------
 # CONFIGURACIÓN
 # -----------------------------
 CARPETA_ID = "1gCiGcKsAhE5M3qJeQzk3c0VZDNQYZqkT"    # Carpeta en Drive con los CSV
-ARCHIVO_LOG = "registro_ingesta.json"               # Registro de última fila cargada por archivo
+ARCHIVO_LOG = "registro_ingesta.json"               # Registro por archivo: bytes, hash y filas cargadas
 PROYECTO_ID = "cedar-freedom-437421-h8"             # ID del proyecto en Google Cloud
 CONJUNTO_DATOS = "inventory"                        # Dataset en BigQuery
 RUTA_CREDENCIALES = "key.json"                      # Credenciales de Service Account
+HILOS = 4                                           # Descargas/cargas simultáneas
 # -----------------------------
 
-# Autenticación con Google Drive
-autenticacion = GoogleAuth()
-autenticacion.LocalWebserverAuth()
-drive = GoogleDrive(autenticacion)
 
-# Cliente de BigQuery
-cliente_bq = bigquery.Client.from_service_account_json(RUTA_CREDENCIALES, project=PROYECTO_ID)
-
-# Cargar log de filas ya procesadas
-if os.path.exists(ARCHIVO_LOG):
-    with open(ARCHIVO_LOG, "r") as f:
-        registro = json.load(f)
-else:
-    registro = {}
-
-# Listar archivos CSV en la carpeta de Drive
-archivos = drive.ListFile({'q': f"'{CARPETA_ID}' in parents and trashed=false"}).GetList()
-
-for archivo in archivos:
-    if not archivo['title'].endswith(".csv"):
-        continue
-
-    archivo_id = archivo['id']
-    nombre_archivo = archivo['title']
+def cargar_registro(ruta: str) -> dict:
+    if os.path.exists(ruta):
+        with open(ruta, "r") as f:
+            return json.load(f)
+    return {}
+
+def guardar_registro(ruta: str, registro: dict):
+    # escritura atómica: nunca queda un registro a medias
+    tmp = f"{ruta}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(registro, f, indent=2)
+    os.replace(tmp, ruta)
+
+def archivos_drive():
+    """
+    (id, nombre, descargar) por cada CSV de la carpeta. `descargar(destino)`
+    baja el archivo por bloques directo a disco (sin pasar por un string).
+    """
+    from pydrive2.auth import GoogleAuth
+    from pydrive2.drive import GoogleDrive
+
+    # Autenticación con Google Drive
+    autenticacion = GoogleAuth()
+    autenticacion.LocalWebserverAuth()
+    drive = GoogleDrive(autenticacion)
+
+    def descargar(archivo, destino: Path) -> Path:
+        ruta = destino / archivo['title']
+        archivo.GetContentFile(str(ruta))
+        return ruta
+
+    # Listar archivos CSV en la carpeta de Drive
+    archivos = drive.ListFile({'q': f"'{CARPETA_ID}' in parents and trashed=false"}).GetList()
+    for archivo in archivos:
+        if not archivo['title'].endswith(".csv"):
+            continue
+        yield archivo['id'], archivo['title'], lambda destino, a=archivo: descargar(a, destino)
+
+def archivos_locales(carpeta: Path):
+    """Igual que archivos_drive pero desde una carpeta local (pruebas y benchmarks)."""
+    for ruta in sorted(carpeta.glob("*.csv")):
+        yield ruta.name, ruta.name, lambda destino, r=ruta: r
+
+def crear_destino(tipo: str, ruta_db: str):
+    if tipo == "bigquery":
+        from google.cloud import bigquery
+        cliente_bq = bigquery.Client.from_service_account_json(RUTA_CREDENCIALES, project=PROYECTO_ID)
+        return crear_almacen("bigquery", cliente=cliente_bq, proyecto=PROYECTO_ID, conjunto=CONJUNTO_DATOS)
+    return crear_almacen(tipo, ruta=ruta_db)
+
+def procesar_archivo(almacen, candado, archivo_id, nombre_archivo, descargar, previo, lote):
+    """Descarga a un temporal, aplica el delta y mide el throughput de cada fase."""
     nombre_tabla = nombre_archivo.replace(".csv", "").lower()  # Nombre de tabla = nombre del archivo
-
-    print(f"🔍 Revisando archivo: {nombre_archivo} → tabla: {nombre_tabla}")
-
-    # Descargar contenido del archivo desde Drive
-    contenido = archivo.GetContentString()
-    df = pd.read_csv(io.StringIO(contenido))
-
-    # Normalizar nombres de columnas
-    df.columns = [c.strip().lower().replace(" ", "_") for c in df.columns]
-
-    # Revisar cuántas filas ya cargamos
-    filas_previas = registro.get(archivo_id, 0)
-
-    if len(df) != filas_previas:
-        print(f"🔄 Cambios detectados en {nombre_archivo} (antes {filas_previas} filas, ahora {len(df)})")
-
-        # Reemplazar tabla completa en BigQuery
-        tabla_ref = f"{PROYECTO_ID}.{CONJUNTO_DATOS}.{nombre_tabla}"
-
-        job = cliente_bq.load_table_from_dataframe(
-            df,
-            tabla_ref,
-            job_config=bigquery.LoadJobConfig(
-                write_disposition="WRITE_TRUNCATE"  # Sobrescribir tabla completa
-            )
-        )
-        job.result()  # Esperar a que termine
-        print(f"✅ Tabla {tabla_ref} actualizada con {len(df)} filas")
-
-        # Actualizar registro
-        registro[archivo_id] = len(df)
-    else:
-        print(f"⏩ Sin cambios detectados en {nombre_archivo}")
-
-# Guardar log actualizado
-with open(ARCHIVO_LOG, "w") as f:
-    json.dump(registro, f, indent=2)
-
-print(f"[{datetime.datetime.now()}] Ingesta finalizada ✅")
+    destino = Path(tempfile.mkdtemp(prefix="ingesta_"))
+    try:
+        t0 = time.perf_counter()
+        ruta = descargar(destino)
+        t1 = time.perf_counter()
+        with candado:
+            entrada, accion = aplicar_delta(almacen, nombre_tabla, ruta, previo, lote)
+        t2 = time.perf_counter()
+        mb = ruta.stat().st_size / 1e6
+    finally:
+        shutil.rmtree(destino, ignore_errors=True)
+    metricas = {"mb": mb, "descarga_s": t1 - t0, "carga_s": t2 - t1}
+    return archivo_id, nombre_archivo, nombre_tabla, entrada, accion, metricas
+
+def main(almacen_tipo: str = "bigquery", ruta_db: str = "ingesta.db",
+         carpeta_local: str | None = None, archivo_log: str = ARCHIVO_LOG,
+         hilos: int = HILOS, lote: int = LOTE_FILAS):
+    almacen = crear_destino(almacen_tipo, ruta_db)
+    registro = cargar_registro(archivo_log)
+    fuentes = archivos_locales(Path(carpeta_local)) if carpeta_local else archivos_drive()
+    # los almacenes locales no admiten hilos: se descargan en paralelo pero se cargan de a uno
+    candado = nullcontext() if almacen.concurrente else threading.Lock()
+
+    inicio = time.perf_counter()
+    total_mb = 0.0
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        futuros = []
+        for archivo_id, nombre_archivo, descargar in fuentes:
+            print(f"🔍 Revisando archivo: {nombre_archivo}")
+            futuros.append(pool.submit(procesar_archivo, almacen, candado, archivo_id,
+                                       nombre_archivo, descargar, registro.get(archivo_id), lote))
+        for futuro in as_completed(futuros):
+            archivo_id, nombre_archivo, nombre_tabla, entrada, accion, m = futuro.result()
+            if accion == "sin cambios":
+                print(f"⏩ Sin cambios detectados en {nombre_archivo}")
+            else:
+                print(f"✅ Tabla {nombre_tabla}: {accion}")
+            print(f"   📦 {m['mb']:.1f} MB | descarga {m['descarga_s']:.2f}s "
+                  f"({m['mb'] / max(m['descarga_s'], 1e-9):.1f} MB/s) | "
+                  f"carga {m['carga_s']:.2f}s ({m['mb'] / max(m['carga_s'], 1e-9):.1f} MB/s)")
+            total_mb += m["mb"]
+            # solo este hilo escribe el registro, y siempre de forma atómica
+            registro[archivo_id] = entrada
+            guardar_registro(archivo_log, registro)
+
+    duracion = time.perf_counter() - inicio
+    print(f"[{datetime.datetime.now()}] Ingesta finalizada ✅ "
+          f"({total_mb:.1f} MB en {duracion:.2f}s, {total_mb / max(duracion, 1e-9):.1f} MB/s)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingesta delta Drive -> almacén")
+    parser.add_argument("--almacen", choices=["bigquery", "sqlite", "duckdb"], default="bigquery",
+                        help="destino de la carga (sqlite/duckdb para pruebas locales)")
+    parser.add_argument("--db", default="ingesta.db", help="archivo de base local (sqlite/duckdb)")
+    parser.add_argument("--carpeta-local", default=None,
+                        help="lee los CSV de esta carpeta en lugar de Google Drive")
+    parser.add_argument("--registro", default=ARCHIVO_LOG, help="archivo JSON de registro")
+    parser.add_argument("--hilos", type=int, default=HILOS, help="archivos en paralelo")
+    parser.add_argument("--lote", type=int, default=LOTE_FILAS, help="filas por lote al cargar")
+    args = parser.parse_args()
+    main(args.almacen, args.db, args.carpeta_local, args.registro, args.hilos, args.lote)
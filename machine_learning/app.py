@@ -4,6 +4,16 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_squared_error
 from sklearn.model_selection import train_test_split
 import numpy as np
+from pathlib import Path
+
+from global_forecast import GlobalForecaster
+from model_registry import ModelRegistry
+from sales_index import SalesIndex
+from upload_loader import PURCHASES_FILE, SALES_FILE, fingerprint, load_uploaded_files
+
+# Hiperparámetros de los modelos y caché de modelos entrenados
+RF_PARAMS = {'n_estimators': 100, 'random_state': 42}
+MODEL_CACHE_DIR = Path(__file__).parent / '.model_cache'
 
 # Configuración de la página de Streamlit
 st.set_page_config(layout="wide")
@@ -11,73 +21,71 @@ st.set_page_config(layout="wide")
 st.title('🛒 Optimización de Inventario para Licores Andinos')
 st.markdown('---')
 
-@st.cache_data
-def load_and_process_data(uploaded_files):
+@st.cache_resource(max_entries=2)
+def load_and_process_data(files_key, _uploaded_files):
     """
-    Carga, combina y procesa los archivos CSV subidos para ventas y compras.
+    Carga, combina y procesa los archivos subidos (CSV o parquet, en partes)
+    para ventas y compras. La caché se indexa con files_key (nombre/tamaño de
+    cada archivo) en vez de hashear todo el contenido en cada rerun.
     Devuelve los DataFrames procesados o un mensaje de error.
     """
-    if not uploaded_files:
+    if not _uploaded_files:
         return None, None, "No se han subido archivos."
 
-    dataframes = {}
-    for file in uploaded_files:
-        df_name = file.name.rsplit('_part', 1)[0] if '_part' in file.name else file.name.split('.')[0]
-        if df_name not in dataframes:
-            dataframes[df_name] = []
-        try:
-            dataframes[df_name].append(pd.read_csv(file))
-        except Exception as e:
-            return None, None, f"Error al leer el archivo CSV '{file.name}': {e}"
-        
-    final_dfs = {}
-    for name, df_list in dataframes.items():
-        final_dfs[name] = pd.concat(df_list, ignore_index=True)
+    try:
+        final_dfs = load_uploaded_files(_uploaded_files)
+    except Exception as e:
+        return None, None, f"Error al leer los archivos subidos: {e}"
 
-    sales_df = final_dfs.get('SalesFINAL12312016')
-    purchases_df = final_dfs.get('PurchasesFINAL12312016')
+    sales_df = final_dfs.get(SALES_FILE)
+    purchases_df = final_dfs.get(PURCHASES_FILE)
 
     if sales_df is None:
-        return None, None, "Se requiere el archivo 'SalesFINAL12312016'."
+        return None, None, f"Se requiere el archivo '{SALES_FILE}'."
     if purchases_df is None:
-        return None, None, "Se requiere el archivo 'PurchasesFINAL12312016'."
+        return None, None, f"Se requiere el archivo '{PURCHASES_FILE}'."
 
-    # Procesar el DataFrame de Ventas
-    try:
-        if 'VendorNo' in sales_df.columns:
-            sales_df.rename(columns={'VendorNo': 'VendorNumber'}, inplace=True)
-        if 'SalesDate' in sales_df.columns:
-            sales_df['SalesDate'] = pd.to_datetime(sales_df['SalesDate'], errors='coerce')
-            sales_df.dropna(subset=['SalesDate'], inplace=True)
-    except Exception as e:
-        return None, None, f"Error al procesar los datos de Ventas: {e}"
-
-    # Procesar el DataFrame de Compras
-    try:
-        if 'PODate' in purchases_df.columns:
-            purchases_df.rename(columns={'PODate': 'PODate'}, inplace=True)
-        if 'PODate' in purchases_df.columns:
-            purchases_df['PODate'] = pd.to_datetime(purchases_df['PODate'], errors='coerce')
-            purchases_df.dropna(subset=['PODate'], inplace=True)
-    except Exception as e:
-        return None, None, f"Error al procesar los datos de Compras: {e}"
+    # Las fechas ya vienen parseadas con formato fijo; solo se descartan las inválidas
+    if 'SalesDate' in sales_df.columns:
+        sales_df = sales_df.dropna(subset=['SalesDate']).reset_index(drop=True)
+    if 'PODate' in purchases_df.columns:
+        purchases_df = purchases_df.dropna(subset=['PODate']).reset_index(drop=True)
 
     return sales_df, purchases_df, "Datos cargados y listos."
 
+@st.cache_resource
+def get_model_registry():
+    """Un solo registro de modelos compartido por todas las sesiones."""
+    return ModelRegistry(MODEL_CACHE_DIR)
+
+@st.cache_resource(max_entries=2)
+def get_sales_index(dataset_key, _sales_df):
+    """Índice marca × día, construido una vez por dataset (dataset_key identifica los archivos)."""
+    return SalesIndex(_sales_df)
+
+@st.cache_resource(max_entries=2)
+def get_global_forecaster(dataset_key, _sales_index):
+    """Modelo global tienda × marca, entrenado una vez por dataset (y guardado en el registro)."""
+    return GlobalForecaster(_sales_index, get_model_registry())
+
+registry = get_model_registry()
+
 # Interfaz de usuario para la carga de archivos
-st.sidebar.header('Sube tus archivos CSV')
+st.sidebar.header('Sube tus archivos CSV o parquet')
 uploaded_files = st.sidebar.file_uploader(
-    "Selecciona todas las partes de tus archivos CSV", 
-    type="csv", 
+    "Selecciona todas las partes de tus archivos CSV o parquet", 
+    type=["csv", "parquet"], 
     accept_multiple_files=True
 )
 
-sales_data, purchases_data, status_message = load_and_process_data(uploaded_files)
+files_key = fingerprint(uploaded_files)
+sales_data, purchases_data, status_message = load_and_process_data(files_key, uploaded_files)
 
 if sales_data is None:
     st.warning(status_message)
 else:
     st.sidebar.success(status_message)
+    sales_index = get_sales_index(files_key, sales_data)
     st.header('🧹 Paso 1: Datos Listos')
     st.write('Vista previa del DataFrame de Ventas:')
     st.write(sales_data.head())
@@ -88,8 +96,7 @@ else:
     st.header('📈 Paso 2: Pronóstico de Demanda de la Empresa')
     try:
         # Agrupar por fecha para un pronóstico realista de ventas totales
-        df_model = sales_data.copy()
-        df_model = df_model.groupby('SalesDate')['SalesDollars'].sum().reset_index()
+        df_model = sales_index.company_series('SalesDollars')
 
         df_model['month'] = df_model['SalesDate'].dt.month
         df_model['day_of_week'] = df_model['SalesDate'].dt.dayofweek
@@ -103,8 +110,7 @@ else:
         y = df_model[target]
         
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        rf_model = RandomForestRegressor(n_estimators=100, random_state=42)
-        rf_model.fit(X_train, y_train)
+        rf_model = registry.fit(RandomForestRegressor, RF_PARAMS, X_train, y_train)
         y_pred = rf_model.predict(X_test)
         rmse = np.sqrt(mean_squared_error(y_test, y_pred))
         st.success('Modelo de pronóstico de ventas de la empresa entrenado.')
@@ -130,7 +136,7 @@ else:
         num_days_to_predict = period_days[projection_period]
 
         # Crear un DataFrame para pronosticar
-        last_date = sales_data['SalesDate'].max()
+        last_date = sales_index.dates[-1]
         future_dates = pd.date_range(start=last_date, periods=num_days_to_predict + 1, freq='D')[1:]
         
         # Crear un DataFrame para la predicción futura
@@ -156,7 +162,7 @@ else:
     st.header('⚙️ Paso 3: Punto de Reorden Predictivo por Marca')
     try:
         # Mapear números de marca a descripciones para una mejor visualización en el filtro
-        brand_map = sales_data.set_index('Brand')['Description'].to_dict()
+        brand_map = sales_index.descriptions
         available_brands = list(brand_map.keys())
         brand_descriptions = [brand_map.get(b, f"Marca {b}") for b in available_brands]
 
@@ -166,30 +172,10 @@ else:
         if selected_brand:
             st.write(f"Pronosticando ventas para la marca: **{selected_description}**")
             
-            # Preparar datos para el modelo de series de tiempo de la marca seleccionada
-            brand_df = sales_data[sales_data['Brand'] == selected_brand].copy()
-            brand_df = brand_df.groupby('SalesDate')['SalesQuantity'].sum().reset_index()
-            brand_df['month'] = brand_df['SalesDate'].dt.month
-            brand_df['day_of_week'] = brand_df['SalesDate'].dt.dayofweek
-            
-            features_brand = ['month', 'day_of_week']
-            target_brand = 'SalesQuantity'
-            
-            # Entrenar el modelo
-            rf_brand_model = RandomForestRegressor(n_estimators=100, random_state=42)
-            rf_brand_model.fit(brand_df[features_brand], brand_df[target_brand])
-
-            # Usar las mismas fechas de pronóstico que el pronóstico de demanda de la empresa
-            # Asegura que ambos pronósticos están alineados en el tiempo.
-            future_dates_brand = pd.date_range(start=sales_data['SalesDate'].max(), periods=8, freq='D')[1:]
-            
-            future_df_brand = pd.DataFrame({'SalesDate': future_dates_brand})
-            future_df_brand['month'] = future_df_brand['SalesDate'].dt.month
-            future_df_brand['day_of_week'] = future_df_brand['SalesDate'].dt.dayofweek
-            
-            # Predecir las ventas futuras
-            predicted_quantities = rf_brand_model.predict(future_df_brand[features_brand])
-            future_df_brand['Predicted_SalesQuantity'] = predicted_quantities
+            # Un solo modelo para todas las series: la marca es un predict sobre filas ya calculadas
+            with st.spinner('Entrenando el modelo global de demanda...'):
+                forecaster = get_global_forecaster(files_key, sales_index)
+            future_df_brand = forecaster.brand_forecast(selected_brand)
 
             st.write('Ventas diarias pronosticadas (unidades) para la próxima semana:')
             st.dataframe(future_df_brand[['SalesDate', 'Predicted_SalesQuantity']])
@@ -205,3 +191,17 @@ else:
             
     except Exception as e:
         st.error(f"Error en el cálculo del Punto de Reorden Predictivo. Error: {e}")
+
+# Estadísticas del caché de modelos
+stats = registry.resumen()
+st.sidebar.markdown('---')
+st.sidebar.subheader('🧠 Caché de modelos')
+st.sidebar.write(
+    f"Hits: {stats['hits_memoria']} memoria / {stats['hits_disco']} disco · "
+    f"Misses: {stats['misses']} · Tasa de acierto: {stats['hit_rate']:.0%}"
+)
+st.sidebar.write(
+    f"En memoria: {stats['modelos_memoria']} modelos ({stats['mb_memoria']:.1f} MB) · "
+    f"En disco: {stats['modelos_disco']} ({stats['mb_disco']:.1f} MB) · "
+    f"Desalojados: {stats['desalojados']}"
+)
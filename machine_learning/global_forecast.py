@@ -0,0 +1,270 @@
+"""
+Modelo global de demanda: un solo modelo para todas las series tienda × marca.
+
+En vez de un RandomForest por marca entrenado solo con mes y día de la semana,
+se arma una tabla de variables para todas las series a la vez a partir del
+índice de ventas (SalesIndex):
+
+- rezagos: último día, mismo día de la semana anterior y de hace dos semanas;
+- medias y desvíos móviles (7 y 28 días) de la serie y de la marca completa;
+- días desde la última venta;
+- precio medio de 28 días y su relación con el precio histórico de la serie;
+- calendario del día pronosticado (día de la semana, mes, día del mes).
+
+Todas salen de sumas acumuladas sobre la matriz serie × día (un corte por
+fila y origen, sin recorrer series en Python); solo se itera por bloques de
+series para acotar la memoria. El modelo predice directo el día t + h
+(h = 1..HORIZON es una variable más), así que el pronóstico de una marca es un
+predict sobre filas ya calculadas (origen = último día) sumado por tienda.
+
+Uso (compara con el enfoque por marca de la app: tiempo, memoria y MAE):
+    python machine_learning/global_forecast.py SalesFINAL12312016.csv [--brands 50]
+"""
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingRegressor
+
+HORIZON = 7                 # días pronosticados por origen
+WINDOWS = (7, 28)
+MAX_TRAIN_ROWS = 300_000    # filas (serie, origen, h) muestreadas para entrenar
+CHUNK_SERIES = 5_000        # series por bloque al calcular variables
+# pérdida Poisson (conteos, muchos ceros) con hojas grandes: sin regularizar, pocas filas con ventas
+# dan hojas con predicciones absurdas
+GB_PARAMS = {'loss': 'poisson', 'max_iter': 200, 'learning_rate': 0.05, 'min_samples_leaf': 200,
+             'l2_regularization': 1.0, 'random_state': 42}
+RF_PARAMS = {'n_estimators': 100, 'random_state': 42}     # los del modelo por marca de app.py
+
+FEATURES = ['horizon', 'lag_1', 'lag_week', 'lag_2weeks',
+            'mean_7', 'mean_28', 'std_7', 'std_28', 'days_since_sale',
+            'brand_mean_7', 'brand_mean_28', 'price_28', 'price_ratio',
+            'day_of_week', 'month', 'day']
+
+
+def _cumsum(matrix: np.ndarray) -> np.ndarray:
+    """Suma acumulada por fila con una columna de ceros al inicio (cum[:, t + 1] = suma hasta t)."""
+    out = np.zeros((matrix.shape[0], matrix.shape[1] + 1))
+    np.cumsum(matrix, axis=1, out=out[:, 1:])
+    return out
+
+def _window(cum: np.ndarray, rows: np.ndarray, t: np.ndarray, w: int) -> np.ndarray:
+    """Suma de los `w` días que terminan en t (incluido) para cada (fila, t)."""
+    return cum[rows, t + 1] - cum[rows, np.maximum(t + 1 - w, 0)]
+
+def _lag(matrix: np.ndarray, rows: np.ndarray, day: np.ndarray) -> np.ndarray:
+    return np.where(day >= 0, matrix[rows, np.maximum(day, 0)], np.nan)
+
+
+class GlobalFeatures:
+    """Matrices acumuladas de todas las series tienda × marca de un SalesIndex."""
+
+    def __init__(self, index):
+        if index.store_brand is None:
+            raise ValueError("El modelo global necesita la columna 'Store' en las ventas")
+        self.index = index
+        self.n_series, self.n_days = index.store_brand.shape
+        self.pair_brand = index.pair_brand
+        # primer día con ventas de cada serie (las filas nunca están vacías)
+        qty = index.store_brand
+        self.first = np.minimum.reduceat(qty.indices, qty.indptr[:-1]) if qty.nnz else np.zeros(0, dtype='int64')
+        self.brand_cum = _cumsum(index.quantity)
+
+    def _calendar(self, day: np.ndarray) -> dict:
+        """Calendario de días que pueden caer después del último día del índice."""
+        dates = self.index.dates[0] + pd.to_timedelta(day, unit='D')
+        return {'day_of_week': dates.dayofweek, 'month': dates.month, 'day': dates.day}
+
+    def rows(self, series: np.ndarray, origin: np.ndarray, horizon: np.ndarray,
+             with_target: bool = False):
+        """
+        Variables de cada fila (serie, origen, h): solo se usan datos hasta el
+        origen. Con with_target devuelve también las unidades del día origen + h.
+        """
+        out = np.empty((len(series), len(FEATURES)), dtype='float32')
+        target = np.empty(len(series), dtype='float64') if with_target else None
+        order = np.argsort(series, kind='stable')
+        bounds = np.searchsorted(series[order], np.arange(0, self.n_series + CHUNK_SERIES, CHUNK_SERIES))
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            if lo == hi:
+                continue
+            sel = order[lo:hi]
+            first_series = series[sel].min()
+            block = slice(first_series, series[sel].max() + 1)
+            r = series[sel] - first_series
+            values = self._block(block, r, origin[sel], horizon[sel])
+            out[sel] = np.column_stack([values[name] for name in FEATURES])
+            if with_target:
+                target[sel] = values['target']
+        X = pd.DataFrame(out, columns=FEATURES)
+        return (X, pd.Series(target, name='SalesQuantity')) if with_target else X
+
+    def _block(self, block: slice, r: np.ndarray, t: np.ndarray, h: np.ndarray) -> dict:
+        qty = self.index.store_brand[block].toarray()
+        dollars = (self.index.store_brand_dollars[block].toarray()
+                   if self.index.store_brand_dollars is not None else np.zeros_like(qty))
+        cum, cum_sq, cum_dollars = _cumsum(qty), _cumsum(qty ** 2), _cumsum(dollars)
+        days = np.arange(qty.shape[1])
+        last_sale = np.maximum.accumulate(np.where(qty > 0, days, -1), axis=1)
+        brand = self.pair_brand[block][r]
+
+        values = {'horizon': h, 'lag_1': qty[r, t],
+                  'lag_week': _lag(qty, r, t + h - 7), 'lag_2weeks': _lag(qty, r, t + h - 14)}
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for w in WINDOWS:
+                n = np.minimum(w, t + 1)
+                total = _window(cum, r, t, w)
+                mean = total / n
+                values[f'mean_{w}'] = mean
+                values[f'std_{w}'] = np.sqrt(np.maximum(_window(cum_sq, r, t, w) / n - mean ** 2, 0.0))
+                values[f'brand_mean_{w}'] = _window(self.brand_cum, brand, t, w) / n
+            sold_28 = _window(cum, r, t, 28)
+            values['price_28'] = np.where(sold_28 > 0, _window(cum_dollars, r, t, 28) / sold_28, np.nan)
+            historic = np.where(cum[r, t + 1] > 0, cum_dollars[r, t + 1] / cum[r, t + 1], np.nan)
+            values['price_ratio'] = values['price_28'] / historic
+        seen = last_sale[r, t]
+        values['days_since_sale'] = np.where(seen >= 0, t - seen, np.nan)
+        values.update(self._calendar(t + h))
+        target_day = t + h
+        values['target'] = np.where(target_day < qty.shape[1], qty[r, np.minimum(target_day, qty.shape[1] - 1)], np.nan)
+        return values
+
+    def training_rows(self, max_rows: int = MAX_TRAIN_ROWS, horizon: int = HORIZON, seed: int = 0):
+        """
+        Muestra uniforme de (serie, origen, h) con el objetivo observado: el
+        origen va desde la primera venta de la serie (y al menos 28 días de
+        historia si los hay) hasta HORIZON días antes del final.
+        """
+        last_origin = self.n_days - 1 - horizon
+        start = np.maximum(self.first, min(max(WINDOWS) - 1, max(last_origin, 0)))
+        counts = np.maximum(last_origin - start + 1, 0)
+        total = int(counts.sum())
+        if total == 0:
+            raise ValueError(f"Se necesitan más de {horizon} días de ventas para entrenar")
+        rng = np.random.default_rng(seed)
+        cells = np.sort(rng.choice(total, size=min(max_rows, total), replace=False))
+        ends = np.cumsum(counts)
+        series = np.searchsorted(ends, cells, side='right')
+        origin = start[series] + cells - (ends[series] - counts[series])
+        h = rng.integers(1, horizon + 1, size=len(cells))
+        return self.rows(series, origin, h, with_target=True)
+
+    def forecast_rows(self, horizon: int = HORIZON) -> pd.DataFrame:
+        """Filas con origen = último día para cada serie y h = 1..horizon (serie mayor, h menor)."""
+        series = np.repeat(np.arange(self.n_series), horizon)
+        h = np.tile(np.arange(1, horizon + 1), self.n_series)
+        return self.rows(series, np.full(len(series), self.n_days - 1), h)
+
+
+class GlobalForecaster:
+    """Modelo global entrenado una vez por dataset; pronosticar una marca es un predict chico."""
+
+    def __init__(self, index, registry=None, horizon: int = HORIZON, max_rows: int = MAX_TRAIN_ROWS):
+        self.index, self.horizon = index, horizon
+        self.features = GlobalFeatures(index)
+        X, y = self.features.training_rows(max_rows, horizon)
+        if registry is not None:
+            self.model = registry.fit(HistGradientBoostingRegressor, GB_PARAMS, X, y)
+        else:
+            self.model = HistGradientBoostingRegressor(**GB_PARAMS).fit(X, y)
+        self.train_rows = len(X)
+        # filas de pronóstico precalculadas, agrupadas por marca
+        self.rows = self.features.forecast_rows(horizon)
+        by_brand = np.argsort(self.features.pair_brand, kind='stable')
+        self._brand_series = np.split(by_brand, np.searchsorted(self.features.pair_brand[by_brand],
+                                                                np.arange(1, len(index.brands))))
+        self.dates = pd.date_range(index.dates[-1], periods=horizon + 1, freq='D')[1:]
+
+    def brand_forecast(self, brand, store=None) -> pd.DataFrame:
+        """Unidades diarias pronosticadas de una marca (suma de sus tiendas, o una tienda)."""
+        series = self._brand_series[self.index._brand_pos[brand]]
+        if store is not None:
+            series = series[self.index.pair_store[series] == store]
+        predicted = np.zeros(self.horizon)
+        if len(series):
+            rows = (series[:, None] * self.horizon + np.arange(self.horizon)).ravel()
+            predicted = self.model.predict(self.rows.iloc[rows]).reshape(len(series), self.horizon).sum(axis=0)
+        return pd.DataFrame({'SalesDate': self.dates, 'Predicted_SalesQuantity': predicted})
+
+
+# ===================== comparación con el modelo por marca =====================
+
+def _measure(fn):
+    """
+    (resultado, segundos, pico MB según tracemalloc). Cuenta lo que asignan
+    Python/NumPy, no la memoria interna de los árboles de scikit-learn; el RSS
+    del proceso lo mide `python -m src.benchmark --stages app_global_model`.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = fn()
+        return result, time.perf_counter() - start, tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+def _per_brand_forecasts(index, brands, horizon: int) -> np.ndarray:
+    """Lo que hace la app: un RandomForest por marca con mes y día de la semana."""
+    from sklearn.ensemble import RandomForestRegressor
+
+    future = pd.date_range(index.dates[-1], periods=horizon + 1, freq='D')[1:]
+    X_future = pd.DataFrame({'month': future.month, 'day_of_week': future.dayofweek})
+    out = []
+    for brand in brands:
+        brand_df = index.brand_series(brand)
+        X = pd.DataFrame({'month': brand_df['SalesDate'].dt.month, 'day_of_week': brand_df['SalesDate'].dt.dayofweek})
+        model = RandomForestRegressor(**RF_PARAMS).fit(X, brand_df['SalesQuantity'])
+        out.append(model.predict(X_future))
+    return np.array(out)
+
+def compare_training(sales_df: pd.DataFrame, n_brands: int = 50, horizon: int = HORIZON) -> pd.DataFrame:
+    """
+    Entrena ambos enfoques con todo salvo los últimos `horizon` días y mide
+    tiempo, memoria y MAE diario de las `n_brands` marcas más vendidas en esos
+    días. El tiempo por marca se extrapola a todas las marcas.
+    """
+    from sales_index import SalesIndex
+
+    cutoff = pd.to_datetime(sales_df['SalesDate']).max().normalize() - pd.Timedelta(days=horizon)
+    past = sales_df[sales_df['SalesDate'] <= cutoff]
+    full, index = SalesIndex(sales_df), SalesIndex(past)
+    brands = index.top_brands(n_brands)
+    days = np.searchsorted(full.dates, pd.date_range(cutoff, periods=horizon + 1, freq='D')[1:])
+    actual = np.array([full.quantity[full._brand_pos[b], days] for b in brands])
+
+    per_brand, brand_secs, brand_mb = _measure(lambda: _per_brand_forecasts(index, brands, horizon))
+    model, global_secs, global_mb = _measure(lambda: GlobalForecaster(index, horizon=horizon))
+    predicted, predict_secs, _ = _measure(lambda: np.array(
+        [model.brand_forecast(b)['Predicted_SalesQuantity'].to_numpy() for b in brands]))
+    return pd.DataFrame([
+        {'enfoque': 'RF por marca', 'marcas_entrenadas': len(brands), 'segundos': brand_secs,
+         'segundos_todas_las_marcas': brand_secs / max(len(brands), 1) * len(index.brands),
+         'pico_mb': brand_mb, 'mae': float(np.abs(per_brand - actual).mean())},
+        {'enfoque': 'modelo global', 'marcas_entrenadas': len(index.brands), 'segundos': global_secs,
+         'segundos_todas_las_marcas': global_secs, 'pico_mb': global_mb,
+         'mae': float(np.abs(predicted - actual).mean()),
+         'filas_entrenamiento': model.train_rows, 'segundos_predict_por_marca': predict_secs / max(len(brands), 1)},
+    ])
+
+
+if __name__ == '__main__':
+    import argparse
+    import io
+    from pathlib import Path
+
+    from upload_loader import SALES_FILE, load_uploaded_files
+
+    class _Upload(io.BytesIO):
+        def __init__(self, path: Path):
+            super().__init__(path.read_bytes())
+            self.name, self.size = path.name, path.stat().st_size
+
+    parser = argparse.ArgumentParser(description='Modelo global vs. RandomForest por marca')
+    parser.add_argument('sales', type=Path, nargs='+', help='archivo(s) de ventas (CSV o parquet, en partes)')
+    parser.add_argument('--brands', type=int, default=50, help='marcas más vendidas a comparar')
+    args = parser.parse_args()
+    sales = load_uploaded_files([_Upload(p) for p in args.sales])[SALES_FILE]
+    sales = sales.dropna(subset=['SalesDate']).reset_index(drop=True)
+    report = compare_training(sales, args.brands)
+    print(report.round(3).to_string(index=False))
@@ -0,0 +1,115 @@
+"""
+Registro de modelos entrenados para la app de Streamlit.
+
+Cada modelo se identifica por un hash de los datos de entrenamiento, la clase
+del estimador y sus hiperparámetros: si ya se entrenó con exactamente esos
+datos se reutiliza en vez de volver a entrenar.
+
+- En memoria: LRU limitado por cantidad de modelos y por bytes.
+- En disco: un archivo joblib por modelo (sobrevive a reinicios de la app),
+  también limitado por cantidad y bytes; se desalojan los menos usados.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import joblib
+import pandas as pd
+
+
+def training_key(estimator_cls, params: dict, X: pd.DataFrame, y: pd.Series) -> str:
+    """Hash de (estimador, hiperparámetros, X, y)."""
+    h = hashlib.sha256()
+    h.update(f"{estimator_cls.__module__}.{estimator_cls.__qualname__}".encode())
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    h.update(",".join(map(str, X.columns)).encode())
+    h.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    h.update(pd.util.hash_pandas_object(y, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+class ModelRegistry:
+    def __init__(self, cache_dir, max_models: int = 32, max_bytes: int = 512 * 2**20,
+                 disk_max_models: int = 256, disk_max_bytes: int = 2 * 2**30):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.disk_max_models = disk_max_models
+        self.disk_max_bytes = disk_max_bytes
+        self._memoria: OrderedDict[str, tuple[object, int]] = OrderedDict()   # key -> (modelo, bytes)
+        self.stats = {"hits_memoria": 0, "hits_disco": 0, "misses": 0, "desalojados": 0}
+        # Streamlit atiende cada sesión en un hilo: un solo entrenamiento por clave a la vez
+        self._lock = threading.RLock()
+
+    def _ruta(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.joblib"
+
+    def _guardar_memoria(self, key: str, modelo, size: int):
+        self._memoria[key] = (modelo, size)
+        self._memoria.move_to_end(key)
+        while self._memoria and (len(self._memoria) > self.max_models
+                                 or self.memory_bytes() > self.max_bytes):
+            if len(self._memoria) == 1:
+                break                     # un modelo más grande que el límite igual se usa
+            self._memoria.popitem(last=False)
+            self.stats["desalojados"] += 1
+
+    def _podar_disco(self):
+        archivos = sorted(self.cache_dir.glob("*.joblib"), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in archivos)
+        while len(archivos) > 1 and (len(archivos) > self.disk_max_models or total > self.disk_max_bytes):
+            viejo = archivos.pop(0)
+            total -= viejo.stat().st_size
+            viejo.unlink(missing_ok=True)
+
+    def memory_bytes(self) -> int:
+        return sum(size for _, size in self._memoria.values())
+
+    def fit(self, estimator_cls, params: dict, X: pd.DataFrame, y: pd.Series):
+        """Devuelve el modelo entrenado con (X, y); lo entrena solo si no está en caché."""
+        key = training_key(estimator_cls, params, X, y)
+        with self._lock:
+            return self._fit(key, estimator_cls, params, X, y)
+
+    def _fit(self, key: str, estimator_cls, params: dict, X: pd.DataFrame, y: pd.Series):
+        if key in self._memoria:
+            self._memoria.move_to_end(key)
+            self.stats["hits_memoria"] += 1
+            return self._memoria[key][0]
+
+        ruta = self._ruta(key)
+        if ruta.exists():
+            try:
+                modelo = joblib.load(ruta)
+            except Exception:
+                ruta.unlink(missing_ok=True)     # archivo corrupto: se reentrena
+            else:
+                os.utime(ruta)                   # marca de uso para el desalojo en disco
+                self.stats["hits_disco"] += 1
+                self._guardar_memoria(key, modelo, ruta.stat().st_size)
+                return modelo
+
+        self.stats["misses"] += 1
+        modelo = estimator_cls(**params).fit(X, y)
+        tmp = ruta.with_suffix(f".{os.getpid()}.tmp")
+        joblib.dump(modelo, tmp)
+        os.replace(tmp, ruta)
+        self._guardar_memoria(key, modelo, ruta.stat().st_size)
+        self._podar_disco()
+        return modelo
+
+    def resumen(self) -> dict:
+        archivos = list(self.cache_dir.glob("*.joblib"))
+        consultas = self.stats["hits_memoria"] + self.stats["hits_disco"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": (consultas - self.stats["misses"]) / consultas if consultas else 0.0,
+            "modelos_memoria": len(self._memoria),
+            "mb_memoria": self.memory_bytes() / 2**20,
+            "modelos_disco": len(archivos),
+            "mb_disco": sum(p.stat().st_size for p in archivos) / 2**20,
+        }
@@ -0,0 +1,88 @@
+"""
+Índice columnar de ventas para las vistas interactivas de la app.
+
+Se construye una vez por dataset: una matriz marca × día con las unidades
+vendidas (y otra con la cantidad de registros, para saber qué días tuvieron
+ventas), más el lookup marca -> descripción. Así la serie de una marca, los
+totales de la empresa o un filtro por tienda son cortes de O(días) en vez de
+recorrer todo el DataFrame de ventas.
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def _daily_matrix(codes: np.ndarray, day: np.ndarray, n_rows: int, n_days: int, weights=None) -> np.ndarray:
+    flat = np.bincount(codes * n_days + day, weights=weights, minlength=n_rows * n_days)
+    return flat.reshape(n_rows, n_days)
+
+
+class SalesIndex:
+    def __init__(self, sales_df: pd.DataFrame):
+        dates = pd.to_datetime(sales_df['SalesDate']).dt.normalize()
+        start = dates.min()
+        day = (dates - start).dt.days.to_numpy()
+        self.dates = pd.date_range(start, dates.max(), freq='D')
+        n_days = len(self.dates)
+
+        # Marcas en orden de primera aparición (el mismo orden que tenía el selectbox)
+        codes, self.brands = pd.factorize(sales_df['Brand'], sort=False)
+        has_brand = codes >= 0
+        self._brand_pos = {b: i for i, b in enumerate(self.brands)}
+        last_desc = sales_df.drop_duplicates('Brand', keep='last').set_index('Brand')['Description']
+        self.descriptions = {b: last_desc.get(b, f"Marca {b}") for b in self.brands}
+
+        qty = pd.to_numeric(sales_df['SalesQuantity'], errors='coerce').fillna(0).to_numpy(dtype='float64')
+        self.quantity = _daily_matrix(codes[has_brand], day[has_brand], len(self.brands), n_days, qty[has_brand])
+        self.rows = _daily_matrix(codes[has_brand], day[has_brand], len(self.brands), n_days).astype('int32')
+        self.total_rows = np.bincount(day, minlength=n_days)
+        self.totals = {
+            col: np.bincount(day, weights=pd.to_numeric(sales_df[col], errors='coerce').fillna(0).to_numpy(),
+                             minlength=n_days)
+            for col in ('SalesQuantity', 'SalesDollars') if col in sales_df.columns
+        }
+
+        # Tienda × marca (disperso: la mayoría de los pares no vende todos los días)
+        self.store_brand = self.store_brand_dollars = None
+        if 'Store' in sales_df.columns:
+            store_codes, stores = pd.factorize(sales_df['Store'].to_numpy()[has_brand])
+            # ventas sin tienda (-1): cuentan para la marca pero no para ningún par tienda × marca
+            has_store = store_codes >= 0
+            rows = np.flatnonzero(has_brand)[has_store]
+            pair_codes, pairs = pd.factorize(store_codes[has_store].astype('int64') * len(self.brands)
+                                             + codes[rows])
+            self._pair_pos = {(stores[p // len(self.brands)], p % len(self.brands)): i
+                              for i, p in enumerate(pairs)}
+            # marca (posición en self.brands) y tienda de cada par
+            self.pair_brand = (pairs % len(self.brands)).astype('int64')
+            self.pair_store = np.asarray(stores)[pairs // len(self.brands)]
+            shape = (len(pairs), n_days)
+            self.store_brand = sparse.csr_matrix((qty[rows], (pair_codes, day[rows])), shape=shape)
+            self.store_brand_rows = sparse.csr_matrix((np.ones(len(pair_codes)), (pair_codes, day[rows])),
+                                                      shape=shape)
+            if 'SalesDollars' in sales_df.columns:
+                dollars = pd.to_numeric(sales_df['SalesDollars'], errors='coerce').fillna(0).to_numpy()
+                self.store_brand_dollars = sparse.csr_matrix((dollars[rows], (pair_codes, day[rows])),
+                                                             shape=shape)
+
+    def top_brands(self, n: int) -> list:
+        order = np.argsort(-self.quantity.sum(axis=1), kind='stable')[:n]
+        return [self.brands[i] for i in order]
+
+    def brand_series(self, brand, store=None) -> pd.DataFrame:
+        """Unidades diarias de una marca (opcionalmente de una tienda), solo días con ventas."""
+        if store is None:
+            i = self._brand_pos[brand]
+            values, mask = self.quantity[i], self.rows[i] > 0
+        else:
+            i = self._pair_pos.get((store, self._brand_pos[brand]))
+            if i is None:
+                return pd.DataFrame({'SalesDate': pd.DatetimeIndex([]), 'SalesQuantity': []})
+            values = self.store_brand[i].toarray().ravel()
+            mask = self.store_brand_rows[i].toarray().ravel() > 0
+        return pd.DataFrame({'SalesDate': self.dates[mask], 'SalesQuantity': values[mask]})
+
+    def company_series(self, column: str = 'SalesDollars') -> pd.DataFrame:
+        """Total diario de la empresa, solo días con ventas."""
+        mask = self.total_rows > 0
+        return pd.DataFrame({'SalesDate': self.dates[mask], column: self.totals[column][mask]})
@@ -0,0 +1,175 @@
+"""
+Carga de los archivos subidos a la app (CSV o parquet, en una o varias partes).
+
+- Solo se leen las columnas que usa la app, con tipos fijos (nada de
+  inferencia ni `to_datetime` sin formato).
+- Las partes de un mismo archivo se leen por lotes con pyarrow y se copian a
+  buffers preasignados del tamaño total (filas contadas antes de parsear),
+  sin `pd.concat`: el pico de memoria es el resultado + un lote.
+- `fingerprint` identifica los archivos por nombre/tamaño/id, para usarlo como
+  clave de caché sin hashear todo el contenido en cada rerun.
+"""
+import csv
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+SALES_FILE = 'SalesFINAL12312016'
+PURCHASES_FILE = 'PurchasesFINAL12312016'
+
+DATE_FORMATS = ('%m/%d/%Y', '%Y-%m-%d')
+
+# Columnas que usa la app y su tipo. Las que falten en el archivo se omiten.
+APP_COLUMNS = {
+    SALES_FILE: {
+        'SalesDate': 'datetime',
+        'Store': 'int32',
+        'Brand': 'int32',
+        'Description': 'category',
+        'SalesQuantity': 'float64',
+        'SalesDollars': 'float64',
+    },
+    PURCHASES_FILE: {
+        'PODate': 'datetime',
+    },
+}
+
+_ARROW_TYPES = {'int32': pa.int32(), 'float64': pa.float64(), 'category': pa.string(),
+                'datetime': pa.timestamp('s')}
+
+
+def dataset_name(file_name: str) -> str:
+    """'SalesFINAL12312016_part2.csv' -> 'SalesFINAL12312016'."""
+    return file_name.rsplit('_part', 1)[0] if '_part' in file_name else file_name.split('.')[0]
+
+def fingerprint(uploaded_files) -> tuple:
+    """Clave liviana de los archivos subidos (no lee el contenido)."""
+    return tuple((f.name, f.size, getattr(f, 'file_id', None)) for f in uploaded_files or [])
+
+def _is_parquet(file) -> bool:
+    return file.name.lower().endswith('.parquet')
+
+def _buffer(file) -> pa.BufferReader:
+    return pa.BufferReader(pa.py_buffer(file.getbuffer()))   # sin copiar los bytes subidos
+
+def _max_rows(file) -> int:
+    """Cota superior de filas: metadata en parquet, saltos de línea en CSV."""
+    if _is_parquet(file):
+        return pq.ParquetFile(_buffer(file)).metadata.num_rows
+    data = file.getvalue()
+    return data.count(b'\n') + (0 if data.endswith(b'\n') else 1)
+
+def _header(file) -> list[str]:
+    if _is_parquet(file):
+        return pq.ParquetFile(_buffer(file)).schema_arrow.names
+    first_line = file.getvalue().split(b'\n', 1)[0].decode('utf-8-sig').rstrip('\r')
+    return [c.strip() for c in next(csv.reader([first_line]))]
+
+def _batches(file, columns: dict, pinned: bool = True):
+    if _is_parquet(file):
+        yield from pq.ParquetFile(_buffer(file)).iter_batches(columns=list(columns))
+        return
+    types = {c: (_ARROW_TYPES[t] if pinned else pa.string()) for c, t in columns.items()}
+    convert = pv.ConvertOptions(include_columns=list(columns), include_missing_columns=True,
+                                column_types=types, strings_can_be_null=True,
+                                timestamp_parsers=list(DATE_FORMATS))
+    yield from pv.open_csv(_buffer(file), convert_options=convert)
+
+def _parse_dates(values) -> np.ndarray:
+    s = pd.Series(values, dtype='object')
+    out = pd.Series(pd.NaT, index=s.index, dtype='datetime64[ns]')
+    for fmt in DATE_FORMATS:
+        missing = out.isna() & s.notna()
+        if not missing.any():
+            break
+        out[missing] = pd.to_datetime(s[missing], format=fmt, errors='coerce')
+    return out.to_numpy()
+
+
+class _Buffers:
+    """Columnas preasignadas que se llenan lote a lote."""
+
+    def __init__(self, columns: dict, capacity: int):
+        self.columns = columns
+        self.n = 0
+        self.values, self.masks, self.categories = {}, {}, {}
+        for col, kind in columns.items():
+            if kind == 'int32':
+                self.values[col] = np.zeros(capacity, dtype='int32')
+                self.masks[col] = np.ones(capacity, dtype=bool)
+            elif kind == 'float64':
+                self.values[col] = np.full(capacity, np.nan)
+            elif kind == 'category':
+                self.values[col] = np.full(capacity, -1, dtype='int32')
+                self.categories[col] = {}
+            else:
+                self.values[col] = np.full(capacity, np.datetime64('NaT'), dtype='datetime64[ns]')
+
+    def append(self, batch: pa.RecordBatch):
+        lo, hi = self.n, self.n + batch.num_rows
+        for col, kind in self.columns.items():
+            arr = batch.column(batch.schema.get_field_index(col))
+            if kind == 'int32':
+                if not pa.types.is_integer(arr.type):
+                    arr = pa.array(pd.to_numeric(arr.to_pandas(), errors='coerce'), from_pandas=True)
+                    arr = pc.cast(arr, pa.int32(), safe=False)
+                self.values[col][lo:hi] = arr.fill_null(0).to_numpy()
+                self.masks[col][lo:hi] = arr.is_null().to_numpy(zero_copy_only=False)
+            elif kind == 'float64':
+                if not pa.types.is_floating(arr.type) and not pa.types.is_integer(arr.type):
+                    self.values[col][lo:hi] = pd.to_numeric(arr.to_pandas(), errors='coerce').to_numpy()
+                else:
+                    self.values[col][lo:hi] = arr.to_numpy(zero_copy_only=False)
+            elif kind == 'category':
+                encoded = arr.cast(pa.string()).dictionary_encode()
+                lookup = self.categories[col]
+                global_codes = np.array([lookup.setdefault(v, len(lookup))
+                                         for v in encoded.dictionary.to_pylist()], dtype='int32')
+                idx = encoded.indices.fill_null(-1).to_numpy()
+                self.values[col][lo:hi] = np.where(idx >= 0, global_codes[np.maximum(idx, 0)], -1)
+            elif pa.types.is_timestamp(arr.type) or pa.types.is_date(arr.type):
+                self.values[col][lo:hi] = arr.cast(pa.timestamp('ns')).to_numpy(zero_copy_only=False)
+            else:
+                self.values[col][lo:hi] = _parse_dates(arr.to_numpy(zero_copy_only=False))
+        self.n = hi
+
+    def frame(self) -> pd.DataFrame:
+        data = {}
+        for col, kind in self.columns.items():
+            values = self.values[col][:self.n]
+            if kind == 'int32':
+                data[col] = pd.arrays.IntegerArray(values, self.masks[col][:self.n])
+            elif kind == 'category':
+                data[col] = pd.Categorical.from_codes(values, categories=list(self.categories[col]))
+            else:
+                data[col] = values
+        return pd.DataFrame(data)
+
+
+def read_parts(files, name: str) -> pd.DataFrame:
+    """Lee todas las partes de un archivo en un solo DataFrame con tipos fijos."""
+    header = _header(files[0])
+    columns = {c: t for c, t in APP_COLUMNS.get(name, {}).items() if c in header}
+    buffers = _Buffers(columns, sum(_max_rows(f) for f in files))
+    for file in files:
+        start = buffers.n
+        try:
+            for batch in _batches(file, columns):
+                buffers.append(batch)
+        except pa.ArrowInvalid:
+            # algún valor no cumple el tipo fijo: se relee esta parte como texto y se coerciona
+            buffers.n = start
+            for batch in _batches(file, columns, pinned=False):
+                buffers.append(batch)
+    return buffers.frame()
+
+def load_uploaded_files(uploaded_files) -> dict[str, pd.DataFrame]:
+    """Agrupa las partes por nombre de archivo y devuelve un DataFrame por archivo."""
+    groups: dict[str, list] = {}
+    for file in uploaded_files:
+        groups.setdefault(dataset_name(file.name), []).append(file)
+    return {name: read_parts(files, name) for name, files in groups.items()}
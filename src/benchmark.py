@@ -0,0 +1,241 @@
+# src/benchmark.py
+"""
+Benchmark de cada etapa sobre datos sintéticos a varias escalas.
+
+Por cada escala (1× = src.synthetic_data.BASE_ROWS) se generan los raw en una
+carpeta de trabajo y se corre cada etapa en un proceso nuevo, apuntado a esa
+carpeta con INVENTARIO_DATA_DIR:
+
+- load_* y transform_*: las mismas tareas del pipeline (src/pipeline.py);
+  con --backends pandas,duckdb cada transform_* se mide también con el
+  backend DuckDB (src/lazy_backend.py) como `transform_*@duckdb`,
+- policy_inventory / policy_simulation: políticas SS/ROP/EOQ y su simulación
+  Monte Carlo (con SIMULATION_SCENARIOS escenarios),
+- app_load / app_index / app_global_model: carga de los archivos subidos, el
+  índice marca × día y el modelo global de demanda de machine_learning/app.py.
+
+Se mide tiempo de pared, CPU, RSS pico del proceso y filas/s. El resultado
+se guarda en JSON (con el commit) para comparar corridas con --compare; el
+archivo se reescribe al terminar cada etapa y una etapa que falla queda
+registrada con su error sin cortar el resto.
+
+Uso:
+    python -m src.benchmark --scales 1,10,100 [--out bench.json] [--compare base.json]
+    python -m src.benchmark --scales 10 --stages load_sales,transform_sales --backends pandas,duckdb
+"""
+import argparse
+import io
+import json
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_STAGES = ("app_load", "app_index", "app_global_model")
+SIMULATION_SCENARIOS = 200
+REGRESSION = 0.10        # --compare marca cambios mayores a 10 %
+
+
+def _parquet_rows(path: Path) -> int:
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(path).metadata.num_rows
+
+class _Upload(io.BytesIO):
+    """Imita el UploadedFile de Streamlit (name, size, getbuffer)."""
+
+    def __init__(self, path: Path):
+        super().__init__(path.read_bytes())
+        self.name, self.size = path.name, path.stat().st_size
+
+def _app_files(raw: Path) -> list:
+    from src.config import FILES
+    return [_Upload(raw / FILES["sales"]), _Upload(raw / FILES["purchases"])]
+
+def _run_stage(stage: str) -> dict:
+    """Corre una etapa en este proceso (hijo) y devuelve sus métricas."""
+    from src import pipeline
+    from src.config import RAW_DIR
+
+    rss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    wall, cpu = time.perf_counter(), time.process_time()
+    if stage in APP_STAGES:
+        sys.path.insert(0, str(ROOT / "machine_learning"))
+        from upload_loader import SALES_FILE, load_uploaded_files
+        sales = load_uploaded_files(_app_files(RAW_DIR))[SALES_FILE]
+        if stage == "app_index":
+            from sales_index import SalesIndex
+            wall, cpu = time.perf_counter(), time.process_time()   # solo la construcción del índice
+            SalesIndex(sales)
+        elif stage == "app_global_model":
+            from global_forecast import GlobalForecaster
+            from sales_index import SalesIndex
+            index = SalesIndex(sales)
+            wall, cpu = time.perf_counter(), time.process_time()   # variables + entrenamiento + filas de pronóstico
+            GlobalForecaster(index)
+        rows = len(sales)
+    else:
+        name, _, backend = stage.partition("@")
+        task = next(t for t in pipeline.build_tasks(backend=backend or "pandas",
+                                                    simulation_scenarios=SIMULATION_SCENARIOS)
+                    if t.name == name)
+        result = task.fn(*task.args)
+        rows = result if stage.startswith("load_") else _parquet_rows(task.inputs[0])
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    unit = 1 if platform.system() == "Darwin" else 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "stage": stage, "rows": int(rows), "wall_s": round(wall, 4), "cpu_s": round(cpu, 4),
+        "peak_rss_mb": round(peak * unit / 2**20, 1),
+        "rss_before_mb": round(rss_start * unit / 2**20, 1),
+        "rows_per_s": round(rows / wall, 1) if wall > 0 else None,
+    }
+
+def stage_names(backends: list[str] | None = None) -> list[str]:
+    """Etapas a medir; los transform_* se repiten por cada backend extra (`nombre@backend`)."""
+    from src import pipeline
+    names = []
+    for t in pipeline.build_tasks(simulation_scenarios=SIMULATION_SCENARIOS):
+        names.append(t.name)
+        if t.name.startswith("transform_"):
+            names += [f"{t.name}@{b}" for b in backends or () if b != "pandas"]
+    return names + list(APP_STAGES)
+
+def _with_backends(stages: list[str], backends: list[str] | None) -> list[str]:
+    return [f"{s}@{b}" if b != "pandas" else s
+            for s in stages for b in (backends if s.startswith("transform_") and backends else ["pandas"])]
+
+def print_backend_speedups(results: list[dict]):
+    """Tiempo de cada transform_*@backend contra el mismo transform en pandas."""
+    results = [r for r in results if "error" not in r]
+    base = {(r["scale"], r["stage"]): r for r in results}
+    rows = [(r, base.get((r["scale"], r["stage"].partition("@")[0]))) for r in results if "@" in r["stage"]]
+    if rows:
+        print("\n=== backends vs pandas ===")
+    for r, b in rows:
+        if b:
+            print(f"{r['scale']:>5g}× {r['stage']:<36} {b['wall_s']:>8.2f}s -> {r['wall_s']:>8.2f}s "
+                  f"(x{b['wall_s'] / r['wall_s']:.2f})  RSS {b['peak_rss_mb']:.0f} -> {r['peak_rss_mb']:.0f} MB")
+
+def run_scale(scale: float, workdir: Path, seed: int = 0, stages: list[str] | None = None,
+              backends: list[str] | None = None, on_result=None) -> list[dict]:
+    """
+    Genera los datos de una escala y mide cada etapa en un proceso aparte
+    (spawn). `on_result(res)` se llama al terminar cada etapa.
+    """
+    from src.synthetic_data import generate_raw
+
+    data_dir = workdir / f"scale_{scale:g}"
+    start = time.perf_counter()
+    rows = generate_raw(data_dir / "raw", scale, seed)
+    print(f"🧪 escala {scale:g}×: {rows['sales']:,} ventas generadas en {time.perf_counter() - start:.1f}s")
+
+    for sub in ("interim", "processed"):
+        (data_dir / sub).mkdir(parents=True, exist_ok=True)
+    os.environ["INVENTARIO_DATA_DIR"] = str(data_dir)
+    ctx = mp.get_context("spawn")    # proceso limpio: el RSS pico es el de la etapa
+    results = []
+    for stage in _with_backends(stages, backends) if stages else stage_names(backends):
+        # ProcessPoolExecutor y no mp.Pool: sus procesos no son daemon y la etapa puede abrir su propio pool
+        with ProcessPoolExecutor(1, mp_context=ctx) as pool:
+            try:
+                res = pool.submit(_run_stage, stage).result()
+            except Exception as e:
+                res = {"stage": stage, "error": f"{type(e).__name__}: {e}"}
+        res["scale"] = scale
+        results.append(res)
+        if "error" in res:
+            print(f"⚠️ {stage:<28} falló: {res['error']}")
+        else:
+            print(f"   {stage:<28}{res['wall_s']:>9.2f}s {res['peak_rss_mb']:>9.0f} MB "
+                  f"{(res['rows_per_s'] or 0):>12,.0f} filas/s")
+        if on_result:
+            on_result(res)
+    return results
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(current: dict, baseline_path: Path):
+    """Imprime el cambio de tiempo y memoria por (escala, etapa) contra otra corrida."""
+    baseline = json.loads(Path(baseline_path).read_text())
+    base = {(r["scale"], r["stage"]): r for r in baseline["results"]}
+    print(f"\n📊 vs {baseline.get('commit')} ({baseline_path})")
+    for r in current["results"]:
+        b = base.get((r["scale"], r["stage"]))
+        if not b or "error" in r or "error" in b:
+            continue
+        dt = r["wall_s"] / b["wall_s"] - 1 if b["wall_s"] else 0.0
+        dm = r["peak_rss_mb"] / b["peak_rss_mb"] - 1 if b["peak_rss_mb"] else 0.0
+        flag = "⚠️" if dt > REGRESSION or dm > REGRESSION else "  "
+        print(f"{flag} {r['scale']:>5g}× {r['stage']:<28} tiempo {dt:+7.1%}  RSS {dm:+7.1%}")
+
+def main(scales: list[float], out: Path | None = None, workdir: Path | None = None,
+         baseline: Path | None = None, stages: list[str] | None = None, keep: bool = False, seed: int = 0,
+         backends: list[str] | None = None):
+    tmp = None
+    if workdir is None:
+        workdir = tmp = Path(tempfile.mkdtemp(prefix="inventario_bench_"))
+    commit = _git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "results": [],
+    }
+    out = out or ROOT / "benchmarks" / f"bench_{commit or 'local'}_{datetime.now():%Y%m%d_%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+
+    def save(res: dict):
+        # resultados parciales: si algo se corta, lo medido hasta ahí queda en el JSON
+        report["results"].append(res)
+        out.write_text(json.dumps(report, indent=2))
+
+    try:
+        for scale in scales:
+            run_scale(scale, workdir, seed, stages, backends, on_result=save)
+            if not keep:
+                shutil.rmtree(workdir / f"scale_{scale:g}", ignore_errors=True)
+    finally:
+        if tmp is not None and not keep:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    out.write_text(json.dumps(report, indent=2))
+    failed = [r["stage"] for r in report["results"] if "error" in r]
+    if failed:
+        print(f"⚠️ etapas con error: {', '.join(failed)}")
+    print_backend_speedups(report["results"])
+    print(f"✅ resultados: {out}")
+    if baseline:
+        compare(report, baseline)
+    return out
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark por etapa sobre datos sintéticos")
+    parser.add_argument("--scales", type=lambda s: [float(x) for x in s.split(",")], default=[1, 10, 100],
+                        help="escalas a medir, p. ej. 1,10,100")
+    parser.add_argument("--stages", type=lambda s: s.split(","), default=None,
+                        help="solo estas etapas (por defecto todas)")
+    parser.add_argument("--out", type=Path, default=None, help="archivo JSON de resultados")
+    parser.add_argument("--workdir", type=Path, default=None, help="carpeta para los datos generados")
+    parser.add_argument("--compare", type=Path, default=None, help="JSON de otra corrida para comparar")
+    parser.add_argument("--keep", action="store_true", help="no borra los datos generados")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backends", type=lambda s: s.split(","), default=None,
+                        help="backends de los transform_* a comparar, p. ej. pandas,duckdb")
+    args = parser.parse_args()
+    main(args.scales, args.out, args.workdir, args.compare, args.stages, args.keep, args.seed, args.backends)
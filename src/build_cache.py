@@ -0,0 +1,95 @@
+# src/build_cache.py
+"""
+Caché de construcción: un manifiesto por carpeta de salida (data/interim y
+data/processed) registra, por tarea, la huella de sus entradas, la versión del
+código/esquema y sus salidas. Si nada cambió, la tarea se salta.
+
+La huella de un archivo es tamaño + mtime; solo si esos cambian se calcula el
+sha256 del contenido (un `touch` sin cambios no fuerza reconstrucción).
+"""
+import hashlib
+import json
+from pathlib import Path
+
+MANIFEST_NAME = "_manifest.json"
+_HASH_BLOCK = 1 << 20
+
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def file_fingerprint(path: Path, previous: dict | None = None) -> dict | None:
+    """Huella de `path`; reutiliza el sha256 de `previous` si tamaño y mtime coinciden."""
+    if not path.exists():
+        return None
+    st = path.stat()
+    fp = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if previous and previous.get("size") == fp["size"] and previous.get("mtime_ns") == fp["mtime_ns"]:
+        fp["sha256"] = previous["sha256"]
+    else:
+        fp["sha256"] = sha256_file(path)
+    return fp
+
+def code_version(*files: Path, extra=None) -> str:
+    """Versión = hash del código fuente indicado + datos extra (p. ej. el esquema)."""
+    h = hashlib.sha256()
+    for f in files:
+        h.update(Path(f).read_bytes())
+    if extra is not None:
+        h.update(json.dumps(extra, sort_keys=True, default=str).encode())
+    return h.hexdigest()[:16]
+
+
+# ===================== manifiesto =====================
+
+def load_manifest(folder: Path) -> dict:
+    path = folder / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(folder: Path, manifest: dict):
+    folder.mkdir(parents=True, exist_ok=True)
+    path = folder / MANIFEST_NAME
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    tmp.replace(path)
+
+def _same_content(old: dict | None, new: dict | None) -> bool:
+    if old is None or new is None:
+        return old is new
+    return old["sha256"] == new["sha256"]
+
+def check_entry(entry: dict | None, inputs, version: str, outputs) -> tuple[bool, str, dict]:
+    """
+    Compara una tarea con su entrada del manifiesto.
+    Devuelve (vigente, motivo, huellas actuales de las entradas).
+    """
+    previous = (entry or {}).get("inputs", {})
+    current = {str(p): file_fingerprint(Path(p), previous.get(str(p))) for p in inputs}
+    if entry is None:
+        return False, "sin registro previo", current
+    if entry.get("version") != version:
+        return False, "cambió el código/esquema", current
+    missing = [str(p) for p in outputs if not Path(p).exists()]
+    if missing:
+        return False, f"falta salida {Path(missing[0]).name}", current
+    for p, fp in current.items():
+        if not _same_content(previous.get(p), fp):
+            return False, f"cambió {Path(p).name}", current
+    return True, "sin cambios", current
+
+def make_entry(inputs_fp: dict, version: str, outputs) -> dict:
+    """Entrada del manifiesto tras construir (registra también las salidas)."""
+    return {
+        "inputs": inputs_fp,
+        "version": version,
+        "outputs": {str(p): {"size": Path(p).stat().st_size, "mtime_ns": Path(p).stat().st_mtime_ns}
+                    for p in outputs if Path(p).exists()},
+    }
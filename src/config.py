@@ -1,13 +1,20 @@
+import os
 from pathlib import Path
 
 # Ruta raíz del proyecto (carpeta que contiene /data y /src)
 ROOT = Path(__file__).resolve().parents[1]
 
-DATA_DIR = ROOT / "data"
+# INVENTARIO_DATA_DIR permite apuntar el pipeline a otra carpeta de datos
+# (p. ej. datos sintéticos de src/benchmark.py) sin tocar data/
+DATA_DIR = Path(os.environ.get("INVENTARIO_DATA_DIR", ROOT / "data"))
 RAW_DIR = DATA_DIR / "raw"
 INTERIM_DIR = DATA_DIR / "interim"
 PROCESSED_DIR = DATA_DIR / "processed"
 
+# Parquet es el formato de intercambio entre etapas (interim y processed).
+# El CSV queda como exportación opcional (--csv) para Power BI.
+PARQUET_OPTIONS = {"compression": "zstd", "use_dictionary": True}
+
 FILES = {
     "prices": "2017PurchasePricesDec.csv",
     "inv_beg": "BegInvFINAL12312016.csv",
@@ -15,4 +22,119 @@ FILES = {
     "invoices": "InvoicePurchases12312016.csv",
     "purchases": "PurchasesFINAL12312016.csv",
     "sales": "SalesFINAL12312016.csv",
-}
\ No newline at end of file
+}
+
+# Esquema por fuente (mismas claves que FILES). Se usa al leer los raw para
+# tipar una sola vez con el parser nativo de pyarrow:
+#   dtypes       -> tipo arrow por columna (alias de pyarrow: "int32", "float64", "string")
+#   dates        -> columnas fecha y sus formatos fijos (strptime)
+#   categoricals -> columnas de texto repetitivo, se leen como diccionario (category en pandas)
+#   rename       -> renombres de la estandarización en interim
+_PURCHASES_RENAME = {
+    "InvoiceDate": "InvoiceDate",
+    "Quantity": "Quantity",
+    "PurchasePrice": "UnitPrice",
+    "Dollars": "TotalAmount",
+    "PONumber": "InvoiceNo",   # usamos PONumber como ID de factura
+    # extras para consistencia
+    "InventoryId": "InventoryId",
+    "Store": "Store",
+    "Brand": "Brand",
+    "Description": "ProductName",
+    "Size": "Size",
+    "VendorNumber": "VendorId",
+    "VendorName": "VendorName",
+    "PODate": "PODate",
+    "ReceivingDate": "ReceivingDate",
+    "PayDate": "PayDate",
+    "Classification": "Classification",
+}
+
+SCHEMAS = {
+    "prices": {
+        "dtypes": {
+            "Brand": "int64", "Description": "string", "Price": "float64",
+            "Size": "string",
+            "Volume": "string",            # trae valores no numéricos ('Unknown')
+            "Classification": "int64", "PurchasePrice": "float64",
+            "VendorNumber": "int64", "VendorName": "string",
+        },
+        "dates": {},
+        "categoricals": ["Size", "VendorName"],
+        "rename": {},
+    },
+    "inv_beg": {
+        "dtypes": {
+            "InventoryId": "string", "Store": "int64", "City": "string",
+            "Brand": "int64", "Description": "string", "Size": "string",
+            "onHand": "int64", "Price": "float64",
+        },
+        "dates": {"startDate": ["%Y-%m-%d"]},
+        "categoricals": ["City", "Description", "Size"],
+        "rename": {},
+    },
+    "inv_end": {
+        "dtypes": {
+            "InventoryId": "string", "Store": "int64", "City": "string",
+            "Brand": "int64", "Description": "string", "Size": "string",
+            "onHand": "int64", "Price": "float64",
+        },
+        "dates": {"endDate": ["%Y-%m-%d"]},
+        "categoricals": ["City", "Description", "Size"],
+        "rename": {},
+    },
+    "invoices": {
+        "dtypes": {
+            "VendorNumber": "int64", "VendorName": "string", "PONumber": "int64",
+            "Quantity": "int64", "Dollars": "float64", "Freight": "float64",
+            "Approval": "string",
+        },
+        "dates": {
+            "InvoiceDate": ["%Y-%m-%d"], "PODate": ["%Y-%m-%d"], "PayDate": ["%Y-%m-%d"],
+        },
+        "categoricals": ["VendorName", "Approval"],
+        "rename": _PURCHASES_RENAME,
+    },
+    "purchases": {
+        "dtypes": {
+            "InventoryId": "string", "Store": "int64", "Brand": "int64",
+            "Description": "string", "Size": "string", "VendorNumber": "int64",
+            "VendorName": "string", "PONumber": "int64", "PurchasePrice": "float64",
+            "Quantity": "int64", "Dollars": "float64", "Classification": "int64",
+        },
+        "dates": {
+            "PODate": ["%Y-%m-%d"], "ReceivingDate": ["%Y-%m-%d"],
+            "InvoiceDate": ["%Y-%m-%d"], "PayDate": ["%Y-%m-%d"],
+        },
+        "categoricals": ["Description", "Size", "VendorName"],
+        "rename": _PURCHASES_RENAME,
+    },
+    "sales": {
+        "dtypes": {
+            "InventoryId": "string", "Store": "int64", "Brand": "int64",
+            "Description": "string", "Size": "string", "SalesQuantity": "int64",
+            "SalesDollars": "float64", "SalesPrice": "float64", "Volume": "float64",
+            "Classification": "int64", "ExciseTax": "float64", "VendorNo": "int64",
+            "VendorName": "string",
+        },
+        "dates": {"SalesDate": ["%m/%d/%Y", "%Y-%m-%d"]},
+        "categoricals": ["Description", "Size", "VendorName"],
+        "rename": {
+            "SalesDate": "InvoiceDate",
+            "SalesQuantity": "Quantity",
+            "SalesPrice": "UnitPrice",
+            "SalesDollars": "TotalAmount",
+            # opcionales: mantiene consistencia
+            "InventoryId": "InventoryId",
+            "Store": "Store",
+            "Brand": "Brand",
+            "Description": "ProductName",
+            "Size": "Size",
+            "Volume": "Volume",
+            "Classification": "Classification",
+            "ExciseTax": "ExciseTax",
+            "VendorNo": "VendorId",
+            "VendorName": "VendorName",
+        },
+    },
+}
@@ -0,0 +1,115 @@
+# src/dedupe.py
+"""
+Deduplicación por huella de fila.
+
+En vez de `drop_duplicates()` sobre la tabla ancha (que factoriza cada columna,
+incluidos textos largos como description o vendorname), cada fila se resume en
+una huella de ancho fijo (64 o 128 bits, hash vectorizado de pandas) y se
+deduplica sobre ese arreglo. Las categorías se hashean por su valor, así la
+misma fila da la misma huella en cualquier lote.
+
+FingerprintSet guarda las huellas ya vistas entre lotes (modo streaming) y,
+si se le da una ruta, entre corridas (.npy), para consumidores que agregan
+filas incrementalmente.
+"""
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# segunda clave de hash (16 bytes) para la mitad baja de la huella de 128 bits
+_HASH_KEY_LO = "inventario_lo_16"
+_FP128 = np.dtype([("hi", "u8"), ("lo", "u8")])
+_MAX_RUNS = 8        # tramos ordenados pendientes antes de consolidar
+
+
+def row_fingerprints(df: pd.DataFrame, bits: int = 64, subset: list[str] | None = None) -> np.ndarray:
+    """Huella por fila: uint64 (bits=64) o registro (hi, lo) de 2×uint64 (bits=128)."""
+    if subset is not None:
+        df = df[subset]
+    hi = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    if bits == 64:
+        return hi
+    if bits != 128:
+        raise ValueError(f"bits debe ser 64 o 128 (recibí {bits})")
+    out = np.empty(len(df), dtype=_FP128)
+    out["hi"] = hi
+    out["lo"] = pd.util.hash_pandas_object(df, index=False, hash_key=_HASH_KEY_LO).to_numpy()
+    return out
+
+def first_occurrence(fp: np.ndarray) -> np.ndarray:
+    """Máscara de la primera aparición de cada huella (como keep='first')."""
+    if fp.dtype.names is None:
+        return ~pd.Series(fp).duplicated().to_numpy()       # tabla hash, sin ordenar
+    _, idx = np.unique(fp, return_index=True)
+    mask = np.zeros(len(fp), dtype=bool)
+    mask[idx] = True
+    return mask
+
+
+class FingerprintSet:
+    """
+    Conjunto de huellas ya vistas: arreglo ordenado + unos pocos tramos
+    ordenados recientes (se consolidan cada _MAX_RUNS lotes), así agregar un
+    lote no reordena todo el conjunto. Con `path` se carga y guarda en .npy.
+    """
+
+    def __init__(self, path: Path | None = None, bits: int = 64):
+        self.path = Path(path) if path is not None else None
+        self.dtype = np.dtype("u8") if bits == 64 else _FP128
+        self._runs: list[np.ndarray] = []
+        self._main = np.empty(0, dtype=self.dtype)
+        if self.path is not None and self.path.exists():
+            self._main = np.load(self.path)
+            if self._main.dtype != self.dtype:
+                raise ValueError(f"{self.path} tiene huellas {self._main.dtype}, se esperaban {self.dtype}")
+
+    def __len__(self) -> int:
+        return len(self._main) + sum(len(r) for r in self._runs)
+
+    def contains(self, fp: np.ndarray) -> np.ndarray:
+        seen = np.zeros(len(fp), dtype=bool)
+        for arr in (self._main, *self._runs):
+            if len(arr):
+                pos = np.minimum(np.searchsorted(arr, fp), len(arr) - 1)
+                seen |= arr[pos] == fp
+        return seen
+
+    def add(self, fp: np.ndarray):
+        """Agrega huellas (se asume que no estaban en el conjunto)."""
+        if len(fp):
+            self._runs.append(np.sort(fp))
+        if len(self._runs) >= _MAX_RUNS:
+            self._main = np.sort(np.concatenate([self._main, *self._runs]), kind="stable")
+            self._runs = []
+
+    def save(self, path: Path | None = None):
+        path = Path(path or self.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        values = np.sort(np.concatenate([self._main, *self._runs]), kind="stable")
+        tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npy")
+        np.save(tmp, values)
+        os.replace(tmp, path)
+
+
+def dedupe(df: pd.DataFrame, seen: FingerprintSet | None = None, bits: int = 64,
+           subset: list[str] | None = None) -> tuple[pd.DataFrame, dict]:
+    """
+    Quita filas repetidas (conserva la primera). Con `seen` también quita las
+    que ya aparecieron en lotes/corridas anteriores y registra las nuevas.
+    Devuelve (df sin duplicados, conteos).
+    """
+    fp = row_fingerprints(df, seen.dtype.itemsize * 8 if seen is not None else bits, subset)
+    first = first_occurrence(fp)
+    keep = first.copy()
+    if seen is not None:
+        keep[first] = ~seen.contains(fp[first])
+        seen.add(fp[keep])
+    stats = {
+        "rows_in": len(df),
+        "duplicates_batch": int((~first).sum()),
+        "duplicates_seen": int(first.sum() - keep.sum()),
+        "rows_out": int(keep.sum()),
+    }
+    return (df if keep.all() else df[keep]), stats
@@ -0,0 +1,113 @@
+# src/dimensions.py
+"""
+Dimensiones compartidas: IDs enteros compactos y estables para las claves que
+cruzan tablas (inventoryid, tienda, marca, proveedor).
+
+Cada tabla trae esas claves con tipos distintos (brand como texto en una y
+número en otra, VendorNo/VendorNumber, ...). Al transformar se normaliza el
+valor (texto sin espacios, en mayúsculas; números enteros sin ".0") y se
+agrega una columna `<dim>_id` (int32). El mapeo valor -> id vive en
+data/processed/dims/dim_<dim>.parquet: los IDs ya asignados no cambian entre
+corridas y los valores nuevos reciben el siguiente ID libre.
+
+Los transforms corren en paralelo, así que la asignación se hace con un
+candado de archivo por dimensión (solo cubre leer/agregar/guardar los valores
+únicos, no la tabla).
+"""
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# dimensión -> columnas (ya normalizadas) donde puede venir la clave
+DIMENSIONS = {
+    "inventory": ("inventoryid",),
+    "store": ("store",),
+    "brand": ("brand",),
+    "vendor": ("vendorid", "vendornumber", "vendorno"),
+}
+DIMS_DIR_NAME = "dims"
+LOCK_TIMEOUT = 120      # segundos esperando el candado antes de fallar
+
+
+def dims_dir(processed: Path) -> Path:
+    return processed / DIMS_DIR_NAME
+
+def dim_path(processed: Path, dim: str) -> Path:
+    return dims_dir(processed) / f"dim_{dim}.parquet"
+
+def load_dim(processed: Path, dim: str) -> pd.DataFrame:
+    """Tabla id -> value de una dimensión (vacía si aún no existe)."""
+    path = dim_path(processed, dim)
+    if not path.exists():
+        return pd.DataFrame({"id": pd.Series([], dtype="int32"), "value": pd.Series([], dtype=object)})
+    return pd.read_parquet(path)
+
+@contextmanager
+def _file_lock(path: Path):
+    """Candado entre procesos con un archivo creado en exclusiva (portable)."""
+    lock = path.with_suffix(".lock")
+    lock.parent.mkdir(parents=True, exist_ok=True)
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"No pude tomar {lock} (¿quedó de una corrida interrumpida?)")
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        lock.unlink(missing_ok=True)
+
+
+def canonical_keys(values) -> pd.Series:
+    """Valor canónico de una clave: enteros sin decimales, texto sin espacios y en mayúsculas."""
+    s = pd.Series(values)
+    if pd.api.types.is_float_dtype(s) and (s.dropna() % 1 == 0).all():
+        s = s.astype("Int64")
+    out = s.astype("string").str.strip().str.upper()
+    return out.astype(object).where(out.notna(), None)
+
+def intern(values: pd.Series, processed: Path, dim: str) -> pd.Series:
+    """
+    IDs enteros (Int32, <NA> para nulos) de `values` en la dimensión `dim`.
+    Solo se canonicalizan y buscan los valores únicos; los nuevos se agregan
+    a la dimensión persistida.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    keys = canonical_keys(np.asarray(uniques, dtype=object)) if len(uniques) else pd.Series([], dtype=object)
+    # varios valores crudos pueden caer en la misma clave canónica ("12" y 12.0)
+    key_codes, distinct = pd.factorize(keys, use_na_sentinel=True)
+    path = dim_path(processed, dim)
+    with _file_lock(path):
+        table = load_dim(processed, dim)
+        pos = pd.Index(table["value"]).get_indexer(distinct)
+        fresh = pos < 0
+        if fresh.any():
+            start = int(table["id"].max()) + 1 if len(table) else 0
+            new_ids = np.arange(start, start + int(fresh.sum()), dtype="int32")
+            table = pd.concat([table, pd.DataFrame({"id": new_ids, "value": np.asarray(distinct, dtype=object)[fresh]})],
+                              ignore_index=True)
+            tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp")
+            table.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+            pos[fresh] = np.arange(len(table) - len(new_ids), len(table))
+    distinct_ids = table["id"].to_numpy(dtype="int32")[pos] if len(pos) else np.empty(0, dtype="int32")
+    ids = np.where(key_codes >= 0, distinct_ids[np.maximum(key_codes, 0)] if len(distinct_ids) else -1, -1)
+    out = np.where(codes >= 0, ids[np.maximum(codes, 0)] if len(ids) else -1, -1)
+    return pd.Series(pd.arrays.IntegerArray(out.astype("int32"), out < 0), index=values.index)
+
+def add_key_ids(df: pd.DataFrame, processed: Path) -> pd.DataFrame:
+    """Agrega `<dim>_id` por cada dimensión cuya columna esté en `df`."""
+    for dim, candidates in DIMENSIONS.items():
+        col = next((c for c in candidates if c in df.columns), None)
+        if col is not None:
+            df[f"{dim}_id"] = intern(df[col], processed, dim)
+    return df
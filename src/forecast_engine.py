@@ -0,0 +1,267 @@
+# src/forecast_engine.py
+"""
+Pronóstico semanal por serie (marca y tienda×marca) en lote.
+
+Para cada serie se hace lo mismo que el notebook 02_forecast con la serie
+global: split train/test (hasta 8 semanas), ajuste de naive, Holt-Winters y
+SARIMA, elección por RMSE (empates: holt > sarima > naive) y pronóstico de
+H_FUTURE semanas reajustando el modelo elegido con la serie completa.
+
+- Series cortas (< MIN_WEEKS semanas) o esparsas (< MIN_NONZERO de semanas
+  con venta) no se ajustan: se pronostican con naive y quedan marcadas en
+  `status`.
+- Si un modelo falla al ajustar se descarta. Si el elegido falla al
+  reajustar, o su pronóstico sale del rango creíble (más de PLAUSIBLE_FACTOR
+  veces el máximo histórico), se usa el siguiente modelo por RMSE o naive
+  (status "fallback").
+
+Cada serie guarda `sigma`: el desvío de los errores a un paso dentro de la
+muestra del ajuste que produjo el pronóstico (no del backtest).
+
+Las series se reparten en bloques entre un pool de procesos; todo (pronóstico
+y métricas) se escribe en un solo parquet.
+
+Uso:
+    python -m src.forecast_engine --workers 8 [--scaling 1,2,4,8] [--csv]
+"""
+import argparse
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.config import PROCESSED_DIR, PARQUET_OPTIONS
+from src import sales_cube
+
+FREQ = "W-SUN"          # semana terminando en domingo (como el notebook)
+H_FUTURE = 12           # semanas a pronosticar
+MIN_WEEKS = 4           # menos semanas -> serie corta
+MIN_NONZERO = 0.2       # menos % de semanas con venta -> serie esparsa
+CHUNK_SERIES = 64       # series por tarea del pool
+PLAUSIBLE_FACTOR = 10   # pronóstico > 10× el máximo histórico -> se rechaza
+
+# Niveles a pronosticar: nombre -> columnas clave
+FORECAST_LEVELS = {
+    "brand": ("brand",),
+    "store_brand": ("store", "brand"),
+}
+FORECAST_KEY_COLUMNS = ["store", "brand"]
+
+MODEL_PRIORITY = {"holt": 0, "sarima": 1, "naive": 2}
+
+
+# ===================== series =====================
+
+def weekly_series(sales: pd.DataFrame, keys, date_col: str = "invoicedate",
+                  qty_col: str = "quantity") -> list[tuple[tuple, pd.Timestamp, np.ndarray]]:
+    """
+    (clave, primera semana, valores semanales) por serie. Cada serie va de su
+    primera semana con venta a la última semana del dataset, con ceros en las
+    semanas sin venta. Un solo groupby para todas las claves.
+    """
+    keys = list(keys)
+    dates = pd.to_datetime(sales[date_col], errors="coerce")
+    week = dates.dt.to_period(FREQ).dt.to_timestamp(how="end").dt.normalize()
+    df = pd.DataFrame({**{k: sales[k] for k in keys}, "week": week,
+                       "qty": pd.to_numeric(sales[qty_col], errors="coerce").fillna(0.0)})
+    df = df.dropna(subset=["week", *keys])
+    if df.empty:
+        return []
+
+    weekly = df.groupby([*keys, "week"], observed=True, sort=True)["qty"].sum().reset_index()
+    last_week = weekly["week"].max()
+    codes = weekly.groupby(keys, observed=True, sort=True).ngroup().to_numpy()
+    offset = ((weekly["week"] - weekly["week"].min()).dt.days // 7).to_numpy()
+    bounds = np.flatnonzero(np.diff(codes)) + 1
+    starts = np.r_[0, bounds]
+
+    out = []
+    key_values = weekly[keys].to_numpy(dtype=object)
+    last_offset = int((last_week - weekly["week"].min()).days // 7)
+    for lo, hi in zip(starts, np.r_[bounds, len(weekly)]):
+        first = int(offset[lo])
+        values = np.zeros(last_offset - first + 1)
+        values[offset[lo:hi] - first] = weekly["qty"].to_numpy()[lo:hi]
+        out.append((tuple(key_values[lo]), weekly["week"].iloc[lo], values))
+    return out
+
+
+# ===================== modelos =====================
+
+def _fit_hw(y: np.ndarray):
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
+    use_seasonal = len(y) >= 24
+    model = ExponentialSmoothing(
+        y, trend="add",
+        seasonal=("add" if use_seasonal else None),
+        seasonal_periods=(12 if use_seasonal else None),
+        initialization_method="estimated"
+    )
+    return model.fit(optimized=True)
+
+def sarima_model(y: np.ndarray, seasonal: bool):
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+    return SARIMAX(y, order=(1, 1, 1), seasonal_order=(1, 0, 1, 12) if seasonal else (0, 0, 0, 0),
+                   enforce_stationarity=False, enforce_invertibility=False)
+
+def _fit_sarima(y: np.ndarray):
+    return sarima_model(y, seasonal=len(y) >= 24).fit(disp=False)
+
+def plausible(fc: np.ndarray, y: np.ndarray) -> bool:
+    """¿Pronóstico finito y dentro de PLAUSIBLE_FACTOR veces el máximo de la historia `y`?"""
+    bound = PLAUSIBLE_FACTOR * max(float(np.abs(y).max()) if len(y) else 0.0, 1.0)
+    return bool(np.isfinite(fc).all() and np.abs(fc).max() <= bound)
+
+def _naive_sigma(y: np.ndarray) -> float:
+    return float(np.sqrt(np.mean(np.diff(y) ** 2))) if len(y) > 1 else np.nan
+
+def _forecast(name: str, y: np.ndarray, steps: int) -> tuple[np.ndarray, float]:
+    """(pronóstico, desvío de los errores a un paso dentro de la muestra del mismo ajuste)."""
+    if name == "naive":
+        return np.repeat(y[-1], steps), _naive_sigma(y)
+    if name == "holt":
+        fit = _fit_hw(y)
+        sigma = float(np.sqrt(fit.sse / len(y)))
+    else:
+        fit = _fit_sarima(y)
+        burn = min(13, len(y) // 2)            # arranque difuso del filtro
+        sigma = float(np.sqrt(np.mean(fit.forecasts_error[0][burn:] ** 2)))
+    fc = np.asarray(fit.forecast(steps), dtype="float64")
+    if not plausible(fc, y):
+        raise ValueError(f"{name}: pronóstico no finito o fuera de rango")
+    return fc, sigma
+
+_MIN_TRAIN = {"naive": 1, "holt": 3, "sarima": 10}
+
+def forecast_series(y: np.ndarray, h_future: int = H_FUTURE) -> dict:
+    """Backtest + selección + pronóstico futuro para una serie semanal."""
+    n = len(y)
+    res = {"n_weeks": n, "rmse_naive": np.nan, "rmse_holt": np.nan, "rmse_sarima": np.nan,
+           "mape": np.nan}
+    nonzero = float((y > 0).mean()) if n else 0.0
+    if n < MIN_WEEKS or nonzero < MIN_NONZERO:
+        status = "corta" if n < MIN_WEEKS else "esparsa"
+        return {**res, "model": "naive", "status": status, "rmse": np.nan,
+                "sigma": _naive_sigma(y), "forecast": np.repeat(y[-1] if n else 0.0, h_future)}
+
+    h = min(8, max(1, n // 4))
+    train, test = y[:-h], y[-h:]
+    scores, preds = {}, {}
+    for name, min_train in _MIN_TRAIN.items():
+        if len(train) < min_train:
+            continue
+        try:
+            preds[name] = _forecast(name, train, h)[0]
+        except Exception:
+            continue
+        scores[name] = float(np.sqrt(np.mean((test - preds[name]) ** 2)))
+        res[f"rmse_{name}"] = scores[name]
+
+    ranked = sorted(scores, key=lambda m: (scores[m], MODEL_PRIORITY[m]))
+    nz = test != 0
+    if nz.any():
+        res["mape"] = float(np.mean(np.abs((test[nz] - preds[ranked[0]][nz]) / test[nz])))
+    # el reajuste con la serie completa puede divergir: se prueba el siguiente por RMSE
+    best, fc = "naive", None
+    for name in ranked:
+        try:
+            fc, sigma = _forecast(name, y, h_future)
+        except Exception:
+            continue
+        best = name
+        break
+    if fc is None:
+        fc, sigma = _forecast("naive", y, h_future)
+    status = "ok" if best == ranked[0] else "fallback"
+    return {**res, "model": best, "status": status, "rmse": scores.get(best, np.nan),
+            "sigma": sigma, "forecast": np.clip(fc, 0.0, None)}
+
+def _forecast_chunk(chunk: list[tuple[tuple, pd.Timestamp, np.ndarray]], h_future: int) -> list[dict]:
+    out = []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")   # statsmodels avisa por cada serie que no converge
+        for key, start, values in chunk:
+            res = forecast_series(values, h_future)
+            res["key"], res["start"] = key, start
+            out.append(res)
+    return out
+
+
+# ===================== lote =====================
+
+def run_forecasts(series: list, workers: int | None = None, h_future: int = H_FUTURE) -> list[dict]:
+    """Pronostica todas las series repartiéndolas en bloques entre `workers` procesos."""
+    chunks = [series[i:i + CHUNK_SERIES] for i in range(0, len(series), CHUNK_SERIES)]
+    if workers == 1:
+        return [r for chunk in chunks for r in _forecast_chunk(chunk, h_future)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_forecast_chunk, chunks, [h_future] * len(chunks))
+        return [r for chunk in results for r in chunk]
+
+def results_frame(level: str, keys, series: list, results: list[dict], h_future: int = H_FUTURE) -> pd.DataFrame:
+    """Formato largo: una fila por serie × semana futura, con las métricas de la serie."""
+    if not results:
+        return pd.DataFrame()
+    last_week = series[0][1] + pd.Timedelta(weeks=len(series[0][2]) - 1)
+    weeks = pd.date_range(last_week, periods=h_future + 1, freq=FREQ)[1:]
+    meta = pd.DataFrame([{k: v for k, v in r.items() if k not in ("forecast", "key", "start")}
+                         for r in results])
+    meta.insert(0, "level", level)
+    for i, k in enumerate(FORECAST_KEY_COLUMNS):
+        meta.insert(1 + i, k, [r["key"][keys.index(k)] if k in keys else None for r in results])
+    out = meta.loc[meta.index.repeat(h_future)].reset_index(drop=True)
+    out.insert(len(FORECAST_KEY_COLUMNS) + 1, "week", np.tile(weeks, len(results)))
+    out.insert(len(FORECAST_KEY_COLUMNS) + 2, "forecast_qty",
+               np.concatenate([r["forecast"] for r in results]))
+    return out
+
+def load_weekly_sales(extra: tuple = ()) -> pd.DataFrame:
+    """Ventas (store, brand, [extra], invoicedate, quantity) para armar las series semanales."""
+    if (sales_cube.cube_dir(PROCESSED_DIR) / "weekly").exists():
+        # cubo semanal ya agregado (src/sales_cube.py): mismas series, mucho menos para leer
+        sales = sales_cube.read_cube("weekly", columns=["store", "brand", *extra, "week", "quantity"])
+        sales = sales.rename(columns={"week": "invoicedate"})
+    else:
+        sales = pd.read_parquet(PROCESSED_DIR / "sales_clean.parquet",
+                                columns=["store", "brand", *extra, "invoicedate", "quantity"])
+    sales["brand"] = sales["brand"].astype(str)
+    return sales
+
+def main(workers: int | None = None, scaling: list[int] | None = None,
+         h_future: int = H_FUTURE, export_csv: bool = False):
+    sales = load_weekly_sales()
+    jobs = [(level, list(keys), weekly_series(sales, keys)) for level, keys in FORECAST_LEVELS.items()]
+    total = sum(len(s) for _, _, s in jobs)
+
+    # --scaling 1,2,4: mide series/s con cada cantidad de procesos (se guarda la última)
+    for n_workers in (scaling or [workers]):
+        start = time.perf_counter()
+        frames = [results_frame(level, keys, series, run_forecasts(series, n_workers, h_future), h_future)
+                  for level, keys, series in jobs]
+        secs = time.perf_counter() - start
+        print(f"⏱️ workers={n_workers or 'auto'}: {total} series en {secs:.2f}s "
+              f"({total / max(secs, 1e-9):.1f} series/s)")
+
+    out = pd.concat([f for f in frames if not f.empty], ignore_index=True)
+    out["store"] = out["store"].astype("Int64")
+    path = PROCESSED_DIR / "forecasts_weekly.parquet"
+    out.to_parquet(path, index=False, **PARQUET_OPTIONS)
+    if export_csv:
+        out.to_csv(PROCESSED_DIR / "forecasts_weekly.csv", index=False)
+    summary = out.drop_duplicates(["level", "store", "brand"]).groupby(["level", "model", "status"]).size()
+    print(summary.to_string())
+    print(f"✅ forecasts_weekly: {len(out)} filas | {path}")
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pronóstico semanal por marca y tienda×marca")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="procesos en paralelo (por defecto: núcleos disponibles)")
+    parser.add_argument("--scaling", type=lambda s: [int(x) for x in s.split(",")], default=None,
+                        help="lista de workers para medir series/s, p. ej. 1,2,4,8")
+    parser.add_argument("--horizon", type=int, default=H_FUTURE, help="semanas a pronosticar")
+    parser.add_argument("--csv", action="store_true", help="exporta también CSV")
+    args = parser.parse_args()
+    main(workers=args.workers, scaling=args.scaling, h_future=args.horizon, export_csv=args.csv)
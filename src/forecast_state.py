@@ -0,0 +1,387 @@
+# src/forecast_state.py
+"""
+Pronóstico semanal incremental: estado ajustado por serie + backtest con
+origen móvil.
+
+src/forecast_engine.py reajusta Holt-Winters y SARIMA desde cero (optimizando)
+en cada corrida y evalúa un solo corte train/test. Aquí cada serie guarda su
+estado en data/processed/forecast_state.parquet:
+
+- Holt-Winters: alpha/beta/gamma y el último nivel, tendencia y estacionalidad;
+  una semana nueva se incorpora con las recurrencias de suavizado.
+- SARIMA: parámetros y el estado predicho del filtro de Kalman (media y
+  covarianza); las semanas nuevas se filtran desde ese estado, sin optimizar
+  (equivale a `SARIMAXResults.append`).
+
+La reoptimización completa solo corre si la serie es nueva o cambió su
+historia, cada REFIT_WEEKS semanas (calendario) o si el error a un paso
+desde el último ajuste supera DRIFT_RATIO veces el del ajuste (drift).
+
+Al reajustar se hace un backtest con origen móvil: cada modelo se ajusta una
+vez con la historia hasta el primer corte y se filtra el resto; el pronóstico
+a 1..BACKTEST_H semanas desde cada origen sale del estado filtrado en ese
+punto, sin reajustar. El modelo de la serie (naive, holt o sarima) se elige
+por el RMSE de ese backtest; si su ajuste con la serie completa falla o
+pronostica fuera de rango (forecast_engine.plausible) se usa el siguiente, o
+naive (status "fallback"). Un modelo filtrado que se sale de rango fuerza
+un reajuste.
+
+Uso:
+    python -m src.forecast_state [--workers 8] [--full] [--csv]
+"""
+import argparse
+import hashlib
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.config import PROCESSED_DIR, PARQUET_OPTIONS
+from src import forecast_engine as fe
+
+STATE_NAME = "forecast_state"
+BACKTEST_NAME = "forecast_backtest"
+FORECAST_NAME = "forecasts_incremental"
+
+REFIT_WEEKS = 13        # reoptimización por calendario
+DRIFT_RATIO = 1.5       # RMSE a un paso desde el ajuste / RMSE del ajuste
+DRIFT_MIN_WEEKS = 4     # semanas nuevas mínimas para evaluar drift
+BACKTEST_H = 8          # semanas pronosticadas desde cada origen
+MIN_BACKTEST_TRAIN = 12  # historia mínima antes del primer corte
+MODELS = ("naive", "holt", "sarima")
+
+STATE_COLUMNS = ["level", *fe.FORECAST_KEY_COLUMNS, "start", "n_weeks", "checksum", "fitted_weeks",
+                 "model", "rmse", "sigma", "err_sq", "err_n", "last_value",
+                 "holt_params", "holt_state", "sarima_seasonal", "sarima_params", "sarima_state",
+                 "sarima_cov"]
+
+
+def _checksum(y: np.ndarray) -> int:
+    return int.from_bytes(hashlib.blake2b(np.ascontiguousarray(y, dtype="float64").tobytes(),
+                                          digest_size=8).digest(), "little", signed=True)
+
+# ===================== Holt-Winters =====================
+# params = [alpha, beta, gamma, m]; state = [nivel, tendencia, s_{t-m+1}, ..., s_t] (m = 0 sin estacionalidad)
+
+def hw_fit(y: np.ndarray) -> tuple[np.ndarray, np.ndarray, float]:
+    fit = fe._fit_hw(y)
+    m = int(fit.model.seasonal_periods or 0) if fit.model.seasonal else 0
+    gamma = fit.params["smoothing_seasonal"] if m else 0.0
+    params = np.array([fit.params["smoothing_level"], fit.params["smoothing_trend"], gamma, m], dtype="float64")
+    state = np.r_[fit.level[-1], fit.trend[-1], np.asarray(fit.season[-m:]) if m else []]
+    return params, state.astype("float64"), float(np.sqrt(fit.sse / len(y)))
+
+def hw_filter(params: np.ndarray, state: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Incorpora `y` al estado. Devuelve (estados antes de cada y y al final, errores a un paso)."""
+    alpha, beta, gamma, m = params
+    m = int(m)
+    states = np.empty((len(y) + 1, len(state)))
+    errors = np.empty(len(y))
+    states[0] = state
+    for i, value in enumerate(y):
+        level, trend, season = states[i, 0], states[i, 1], states[i, 2:]
+        s_old = season[0] if m else 0.0
+        errors[i] = value - (level + trend + s_old)
+        new_level = alpha * (value - s_old) + (1 - alpha) * (level + trend)
+        states[i + 1, 0] = new_level
+        states[i + 1, 1] = beta * (new_level - level) + (1 - beta) * trend
+        if m:
+            states[i + 1, 2:] = np.r_[season[1:], gamma * (value - level - trend) + (1 - gamma) * s_old]
+    return states, errors
+
+def hw_forecast(params: np.ndarray, states: np.ndarray, steps: int) -> np.ndarray:
+    """Pronóstico 1..steps desde uno (k,) o varios estados (n, k) -> (n, steps)."""
+    states = np.atleast_2d(states)
+    m = int(params[3])
+    h = np.arange(1, steps + 1)
+    fc = states[:, :1] + h * states[:, 1:2]
+    if m:
+        fc = fc + states[:, 2:][:, (h - 1) % m]
+    return fc
+
+# ===================== SARIMA (espacio de estados) =====================
+
+def sarima_fit(y: np.ndarray) -> tuple[bool, np.ndarray, np.ndarray, np.ndarray, float]:
+    """(estacional, parámetros, estado predicho para la semana siguiente, su covarianza, sigma)."""
+    res = fe._fit_sarima(y)
+    seasonal = len(y) >= 24
+    errors = res.forecasts_error[0]
+    burn = min(13, len(y) // 2)            # arranque difuso del filtro
+    sigma = float(np.sqrt(np.mean(errors[burn:] ** 2)))
+    return seasonal, np.asarray(res.params), res.predicted_state[:, -1].copy(), \
+        res.predicted_state_cov[:, :, -1].copy(), sigma
+
+def sarima_filter(seasonal: bool, params: np.ndarray, a: np.ndarray, P: np.ndarray, y: np.ndarray):
+    """Filtra `y` desde el estado (a, P) con parámetros fijos: (estados predichos (k, len+1), cov final, errores)."""
+    model = fe.sarima_model(y, seasonal)
+    model.ssm.initialize_known(a, P.reshape(len(a), len(a)))
+    res = model.filter(params)
+    return res.predicted_state, res.predicted_state_cov[:, :, -1], res.forecasts_error[0]
+
+def sarima_forecast(seasonal: bool, params: np.ndarray, states: np.ndarray, steps: int) -> np.ndarray:
+    """Pronóstico 1..steps desde estados predichos (k,) o (k, n) -> (n, steps): y = Z a + d, a <- T a + c."""
+    model = fe.sarima_model(np.zeros(2), seasonal)
+    model.update(params)
+    Z, T = model.ssm["design"][0], model.ssm["transition"]
+    d, c = model.ssm["obs_intercept"][0], model.ssm["state_intercept"]
+    a = states.reshape(len(states), -1)
+    out = np.empty((a.shape[1], steps))
+    for h in range(steps):
+        out[:, h] = Z @ a + d
+        a = T @ a + c[:, None]
+    return out
+
+# ===================== backtest con origen móvil =====================
+
+def rolling_backtest(y: np.ndarray, horizon: int = BACKTEST_H) -> tuple[dict, pd.DataFrame]:
+    """
+    Errores por modelo y horizonte desde cada origen c0..n-1 (c0 = mitad de la
+    serie, al menos MIN_BACKTEST_TRAIN). Un solo ajuste por modelo, en y[:c0].
+    Devuelve (RMSE total por modelo, tabla modelo × horizonte).
+    """
+    n = len(y)
+    c0 = max(MIN_BACKTEST_TRAIN, n // 2)
+    origins = np.arange(c0, n)
+    target = origins[:, None] + np.arange(horizon)                # índice del valor pronosticado
+    valid = target < n
+    actual = np.where(valid, y[np.minimum(target, n - 1)], np.nan)
+
+    forecasts = {"naive": np.repeat(y[origins - 1][:, None], horizon, axis=1)}
+    try:
+        params, state, _ = hw_fit(y[:c0])
+        states, _ = hw_filter(params, state, y[c0:])
+        forecasts["holt"] = hw_forecast(params, states[:-1], horizon)
+    except Exception:
+        pass
+    try:
+        seasonal, params, a, P, _ = sarima_fit(y[:c0])
+        states, _, _ = sarima_filter(seasonal, params, a, P, y[c0:])
+        forecasts["sarima"] = sarima_forecast(seasonal, params, states[:, :-1], horizon)
+    except Exception:
+        pass
+
+    rows, scores = [], {}
+    for name, fc in forecasts.items():
+        err = fc - actual
+        if not np.isfinite(err[valid]).all():
+            continue
+        scores[name] = float(np.sqrt(np.nanmean(err[valid] ** 2)))
+        for h in range(horizon):
+            e = err[valid[:, h], h]
+            rows.append({"model": name, "horizon": h + 1, "n_origins": len(e),
+                         "rmse": float(np.sqrt(np.mean(e ** 2))), "mae": float(np.mean(np.abs(e)))})
+    return scores, pd.DataFrame(rows)
+
+# ===================== estado por serie =====================
+
+def _empty_state() -> dict:
+    return {c: None for c in STATE_COLUMNS}
+
+def refit(y: np.ndarray, h_future: int = fe.H_FUTURE) -> tuple[dict, pd.DataFrame, bool]:
+    """
+    Reoptimización completa: backtest, ajuste con toda la serie y elección del
+    mejor modelo por RMSE cuyo pronóstico sea creíble (fe.plausible). Devuelve
+    (estado, backtest, ¿se cayó a otro modelo que el mejor del backtest?).
+    """
+    scores, backtest = ({"naive": np.nan}, pd.DataFrame())
+    if len(y) > MIN_BACKTEST_TRAIN:
+        scores, backtest = rolling_backtest(y)
+    state = _empty_state()
+    sigmas = {"naive": float(np.sqrt(np.mean(np.diff(y) ** 2))) if len(y) > 1 else np.nan}
+    if "holt" in scores:
+        try:
+            state["holt_params"], state["holt_state"], sigmas["holt"] = hw_fit(y)
+        except Exception:
+            state["holt_params"] = None
+    if "sarima" in scores:
+        try:
+            seasonal, params, a, P, sigmas["sarima"] = sarima_fit(y)
+            state.update(sarima_seasonal=seasonal, sarima_params=params, sarima_state=a, sarima_cov=P.ravel())
+        except Exception:
+            state["sarima_params"] = None
+    state.update(fitted_weeks=len(y), err_sq=0.0, err_n=0, last_value=float(y[-1]))
+
+    candidates = [m for m in MODELS if m in scores and np.isfinite(scores[m])] or ["naive"]
+    ranked = sorted(candidates, key=lambda m: (scores.get(m, np.inf), fe.MODEL_PRIORITY[m]))
+    # el ajuste con la serie completa puede fallar o divergir: se usa el siguiente, o naive
+    usable = [m for m in ranked if m == "naive" or (
+        state[f"{m}_params"] is not None and fe.plausible(model_forecast(state, m, h_future), y))]
+    state["model"] = usable[0] if usable else "naive"
+    state["rmse"] = scores.get(state["model"], np.nan)
+    state["sigma"] = sigmas[state["model"]]
+    return state, backtest, state["model"] != ranked[0]
+
+def advance(state: dict, y_new: np.ndarray) -> dict:
+    """Incorpora semanas nuevas a los estados guardados y acumula el error a un paso del modelo elegido."""
+    state = dict(state)
+    errors = {"naive": np.diff(np.r_[state["last_value"], y_new])}
+    if state["holt_params"] is not None:
+        states, errors["holt"] = hw_filter(state["holt_params"], state["holt_state"], y_new)
+        state["holt_state"] = states[-1]
+    if state["sarima_params"] is not None:
+        states, cov, errors["sarima"] = sarima_filter(state["sarima_seasonal"], state["sarima_params"],
+                                                      state["sarima_state"], state["sarima_cov"], y_new)
+        state["sarima_state"], state["sarima_cov"] = states[:, -1], cov.ravel()
+    e = errors[state["model"]]
+    state["err_sq"] = float(state["err_sq"]) + float(np.sum(e ** 2))
+    state["err_n"] = int(state["err_n"]) + len(e)
+    return state
+
+def refit_reason(state: dict | None, y: np.ndarray) -> str | None:
+    """Motivo de reoptimización completa, o None si alcanza con filtrar las semanas nuevas."""
+    if state is None:
+        return "nueva"
+    n_prev = int(state["n_weeks"])
+    if n_prev > len(y) or _checksum(y[:n_prev]) != state["checksum"]:
+        return "revisada"                             # cambió la historia ya filtrada
+    if len(y) - int(state["fitted_weeks"]) >= REFIT_WEEKS:
+        return "calendario"
+    return None
+
+def _drifted(state: dict) -> bool:
+    if int(state["err_n"]) < DRIFT_MIN_WEEKS or not np.isfinite(state["sigma"] or np.nan):
+        return False
+    return np.sqrt(state["err_sq"] / state["err_n"]) > DRIFT_RATIO * max(state["sigma"], 1e-9)
+
+def model_forecast(state: dict, model: str, steps: int) -> np.ndarray:
+    """Pronóstico 1..steps de `model` desde el estado guardado (sin recortar)."""
+    if model == "holt":
+        return hw_forecast(state["holt_params"], state["holt_state"], steps)[0]
+    if model == "sarima":
+        return sarima_forecast(state["sarima_seasonal"], state["sarima_params"], state["sarima_state"], steps)[0]
+    return np.repeat(state["last_value"], steps)
+
+def forecast_state(state: dict, steps: int) -> np.ndarray:
+    return np.clip(model_forecast(state, state["model"], steps), 0.0, None)
+
+def update_series(y: np.ndarray, state: dict | None, h_future: int = fe.H_FUTURE):
+    """Una serie: filtra las semanas nuevas o reoptimiza. Devuelve (estado, resultado, backtest)."""
+    n = len(y)
+    nonzero = float((y > 0).mean()) if n else 0.0
+    if n < fe.MIN_WEEKS or nonzero < fe.MIN_NONZERO:
+        status = "corta" if n < fe.MIN_WEEKS else "esparsa"
+        result = {"n_weeks": n, "model": "naive", "status": status, "rmse": np.nan,
+                  "forecast": np.repeat(y[-1] if n else 0.0, h_future)}
+        return None, result, None
+
+    reason, backtest = refit_reason(state, y), None
+    if reason is None:
+        new = y[int(state["n_weeks"]):]
+        status = "sin cambios"
+        if len(new):
+            state, status = advance(state, new), "filtrada"
+            state["last_value"] = float(y[-1])
+            if _drifted(state):
+                reason = "drift"
+            elif not fe.plausible(model_forecast(state, state["model"], h_future), y):
+                reason = "fuera de rango"
+    if reason is not None:
+        state, backtest, fallback = refit(y, h_future)
+        status = "fallback" if fallback else f"reajuste ({reason})"
+    state.update(n_weeks=n, checksum=_checksum(y), last_value=float(y[-1]))
+    result = {"n_weeks": n, "model": state["model"], "status": status, "rmse": state["rmse"],
+              "forecast": forecast_state(state, h_future)}
+    return state, result, backtest
+
+def _update_chunk(chunk: list, h_future: int) -> list:
+    out = []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")   # statsmodels avisa por cada serie que no converge
+        for key, start, values, state in chunk:
+            out.append((key, start, *update_series(values, state, h_future)))
+    return out
+
+# ===================== lote =====================
+
+def _state_key(level: str, keys, row) -> tuple:
+    return level, tuple(row[k] for k in keys)
+
+def load_states(path) -> dict:
+    """(nivel, clave) -> estado; vacío si no hay archivo."""
+    if not path.exists():
+        return {}
+    df = pd.read_parquet(path)
+    states = {}
+    for row in df.to_dict("records"):
+        keys = fe.FORECAST_LEVELS[row["level"]]
+        row["store"] = None if pd.isna(row["store"]) else int(row["store"])
+        states[_state_key(row["level"], keys, row)] = row
+    return states
+
+def run_updates(series: list, states: dict, level: str, workers: int | None = None,
+                h_future: int = fe.H_FUTURE) -> list:
+    items = [(key, start, values, states.get((level, key))) for key, start, values in series]
+    chunks = [items[i:i + fe.CHUNK_SERIES] for i in range(0, len(items), fe.CHUNK_SERIES)]
+    if workers == 1:
+        return [r for chunk in chunks for r in _update_chunk(chunk, h_future)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [r for chunk in pool.map(_update_chunk, chunks, [h_future] * len(chunks)) for r in chunk]
+
+def main(workers: int | None = None, h_future: int = fe.H_FUTURE, full: bool = False,
+         export_csv: bool = False):
+    sales = fe.load_weekly_sales()
+    state_path = PROCESSED_DIR / f"{STATE_NAME}.parquet"
+    backtest_path = PROCESSED_DIR / f"{BACKTEST_NAME}.parquet"
+    states = {} if full else load_states(state_path)
+
+    start = time.perf_counter()
+    frames, state_rows, backtests = [], [], []
+    for level, keys in fe.FORECAST_LEVELS.items():
+        keys = list(keys)
+        series = fe.weekly_series(sales, keys)
+        updates = run_updates(series, states, level, workers, h_future)
+        results = []
+        for key, series_start, state, result, backtest in updates:
+            result["key"], result["start"] = key, series_start
+            results.append(result)
+            key_cols = {k: (key[keys.index(k)] if k in keys else None) for k in fe.FORECAST_KEY_COLUMNS}
+            if state is not None:
+                state_rows.append({**state, "level": level, **key_cols, "start": series_start})
+            if backtest is not None and not backtest.empty:
+                backtests.append(backtest.assign(level=level, **key_cols))
+        frames.append(fe.results_frame(level, keys, series, results, h_future))
+    secs = time.perf_counter() - start
+
+    out = pd.concat([f for f in frames if not f.empty], ignore_index=True)
+    out["store"] = out["store"].astype("Int64")
+    path = PROCESSED_DIR / f"{FORECAST_NAME}.parquet"
+    out.to_parquet(path, index=False, **PARQUET_OPTIONS)
+    if export_csv:
+        out.to_csv(PROCESSED_DIR / f"{FORECAST_NAME}.csv", index=False)
+
+    state_df = pd.DataFrame(state_rows, columns=STATE_COLUMNS)
+    state_df["store"] = state_df["store"].astype("Int64")
+    state_df.to_parquet(state_path, index=False, **PARQUET_OPTIONS)
+
+    # backtest: se reemplazan las series reajustadas en esta corrida
+    ids = ["level", *fe.FORECAST_KEY_COLUMNS]
+    new_bt = pd.concat(backtests, ignore_index=True) if backtests else pd.DataFrame(columns=[*ids, "model"])
+    if backtest_path.exists() and not full:
+        old_bt = pd.read_parquet(backtest_path)
+        refitted = pd.MultiIndex.from_frame(new_bt[ids].drop_duplicates().astype(object))
+        keep = ~pd.MultiIndex.from_frame(old_bt[ids].astype(object)).isin(refitted)
+        new_bt = pd.concat([old_bt[keep], new_bt], ignore_index=True)
+    if len(new_bt):
+        new_bt["store"] = new_bt["store"].astype("Int64")
+        new_bt = new_bt[[*ids, "model", "horizon", "n_origins", "rmse", "mae"]]
+    new_bt.to_parquet(backtest_path, index=False, **PARQUET_OPTIONS)
+
+    summary = out.drop_duplicates(["level", "store", "brand"]).groupby(["level", "status"]).size()
+    print(summary.to_string())
+    n_series = summary.sum()
+    print(f"⏱️ {n_series} series en {secs:.2f}s ({n_series / max(secs, 1e-9):.1f} series/s)")
+    print(f"✅ {FORECAST_NAME}: {len(out)} filas | {path}")
+    print(f"✅ {STATE_NAME}: {len(state_df)} series con estado | {BACKTEST_NAME}: {len(new_bt)} filas")
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pronóstico semanal incremental con backtest de origen móvil")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="procesos en paralelo (por defecto: núcleos disponibles)")
+    parser.add_argument("--horizon", type=int, default=fe.H_FUTURE, help="semanas a pronosticar")
+    parser.add_argument("--full", action="store_true", help="ignora el estado guardado y reajusta todo")
+    parser.add_argument("--csv", action="store_true", help="exporta también CSV")
+    args = parser.parse_args()
+    main(workers=args.workers, h_future=args.horizon, full=args.full, export_csv=args.csv)
@@ -0,0 +1,272 @@
+# src/hierarchical.py
+"""
+Pronóstico jerárquico: tienda×marca -> tienda, marca, proveedor y total.
+
+src/forecast_engine.py pronostica cada nivel por separado, así que la suma de
+las marcas no da el total ni la de tienda×marca da la marca, y cada nivel
+extra es otra tanda de ajustes. Aquí solo se ajustan las hojas (tienda×marca,
+en paralelo con forecast_engine.run_forecasts) y los demás niveles salen de
+la matriz de sumas S (dispersa, una fila por nodo y una columna por hoja):
+
+    total    = 1ᵀ b
+    vendor   = suma de las tienda×marca del proveedor de cada marca
+    store    = suma de las marcas de la tienda
+    brand    = suma de las tiendas de la marca
+    ỹ = S b̂   (bottom-up: coherente por construcción)
+
+Reconciliación opcional (--method ols|wls|mint): se ajustan además los nodos
+agregados (ŷ_a) y se busca el pronóstico coherente más cercano a todos los
+pronósticos base con pesos W diagonales:
+
+    ols  -> W = I
+    wls  -> W = hojas bajo cada nodo (escalado estructural)
+    mint -> W = varianza de los errores a un paso del ajuste que produjo
+            cada pronóstico base (MinT diagonal; la covarianza completa
+            sería densa n×n y no escala)
+
+Los pronósticos base que se salen de la historia de su serie ya vienen
+descartados de forecast_engine (siguiente modelo o naive). Si aun así el
+total reconciliado se aleja más de TOTAL_TOLERANCE del total base, se
+descarta la reconciliación y se usa bottom-up.
+
+Con S = [S_a; I] y W = diag(W_a, W_b), la solución de mínimos cuadrados
+generalizados se escribe como corrección de la incoherencia:
+
+    b̃ = b̂ + W_b S_aᵀ (W_a + S_a W_b S_aᵀ)⁻¹ (ŷ_a − S_a b̂)
+
+El sistema es k×k (k = nodos agregados, muchos menos que hojas) y disperso:
+se factoriza una vez (splu) y se resuelve para todas las semanas a la vez.
+Las hojas reconciliadas negativas se llevan a cero y los agregados se vuelven
+a sumar con S: sigue siendo coherente y no hay demanda negativa.
+
+Uso:
+    python -m src.hierarchical --workers 8 [--method bu|ols|wls|mint] [--horizon 12] [--csv]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu
+
+from src.config import PROCESSED_DIR, PARQUET_OPTIONS
+from src import forecast_engine as fe
+
+REPORT_NAME = "forecasts_hierarchical"
+LEAF_KEYS = ["store", "brand"]
+
+# Niveles de la jerarquía (de arriba a abajo): nombre -> columnas clave.
+# Tienda y marca/proveedor se cruzan (jerarquía agrupada): S lo admite igual.
+HIERARCHY = {
+    "total": (),
+    "vendor": ("vendorid",),
+    "store": ("store",),
+    "brand": ("brand",),
+    "store_brand": ("store", "brand"),
+}
+NODE_COLUMNS = ["level", "store", "brand", "vendorid"]
+METHODS = ("bu", "ols", "wls", "mint")
+MIN_VARIANCE = 1e-6
+TOTAL_TOLERANCE = 0.5   # |total reconciliado − total base| / total base
+
+
+# ===================== jerarquía =====================
+
+def leaf_frame(sales: pd.DataFrame, series: list) -> pd.DataFrame:
+    """Una fila por hoja (en el orden de `series`) con su proveedor: el de más unidades vendidas."""
+    top = (sales.groupby([*LEAF_KEYS, "vendorid"], observed=True, dropna=False)["quantity"].sum()
+                .reset_index()
+                .sort_values("quantity", ascending=False, kind="stable")
+                .drop_duplicates(LEAF_KEYS))
+    vendor = dict(zip(zip(top["store"], top["brand"]), top["vendorid"]))
+    leaves = pd.DataFrame([key for key, _, _ in series], columns=LEAF_KEYS)
+    leaves["vendorid"] = pd.array([vendor.get(key) for key, _, _ in series], dtype="Int64")
+    return leaves
+
+def summing_matrix(leaves: pd.DataFrame) -> tuple[sp.csr_matrix, pd.DataFrame]:
+    """
+    S dispersa (nodos × hojas, 0/1) y la tabla de nodos en el mismo orden de
+    filas: HIERARCHY de arriba a abajo; el último nivel son las hojas en su orden.
+    """
+    m = len(leaves)
+    rows, nodes, offset = [], [], 0
+    for level, cols in HIERARCHY.items():
+        if level == "store_brand":
+            codes = np.arange(m)
+            keys = leaves[[*LEAF_KEYS, "vendorid"]].copy()
+        elif not cols:
+            codes = np.zeros(m, dtype=np.int64)
+            keys = pd.DataFrame(index=[0])
+        else:
+            groups = leaves.groupby(list(cols), sort=True, dropna=False, observed=True)
+            codes = groups.ngroup().to_numpy()
+            keys = groups.size().reset_index()[list(cols)]
+        rows.append(offset + codes)
+        keys = keys.assign(level=level, n_leaves=np.bincount(codes, minlength=len(keys)))
+        nodes.append(keys.reindex(columns=[*NODE_COLUMNS, "n_leaves"])
+                         .astype({"store": "Int64", "brand": object, "vendorid": "Int64"}))
+        offset += len(keys)
+    data = np.ones(m * len(HIERARCHY))
+    S = sp.csr_matrix((data, (np.concatenate(rows), np.tile(np.arange(m), len(HIERARCHY)))), shape=(offset, m))
+    return S, pd.concat(nodes, ignore_index=True)
+
+def history_matrix(series: list) -> np.ndarray:
+    """Hojas × semanas (todas terminan en la última semana del dataset; ceros antes de su inicio)."""
+    T = max(len(y) for _, _, y in series)
+    Y = np.zeros((len(series), T))
+    for i, (_, _, y) in enumerate(series):
+        Y[i, T - len(y):] = y
+    return Y
+
+
+# ===================== reconciliación =====================
+
+def node_variance(results: list[dict], history: np.ndarray) -> np.ndarray:
+    """
+    Varianza del error por nodo: sigma² (errores a un paso del ajuste usado
+    para pronosticar); si no hay, la del naive (diferencias).
+    """
+    sigma = np.array([r.get("sigma", np.nan) for r in results], dtype="float64")
+    diffs = np.diff(history, axis=1)
+    naive = (diffs ** 2).mean(axis=1) if diffs.shape[1] else np.zeros(len(history))
+    var = np.where(np.isfinite(sigma), sigma ** 2, naive)
+    return np.maximum(var, MIN_VARIANCE)
+
+def reconcile(S: sp.csr_matrix, base: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    Hojas reconciliadas (m × h) a partir de los pronósticos base de todos los
+    nodos (n × h, orden de filas de S) y los pesos diagonales de W.
+    """
+    n, m = S.shape
+    k = n - m
+    S_a = S[:k]
+    w_a, w_b = weights[:k], weights[k:]
+    b_hat, y_a = base[k:], base[:k]
+    K = (sp.diags(w_a) + S_a @ sp.diags(w_b) @ S_a.T).tocsc()
+    correction = splu(K).solve(np.ascontiguousarray(y_a - S_a @ b_hat))
+    return b_hat + w_b[:, None] * (S_a.T @ correction)
+
+def _weights(method: str, nodes: pd.DataFrame, variance: np.ndarray | None) -> np.ndarray:
+    if method == "ols":
+        return np.ones(len(nodes))
+    if method == "wls":
+        return nodes["n_leaves"].to_numpy(dtype="float64")
+    return variance
+
+def incoherence(S: sp.csr_matrix, forecasts: np.ndarray) -> float:
+    """Máxima diferencia relativa entre cada nodo agregado y la suma de sus hojas."""
+    k = S.shape[0] - S.shape[1]
+    agg, sums = forecasts[:k], S[:k] @ forecasts[k:]
+    return float(np.max(np.abs(agg - sums) / np.maximum(np.abs(sums), 1.0))) if k else 0.0
+
+
+def total_drift(forecasts: np.ndarray, base: np.ndarray) -> float:
+    """Diferencia relativa entre el total del horizonte reconciliado y el base (fila 0 = total)."""
+    base_total = float(base[0].sum())
+    return abs(float(forecasts[0].sum()) - base_total) / max(abs(base_total), 1.0)
+
+# ===================== lote =====================
+
+def _base_columns(results: list[dict]) -> dict:
+    return {"model": [r["model"] for r in results], "status": [r["status"] for r in results]}
+
+def forecast_hierarchy(sales: pd.DataFrame, method: str = "bu", workers: int | None = None,
+                       h_future: int = fe.H_FUTURE) -> tuple[pd.DataFrame, dict]:
+    """Pronóstico coherente de todos los nodos (formato largo) y métricas de la corrida."""
+    if method not in METHODS:
+        raise ValueError(f"método desconocido: {method} (opciones: {', '.join(METHODS)})")
+    series = fe.weekly_series(sales, LEAF_KEYS)
+    if not series:
+        return pd.DataFrame(), {}
+    leaves = leaf_frame(sales, series)
+    S, nodes = summing_matrix(leaves)
+    n, m = S.shape
+    k = n - m
+    stats = {"leaves": m, "aggregates": k}
+
+    start = time.perf_counter()
+    leaf_results = fe.run_forecasts(series, workers, h_future)
+    b_hat = np.vstack([r["forecast"] for r in leaf_results])
+    stats["fit_leaves_s"] = time.perf_counter() - start
+    meta = {"model": [None] * k, "status": [None] * k}
+    for col, values in _base_columns(leaf_results).items():
+        meta[col] = meta[col] + values
+
+    if method == "bu":
+        forecasts = S @ b_hat
+        base = np.vstack([np.full((k, h_future), np.nan), b_hat])
+    else:
+        # pronósticos base de los agregados: series = S_a · historia de las hojas
+        start = time.perf_counter()
+        Y = history_matrix(series)
+        Y_a = np.asarray(S[:k] @ Y)
+        first = np.argmax(Y_a > 0, axis=1)
+        weeks = pd.date_range(end=series[0][1] + pd.Timedelta(weeks=len(series[0][2]) - 1),
+                              periods=Y.shape[1], freq=fe.FREQ)
+        agg_series = [((i,), weeks[first[i]], Y_a[i, first[i]:]) for i in range(k)]
+        agg_results = fe.run_forecasts(agg_series, workers, h_future)
+        stats["fit_aggregates_s"] = time.perf_counter() - start
+        for col, values in _base_columns(agg_results).items():
+            meta[col] = values + meta[col][k:]
+        base = np.vstack([np.vstack([r["forecast"] for r in agg_results]), b_hat])
+        stats["base_incoherence"] = incoherence(S, base)
+
+        variance = None
+        if method == "mint":
+            variance = np.concatenate([node_variance(agg_results, Y_a), node_variance(leaf_results, Y)])
+        start = time.perf_counter()
+        leaves_fc = reconcile(S, base, _weights(method, nodes, variance))
+        stats["negative_leaves"] = float((leaves_fc < 0).mean())
+        forecasts = S @ np.clip(leaves_fc, 0.0, None)
+        stats["reconcile_s"] = time.perf_counter() - start
+        stats["total_drift"] = total_drift(forecasts, base)
+        if stats["total_drift"] > TOTAL_TOLERANCE:
+            forecasts = S @ b_hat                   # la reconciliación se fue de escala: bottom-up
+            stats["fallback"] = "bu"
+    stats["incoherence"] = incoherence(S, forecasts)
+
+    last_week = series[0][1] + pd.Timedelta(weeks=len(series[0][2]) - 1)
+    weeks = pd.date_range(last_week, periods=h_future + 1, freq=fe.FREQ)[1:]
+    out = nodes.assign(**meta).loc[nodes.index.repeat(h_future)].reset_index(drop=True)
+    out.insert(len(NODE_COLUMNS), "week", np.tile(weeks, n))
+    out.insert(len(NODE_COLUMNS) + 1, "forecast_qty", forecasts.ravel())
+    out.insert(len(NODE_COLUMNS) + 2, "base_qty", base.ravel())
+    out.insert(len(NODE_COLUMNS) + 3, "method", stats.get("fallback", method))
+    return out, stats
+
+def main(workers: int | None = None, method: str = "bu", h_future: int = fe.H_FUTURE,
+         export_csv: bool = False):
+    start = time.perf_counter()
+    sales = fe.load_weekly_sales(extra=("vendorid",))
+    sales["vendorid"] = sales["vendorid"].astype("Int64")
+    out, stats = forecast_hierarchy(sales, method, workers, h_future)
+    secs = time.perf_counter() - start
+    path = PROCESSED_DIR / f"{REPORT_NAME}.parquet"
+    out.to_parquet(path, index=False, **PARQUET_OPTIONS)
+    if export_csv:
+        out.to_csv(PROCESSED_DIR / f"{REPORT_NAME}.csv", index=False)
+
+    print(out.drop_duplicates(["level", "store", "brand", "vendorid"]).groupby("level", sort=False).size().to_string())
+    timings = " | ".join(f"{k[:-2]} {v:.2f}s" for k, v in stats.items() if k.endswith("_s"))
+    print(f"⏱️ {method}: {stats['leaves']} hojas + {stats['aggregates']} agregados en {secs:.2f}s ({timings})")
+    if "base_incoherence" in stats:
+        print(f"📝 Incoherencia máx. de los pronósticos base: {stats['base_incoherence']:.2%} | "
+              f"hojas reconciliadas < 0 llevadas a cero: {stats['negative_leaves']:.1%}")
+        print(f"📝 Total reconciliado vs base: {stats['total_drift']:.1%}")
+    if "fallback" in stats:
+        print(f"⚠️ El total de {method} se alejó más de {TOTAL_TOLERANCE:.0%} del base: se usó bottom-up")
+    print(f"📝 Incoherencia máx. tras {method}: {stats['incoherence']:.2e}")
+    print(f"✅ {REPORT_NAME}: {len(out)} filas | {path}")
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pronóstico jerárquico coherente (tienda×marca -> total)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="procesos en paralelo (por defecto: núcleos disponibles)")
+    parser.add_argument("--method", choices=METHODS, default="bu",
+                        help="bu = solo hojas + sumas; ols/wls/mint = reconcilia con los agregados")
+    parser.add_argument("--horizon", type=int, default=fe.H_FUTURE, help="semanas a pronosticar")
+    parser.add_argument("--csv", action="store_true", help="exporta también CSV")
+    args = parser.parse_args()
+    main(workers=args.workers, method=args.method, h_future=args.horizon, export_csv=args.csv)
@@ -0,0 +1,262 @@
+# src/instrument.py
+"""
+Instrumentación por etapa del pipeline (lectura, estandarización,
+normalización, coerción, fechas, duplicados, escritura).
+
+Cada etapa medida agrega una línea JSON al run log con tiempo de pared, CPU,
+RSS al inicio y pico de memoria sobre ese inicio, filas de entrada/salida y
+bytes leídos/escritos. Opcionalmente se guarda un perfil cProfile (.prof) de
+las etapas cuyo nombre coincide con un patrón.
+
+Se activa por variables de entorno (así llega también a los procesos del
+pool): src.pipeline las fija con --run-log/--profile. Sin ellas las etapas
+no miden nada y las funciones se comportan igual que antes.
+
+Resumen de una corrida:
+    python -m src.instrument [--log data/logs/run_log.jsonl] [--run RUN_ID]
+"""
+import argparse
+import cProfile
+import fnmatch
+import functools
+import json
+import os
+import platform
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from src.config import DATA_DIR
+
+try:
+    import resource            # no existe en Windows
+except ImportError:
+    resource = None
+try:
+    import psutil              # opcional: RSS actual donde no hay /proc
+except ImportError:
+    psutil = None
+
+ENV_LOG = "INVENTARIO_RUN_LOG"
+ENV_RUN_ID = "INVENTARIO_RUN_ID"
+ENV_PROFILE = "INVENTARIO_PROFILE"     # patrón fnmatch sobre "tarea.etapa"
+DEFAULT_LOG = DATA_DIR / "logs" / "run_log.jsonl"
+SAMPLE_SECONDS = 0.005                 # cada cuánto se muestrea el RSS durante una etapa
+
+_task = "-"
+_active: list["Stage"] = []
+_sampler: threading.Thread | None = None
+_lock = threading.Lock()
+_profiling = False
+
+
+# ===================== memoria =====================
+
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def rss_bytes() -> int:
+    """
+    RSS actual del proceso. Sin /proc (macOS/Windows) usa psutil si está
+    instalado, si no el pico ru_maxrss; 0 si no hay cómo medirlo (Windows sin psutil).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except OSError:
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    if resource is not None:
+        unit = 1 if platform.system() == "Darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+    return 0
+
+def _sample_loop():
+    global _sampler
+    while True:
+        with _lock:
+            if not _active:
+                _sampler = None
+                break
+            rss = rss_bytes()
+            for st in _active:
+                st.peak = max(st.peak, rss)
+        time.sleep(SAMPLE_SECONDS)
+
+def _start_sampler():
+    """Arranca el hilo de muestreo si no hay uno (llamar con _lock tomado)."""
+    global _sampler
+    if _sampler is None:
+        _sampler = threading.Thread(target=_sample_loop, name="rss-sampler", daemon=True)
+        _sampler.start()
+
+def _reset_after_fork():
+    # el hijo no hereda el hilo de muestreo ni las etapas abiertas del padre
+    global _sampler, _lock, _profiling
+    _sampler, _lock, _profiling = None, threading.Lock(), False
+    _active.clear()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+# ===================== etapas =====================
+
+def enabled() -> bool:
+    return bool(os.environ.get(ENV_LOG))
+
+def configure(log_path: Path | None = DEFAULT_LOG, profile: str | None = None) -> str:
+    """
+    Activa el run log (y el perfilado de las etapas que coincidan con `profile`)
+    para este proceso y sus hijos. Devuelve el id de la corrida.
+    """
+    run_id = f"{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:6]}"
+    if log_path is None:
+        os.environ.pop(ENV_LOG, None)
+        return run_id
+    log_path = Path(log_path)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    os.environ[ENV_LOG] = str(log_path)
+    os.environ[ENV_RUN_ID] = run_id
+    if profile:
+        os.environ[ENV_PROFILE] = profile
+    else:
+        os.environ.pop(ENV_PROFILE, None)
+    return run_id
+
+def _size(paths) -> int:
+    return sum(Path(p).stat().st_size for p in paths if p is not None and Path(p).exists())
+
+
+class Stage:
+    """Métricas de una etapa; dentro del `with` se pueden fijar rows_out, bytes_out, etc."""
+
+    def __init__(self, name: str, rows_in: int | None = None, bytes_in: int | None = None):
+        self.name = name
+        self.rows_in, self.rows_out = rows_in, None
+        self.bytes_in, self.bytes_out = bytes_in, None
+        self.rss_start = self.peak = 0
+        self.extra: dict = {}          # campos adicionales de la etapa (p. ej. conteos)
+
+    def record(self, wall: float, cpu: float) -> dict:
+        return {
+            "run_id": os.environ.get(ENV_RUN_ID), "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "pid": os.getpid(), "task": _task, "stage": self.name,
+            "wall_s": round(wall, 4), "cpu_s": round(cpu, 4),
+            "rss_start_mb": round(self.rss_start / 2**20, 1),
+            "peak_delta_mb": round(max(self.peak - self.rss_start, 0) / 2**20, 1),
+            "rows_in": self.rows_in, "rows_out": self.rows_out,
+            "bytes_in": self.bytes_in, "bytes_out": self.bytes_out, **self.extra,
+        }
+
+
+def _write(record: dict):
+    # una sola escritura por línea en modo append: varios procesos pueden escribir a la vez
+    with open(os.environ[ENV_LOG], "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+@contextmanager
+def stage(name: str, rows_in: int | None = None, bytes_in: int | None = None):
+    """Mide el bloque como etapa `name` de la tarea actual (no hace nada si no está activo)."""
+    global _profiling
+    st = Stage(name, rows_in, bytes_in)
+    if not enabled():
+        yield st
+        return
+
+    pattern = os.environ.get(ENV_PROFILE)
+    profiler = None
+    if pattern and not _profiling and fnmatch.fnmatch(f"{_task}.{name}", pattern):
+        profiler, _profiling = cProfile.Profile(), True
+
+    st.rss_start = st.peak = rss_bytes()
+    with _lock:
+        _active.append(st)
+        _start_sampler()
+    wall, cpu = time.perf_counter(), time.process_time()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield st
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _profiling = False
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        with _lock:
+            st.peak = max(st.peak, rss_bytes())
+            _active.remove(st)
+        _write(st.record(wall, cpu))
+        if profiler is not None:
+            out = Path(os.environ[ENV_LOG]).parent / "profiles" / f"{os.environ.get(ENV_RUN_ID)}_{_task}.{name}.prof"
+            out.parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(out)
+
+@contextmanager
+def task(name: str):
+    """Marca la tarea del pipeline en curso; sus etapas se registran con ese nombre."""
+    global _task
+    previous, _task = _task, name
+    try:
+        with stage("total"):
+            yield
+    finally:
+        _task = previous
+
+def _rows(obj) -> int | None:
+    return len(obj) if isinstance(obj, (pd.DataFrame, pd.Series)) else None
+
+def instrumented(name):
+    """
+    Decorador: mide la función como una etapa. Filas de entrada = largo del
+    primer argumento DataFrame/Series, de salida = largo del resultado; los
+    argumentos Path cuentan como bytes leídos. `name` puede ser una función
+    de los argumentos (p. ej. para incluir la columna).
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return fn(*args, **kwargs)
+            label = name(*args, **kwargs) if callable(name) else name
+            data = next((a for a in args if _rows(a) is not None), None)
+            paths = [a for a in args if isinstance(a, Path) and a.is_file()]
+            with stage(label, rows_in=_rows(data), bytes_in=_size(paths) if paths else None) as st:
+                result = fn(*args, **kwargs)
+                st.rows_out = _rows(result)
+            return result
+        return wrapper
+    return decorator
+
+
+# ===================== resumen =====================
+
+def read_log(path: Path = DEFAULT_LOG, run_id: str | None = None) -> list[dict]:
+    """Registros de una corrida (por defecto la última del archivo)."""
+    records = [json.loads(line) for line in Path(path).read_text(encoding="utf-8").splitlines() if line.strip()]
+    run_id = run_id or (records[-1]["run_id"] if records else None)
+    return [r for r in records if r["run_id"] == run_id]
+
+def print_summary(records: list[dict], top: int = 30):
+    if not records:
+        print("(sin registros)")
+        return
+    print(f"=== Corrida {records[0]['run_id']} — etapas por tiempo ===")
+    print(f"{'tarea.etapa':<48}{'pared s':>9}{'cpu s':>9}{'Δ MB':>8}{'filas':>12}")
+    for r in sorted(records, key=lambda r: -r["wall_s"])[:top]:
+        rows = r["rows_out"] if r["rows_out"] is not None else r["rows_in"]
+        print(f"{r['task'] + '.' + r['stage']:<48}{r['wall_s']:>9.2f}{r['cpu_s']:>9.2f}"
+              f"{r['peak_delta_mb']:>8.0f}{(rows if rows is not None else ''):>12}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resumen del run log por etapa")
+    parser.add_argument("--log", type=Path, default=DEFAULT_LOG)
+    parser.add_argument("--run", default=None, help="id de corrida (por defecto la última)")
+    parser.add_argument("--top", type=int, default=30)
+    args = parser.parse_args()
+    print_summary(read_log(args.log, args.run), args.top)
@@ -0,0 +1,199 @@
+# src/inventory_policy.py
+"""
+Políticas de inventario (SS, ROP, EOQ) para muchas claves a la vez.
+
+En vez de un groupby + resample("D") por tienda/marca/año, se arma una sola
+matriz dispersa clave × día con la demanda diaria y se calculan mu, sigma,
+stock de seguridad, punto de reorden y EOQ para todas las claves con NumPy.
+Cada clave usa su propio rango de fechas (primera a última venta), igual que
+el resample por grupo del notebook 02_forecast.
+
+Con compras disponibles, cada clave recibe:
+- lead time propio: promedio de (ReceivingDate - PODate) en días;
+- nivel de servicio según su clase ABC por dólares comprados.
+Las claves sin historial de compras usan el promedio global (lead time) y la
+clase C.
+
+Uso:
+    python -m src.inventory_policy [--force] [--dry-run] [--csv]
+"""
+import argparse
+from pathlib import Path
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from src.config import PARQUET_OPTIONS
+from src.instrument import DEFAULT_LOG
+
+# ---------------------------
+# Parámetros por defecto (los del notebook)
+# ---------------------------
+LEAD_DAYS = 7          # días de reabastecimiento
+Z = 1.65               # ~95% nivel de servicio
+S = 50.0               # costo de ordenar (por orden)
+H = 2.0                # costo de posesión anual por unidad
+
+# Clase ABC por % acumulado de dólares comprados -> nivel de servicio
+ABC_LIMITS = {"A": 0.80, "B": 0.95}
+SERVICE_LEVELS = {"A": 0.98, "B": 0.95, "C": 0.90}
+
+# Salidas por defecto: nombre -> columnas clave ("year" se deriva de la fecha)
+POLICY_KEYS = {
+    "overall": (),
+    "by_year": ("year",),
+    "by_store": ("store",),
+    "by_brand": ("brand",),
+    "by_store_brand": ("store", "brand"),
+    "by_vendor": ("vendorid",),
+}
+
+POLICY_COLUMNS = ["mu_daily", "sigma_daily", "lead_days", "abc_class", "service_level", "z",
+                  "safety_stock", "reorder_point", "EOQ"]
+
+
+def _with_year(df: pd.DataFrame, keys, date_col: str) -> pd.DataFrame:
+    if "year" in keys and "year" not in df.columns:
+        df = df.assign(year=pd.to_datetime(df[date_col], errors="coerce").dt.year)
+    return df
+
+def _key_codes(df: pd.DataFrame, keys) -> tuple[np.ndarray, pd.DataFrame]:
+    """Código entero por fila (-1 si alguna clave es nula) + tabla de claves ordenada."""
+    if not keys:
+        return np.zeros(len(df), dtype="int64"), pd.DataFrame(index=[0])
+    grouped = df.groupby(list(keys), observed=True, sort=True)
+    codes = grouped.ngroup().to_numpy(dtype="float64")      # NaN si alguna clave es nula
+    codes = np.where(np.isnan(codes), -1, codes).astype("int64")
+    frame = grouped.size().index.to_frame(index=False)
+    return codes, frame
+
+def demand_matrix(sales: pd.DataFrame, keys=(), date_col: str = "invoicedate",
+                  qty_col: str = "quantity"):
+    """
+    Pivot único clave × día (scipy.sparse.csr, suma duplicados).
+
+    Devuelve (tabla de claves, matriz, primer día, último día) donde los días
+    son enteros desde la fecha mínima y primer/último son por clave.
+    """
+    keys = tuple(keys)
+    sales = _with_year(sales, keys, date_col)
+    dates = pd.to_datetime(sales[date_col], errors="coerce").dt.normalize()
+    qty = pd.to_numeric(sales[qty_col], errors="coerce").fillna(0.0).to_numpy(dtype="float64")
+    codes, frame = _key_codes(sales, keys)
+
+    ok = dates.notna().to_numpy() & (codes >= 0)
+    dates, qty, codes = dates[ok], qty[ok], codes[ok]
+    n_keys = len(frame)
+    if not ok.any():
+        empty = np.zeros(n_keys, dtype="int64")
+        return frame, sparse.csr_matrix((n_keys, 0)), empty, empty - 1
+
+    day = ((dates - dates.min()).dt.days).to_numpy(dtype="int64")
+    matrix = sparse.coo_matrix((qty, (codes, day)), shape=(n_keys, int(day.max()) + 1)).tocsr()
+
+    first = np.full(n_keys, np.iinfo("int64").max, dtype="int64")
+    last = np.full(n_keys, -1, dtype="int64")
+    np.minimum.at(first, codes, day)
+    np.maximum.at(last, codes, day)
+    return frame, matrix, first, last
+
+def _lead_times(purchases, frame: pd.DataFrame, keys, default: float) -> np.ndarray:
+    """Lead time promedio (días) por clave; sin historial -> promedio global."""
+    if purchases is None:
+        return np.full(len(frame), float(default))
+    lt = (pd.to_datetime(purchases["receivingdate"], errors="coerce")
+          - pd.to_datetime(purchases["podate"], errors="coerce")).dt.days
+    lt = lt.where(lt >= 0)
+    overall = float(lt.mean()) if lt.notna().any() else float(default)
+    if not keys or any(k not in purchases.columns for k in keys):
+        return np.full(len(frame), overall)
+    by_key = lt.groupby([purchases[k] for k in keys], observed=True).mean().rename("lead_days")
+    merged = frame.merge(by_key.reset_index(), on=list(keys), how="left")
+    return merged["lead_days"].fillna(overall).to_numpy(dtype="float64")
+
+def _abc_classes(purchases, frame: pd.DataFrame, keys) -> np.ndarray:
+    """Clase ABC por % acumulado de dólares comprados; sin compras -> C (None si no aplica)."""
+    if purchases is None or not keys or any(k not in purchases.columns for k in keys):
+        return np.full(len(frame), None, dtype=object)
+    dollars = pd.to_numeric(purchases["totalamount"], errors="coerce").fillna(0.0)
+    by_key = (dollars.groupby([purchases[k] for k in keys], observed=True).sum()
+              .sort_values(ascending=False))
+    # % acumulado *antes* de cada clave: la que cruza el límite sigue en la clase anterior
+    share = (by_key.cumsum() - by_key) / max(by_key.sum(), 1e-9)
+    cls = np.where(share < ABC_LIMITS["A"], "A", np.where(share < ABC_LIMITS["B"], "B", "C"))
+    by_key = pd.Series(cls, index=by_key.index, name="abc_class")
+    merged = frame.merge(by_key.reset_index(), on=list(keys), how="left")
+    return merged["abc_class"].fillna("C").to_numpy(dtype=object)
+
+def compute_policies(sales: pd.DataFrame, purchases: pd.DataFrame | None = None, keys=(),
+                     date_col: str = "invoicedate", qty_col: str = "quantity",
+                     lead_days: float = LEAD_DAYS, z: float = Z, S: float = S, H: float = H) -> pd.DataFrame:
+    """
+    Una fila por clave con mu_daily, sigma_daily, lead_days, clase ABC, nivel
+    de servicio, z, safety_stock, reorder_point y EOQ.
+
+    Sin `purchases` se usan `lead_days` y `z` fijos para todas las claves
+    (mismo resultado que _policy_from_daily_series del notebook); la política
+    global (keys vacío) usa siempre `z`.
+    """
+    keys = tuple(keys)
+    frame, matrix, first, last = demand_matrix(sales, keys, date_col, qty_col)
+
+    n = (last - first + 1).astype("float64")                  # días en el rango de cada clave
+    total = np.asarray(matrix.sum(axis=1)).ravel()
+    squares = np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mu = np.where(n > 0, total / n, np.nan)
+        var = np.where(n > 1, (squares - n * mu ** 2) / (n - 1), np.nan)   # ddof=1, como pandas
+    sigma = np.sqrt(np.clip(var, 0.0, None))
+
+    purchases = _with_year(purchases, keys, "podate") if purchases is not None else None
+    lead = _lead_times(purchases, frame, keys, lead_days)
+    abc = _abc_classes(purchases, frame, keys)
+    # sin clase ABC (sin compras o política global) -> z fijo
+    z_by_class = {c: NormalDist().inv_cdf(p) for c, p in SERVICE_LEVELS.items()}
+    level = pd.Series(abc).map(SERVICE_LEVELS).fillna(NormalDist().cdf(z)).to_numpy(dtype="float64")
+    zs = pd.Series(abc).map(z_by_class).fillna(float(z)).to_numpy(dtype="float64")
+
+    ss = zs * sigma * np.sqrt(lead)                             # Safety Stock
+    rop = mu * lead + ss                                        # Reorder Point
+    eoq = np.sqrt(2.0 * np.maximum(mu * 365.0, 1e-9) * S / max(H, 1e-9))   # Wilson EOQ
+
+    out = frame.copy() if keys else pd.DataFrame(index=[0])
+    out = out.assign(mu_daily=mu, sigma_daily=sigma, lead_days=lead, abc_class=abc,
+                     service_level=level, z=zs, safety_stock=ss, reorder_point=rop, EOQ=eoq)
+    out = out[n > 0].reset_index(drop=True)                     # claves sin ventas con fecha
+    return out.loc[:, [*keys, *POLICY_COLUMNS]]
+
+def build_policies(processed: Path, export_csv: bool = False) -> list[Path]:
+    """Lee ventas/compras limpias y escribe inventory_policy_<nombre>.parquet por cada POLICY_KEYS."""
+    sales = pd.read_parquet(processed / "sales_clean.parquet")
+    purchases = pd.read_parquet(processed / "purchases_clean.parquet",
+                                columns=["store", "brand", "vendorid", "podate",
+                                         "receivingdate", "totalamount"])
+    paths = []
+    for name, keys in POLICY_KEYS.items():
+        df = compute_policies(sales, purchases, keys)
+        path = processed / f"inventory_policy_{name}.parquet"
+        df.to_parquet(path, index=False, **PARQUET_OPTIONS)
+        if export_csv:
+            df.round(2).to_csv(processed / f"inventory_policy_{name}.csv", index=False)
+        print(f"✅ inventory_policy_{name}: {len(df)} claves | {path}")
+        paths.append(path)
+    return paths
+
+def main(force: bool = False, dry_run: bool = False, export_csv: bool = False,
+         run_log: Path | None = DEFAULT_LOG, profile: str | None = None):
+    from src import pipeline
+    pipeline.main(workers=1, force=force, dry_run=dry_run, export_csv=export_csv, only="policy_",
+                  run_log=run_log, profile=profile)
+
+if __name__ == "__main__":
+    from src.pipeline import add_run_args
+    parser = argparse.ArgumentParser(description="Políticas de inventario (SS/ROP/EOQ) por clave")
+    add_run_args(parser)
+    args = parser.parse_args()
+    main(force=args.force, dry_run=args.dry_run, export_csv=args.csv,
+         run_log=args.run_log, profile=args.profile)
@@ -0,0 +1,252 @@
+# src/inventory_simulation.py
+"""
+Simulación Monte Carlo de las políticas de inventario (src/inventory_policy.py).
+
+Las fórmulas de SS/ROP/EOQ suponen demanda normal y lead time fijo; aquí se
+mide lo que cada política logra de verdad. Para cada tienda×marca se
+reproducen miles de escenarios:
+- demanda: bloques de BLOCK_DAYS días remuestreados (bootstrap circular) de
+  su propia serie diaria histórica, con los días sin venta incluidos;
+- lead time: remuestreado de sus compras (ReceivingDate - PODate); con menos
+  de MIN_LEAD_SAMPLES compras se usa el de todas las compras.
+
+Revisión diaria (s, Q), con el stock inicial en un punto al azar del ciclo
+de pedido: al empezar el día llegan los pedidos, la demanda se
+atiende con lo que hay (ventas perdidas si no alcanza) y, si la posición
+(en mano + en camino) quedó en o bajo el ROP, se piden los lotes de EOQ
+necesarios. Se comparan dos políticas con los mismos escenarios:
+- ss_rop_eoq: ROP con stock de seguridad + EOQ (inventory_policy);
+- rop_sin_ss: ROP = demanda media × lead time, como en la app de Streamlit.
+
+El estado es un arreglo NumPy política × clave × escenario; solo se itera
+sobre los días y, para acotar la memoria, sobre bloques de claves.
+
+Uso:
+    python -m src.inventory_simulation [--scenarios 1000] [--horizon 90] [--workers 4] [--csv]
+
+En el pipeline es opcional (python -m src.pipeline --simulate 200): la tarea
+policy_simulation corre con un solo proceso, el paralelismo lo da --workers.
+"""
+import argparse
+import multiprocessing as mp
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.config import PROCESSED_DIR, PARQUET_OPTIONS
+from src.instrument import stage
+from src.inventory_policy import H, S, demand_matrix
+
+KEYS = ("store", "brand")
+POLICY_FILE = "inventory_policy_by_store_brand.parquet"
+REPORT_NAME = "inventory_simulation"
+POLICIES = ("ss_rop_eoq", "rop_sin_ss")
+
+SCENARIOS = 1000
+HORIZON = 90           # días simulados
+BLOCK_DAYS = 7         # largo de los bloques de demanda (conserva el patrón semanal)
+MIN_LEAD_SAMPLES = 3   # compras mínimas para usar el lead time propio de la clave
+CELLS = 2_000_000      # claves × escenarios por bloque (memoria ~ CELLS × política × lead máx.)
+
+RESULT_COLUMNS = ["policy", "reorder_point", "order_qty", "fill_rate", "fill_rate_p05",
+                  "stockout_days", "stockout_prob", "avg_on_hand", "holding_cost",
+                  "orders", "ordering_cost", "total_cost"]
+
+
+def _key_index(frame: pd.DataFrame, other: pd.DataFrame, keys) -> np.ndarray:
+    """Posición de cada fila de `other` en `frame` según las claves (-1 si no está)."""
+    index = pd.MultiIndex.from_frame(frame[list(keys)])
+    return index.get_indexer(pd.MultiIndex.from_frame(other[list(keys)]))
+
+def lead_time_samples(purchases: pd.DataFrame, frame: pd.DataFrame, keys=KEYS):
+    """
+    Muestras de lead time (días, >= 1) agrupadas por clave, como CSR:
+    (valores, inicio, cantidad) con inicio/cantidad por fila de `frame`.
+    Las claves con pocas compras apuntan al bloque global (al final de `valores`).
+    """
+    lt = (pd.to_datetime(purchases["receivingdate"], errors="coerce")
+          - pd.to_datetime(purchases["podate"], errors="coerce")).dt.days
+    ok = lt.notna().to_numpy() & (lt >= 0).to_numpy()
+    lt = np.maximum(lt.to_numpy(dtype="float64", na_value=0)[ok], 1).astype("int32")
+    codes = _key_index(frame, purchases.loc[ok], keys)
+    if not len(lt):
+        raise ValueError("Sin lead times válidos (ReceivingDate - PODate) en las compras")
+
+    order = np.argsort(codes, kind="stable")
+    codes, values = codes[order], lt[order]
+    counts = np.bincount(codes[codes >= 0], minlength=len(frame))
+    starts = np.searchsorted(codes, np.arange(len(frame)))
+    values = np.concatenate([values, lt])            # bloque global al final
+    few = counts < MIN_LEAD_SAMPLES
+    starts[few], counts[few] = len(values) - len(lt), len(lt)
+    return values, starts, counts
+
+def _simulate_chunk(daily: np.ndarray, first: np.ndarray, n_days: np.ndarray,
+                    lead_values: np.ndarray, lead_start: np.ndarray, lead_count: np.ndarray,
+                    rop: np.ndarray, qty: np.ndarray, scenarios: int, horizon: int,
+                    rng: np.random.Generator, h_daily: float) -> dict[str, np.ndarray]:
+    """
+    Simula un bloque de claves. `daily` es la demanda diaria densa (clave × día);
+    `rop` y `qty` son (política, clave). Devuelve métricas (política, clave).
+    """
+    n_pol, n_keys = rop.shape
+    shape = (n_pol, n_keys, scenarios)
+    rop3 = rop[:, :, None].astype("float32")
+    qty3 = qty[:, :, None].astype("float32")
+    rows = np.arange(n_keys)[None, :, None]
+    offsets = np.arange(BLOCK_DAYS, dtype="int64")[:, None, None]
+    slots = int(lead_values.max()) + 2                # anillo de llegadas por día
+
+    # posición inicial uniforme en (ROP, ROP + Q]: el estado estacionario de (s, Q)
+    cycle = 1.0 - rng.random((1, n_keys, scenarios), dtype="float32")
+    on_hand = rop3 + cycle * qty3
+    on_order = np.zeros(shape, dtype="float32")
+    arrivals = np.zeros((slots, *shape), dtype="float32")
+    flat = arrivals.reshape(slots, -1)
+
+    # acumuladores en float32: cantidades enteras y horizontes cortos, sin pérdida relevante
+    demand_sum = np.zeros((n_keys, scenarios), dtype="float32")
+    filled = np.zeros(shape, dtype="float32")
+    stockout_days = np.zeros(shape, dtype="int32")
+    holding = np.zeros(shape, dtype="float32")
+    orders = np.zeros(shape, dtype="int32")
+
+    for t in range(horizon):
+        if t % BLOCK_DAYS == 0:                       # nuevo bloque: día × clave × escenario
+            start = (rng.random((1, n_keys, scenarios), dtype="float32") * n_days[:, None]).astype("int64")
+            block = daily[rows, first[:, None] + (start + offsets) % n_days[:, None]]
+        demand = block[t % BLOCK_DAYS]                # clave × escenario, igual para ambas políticas
+        demand_sum += demand
+
+        slot = t % slots
+        on_hand += arrivals[slot]
+        on_order -= arrivals[slot]
+        arrivals[slot] = 0.0
+
+        served = np.minimum(on_hand, demand)
+        on_hand -= served
+        filled += served
+        stockout_days += served < demand
+        holding += on_hand
+
+        position = on_hand + on_order
+        placed = np.flatnonzero(position <= rop3)
+        if len(placed):
+            key = (placed // scenarios) % n_keys
+            lot = qty3.ravel()[placed // scenarios]
+            lots = np.floor((rop3.ravel()[placed // scenarios] - position.ravel()[placed]) / lot) + 1.0
+            u = rng.random(len(placed))
+            lead = lead_values[lead_start[key] + (u * lead_count[key]).astype("int64")]
+            amount = lots * lot
+            # pedido al cierre del día t con lead L: disponible al empezar t + L + 1
+            flat[(slot + lead + 1) % slots, placed] += amount
+            on_order.ravel()[placed] += amount
+            orders.ravel()[placed] += lots.astype("int32")
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fill = np.where(demand_sum > 0, filled / demand_sum, 1.0)
+    return {
+        "fill_rate": filled.sum(axis=2, dtype="float64") / np.maximum(demand_sum.sum(axis=1, dtype="float64"), 1e-9),
+        "fill_rate_p05": np.quantile(fill, 0.05, axis=2),
+        "stockout_days": stockout_days.mean(axis=2),
+        "stockout_prob": (stockout_days > 0).mean(axis=2),
+        "avg_on_hand": holding.mean(axis=2, dtype="float64") / horizon,
+        "holding_cost": holding.mean(axis=2, dtype="float64") * h_daily,
+        "orders": orders.mean(axis=2),
+    }
+
+def _run_chunk(job: tuple) -> dict[str, np.ndarray]:
+    """Un bloque de claves (en un proceso del pool): demanda densa + simulación."""
+    daily, *args, seed, h_daily = job
+    return _simulate_chunk(daily.toarray().astype("float32"), *args, np.random.default_rng(seed), h_daily)
+
+def simulate_policies(sales: pd.DataFrame, purchases: pd.DataFrame, policies: pd.DataFrame,
+                      scenarios: int = SCENARIOS, horizon: int = HORIZON, seed: int = 0,
+                      workers: int | None = None, S: float = S, H: float = H) -> pd.DataFrame:
+    """
+    Una fila por tienda×marca y política con fill rate (agregado y p05 entre
+    escenarios), días con quiebre, probabilidad de algún quiebre, stock medio y
+    costos de posesión/pedido en el horizonte. Los bloques de claves se
+    reparten entre `workers` procesos (None: núcleos disponibles).
+    """
+    keys = list(KEYS)
+    frame, matrix, first, last = demand_matrix(sales, KEYS)
+    pos = _key_index(frame, policies, keys)
+    policies, pos = policies[pos >= 0].reset_index(drop=True), pos[pos >= 0]
+    matrix, first, n_days = matrix[pos], first[pos], (last - first + 1)[pos]
+    lead_values, lead_start, lead_count = lead_time_samples(purchases, policies, keys)
+
+    mu = policies["mu_daily"].to_numpy(dtype="float64")
+    lead = policies["lead_days"].to_numpy(dtype="float64")
+    ss_rop = policies["reorder_point"].fillna(policies["mu_daily"] * policies["lead_days"])
+    rop = np.vstack([ss_rop.to_numpy(dtype="float64"), mu * lead])
+    qty = np.broadcast_to(np.maximum(policies["EOQ"].to_numpy(dtype="float64"), 1.0), rop.shape)
+
+    # bloques de claves independientes, cada uno con su semilla: el resultado no depende de `workers`
+    chunk = max(1, CELLS // scenarios)
+    bounds = [(lo, min(lo + chunk, len(policies))) for lo in range(0, len(policies), chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(bounds))
+    jobs = []
+    for (lo, hi), chunk_seed in zip(bounds, seeds):
+        lo_day, hi_day = int(first[lo:hi].min()), int((first + n_days)[lo:hi].max())
+        jobs.append((matrix[lo:hi, lo_day:hi_day], first[lo:hi] - lo_day, n_days[lo:hi],
+                     lead_values, lead_start[lo:hi], lead_count[lo:hi],
+                     rop[:, lo:hi], qty[:, lo:hi], scenarios, horizon, chunk_seed, H / 365.0))
+    with stage("simulate", rows_in=len(policies)) as st:
+        # un proceso daemon (p. ej. un worker de multiprocessing.Pool) no puede abrir otro pool
+        if workers == 1 or len(jobs) == 1 or mp.current_process().daemon:
+            parts = [_run_chunk(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parts = list(pool.map(_run_chunk, jobs))
+        st.rows_out = len(policies) * scenarios
+    metrics = {name: np.concatenate([part[name] for part in parts], axis=1) for name in parts[0]} if parts else {}
+
+    out = []
+    for p, policy in enumerate(POLICIES):
+        df = policies[keys].assign(policy=policy, reorder_point=rop[p], order_qty=qty[p],
+                                   **{name: values[p] for name, values in metrics.items()})
+        df["ordering_cost"] = df["orders"] * S
+        df["total_cost"] = df["holding_cost"] + df["ordering_cost"]
+        out.append(df)
+    out = pd.concat(out, ignore_index=True)
+    out["service_target"] = np.tile(policies["service_level"].to_numpy(dtype="float64"), len(POLICIES))
+    return out.loc[:, [*keys, *RESULT_COLUMNS, "service_target"]]
+
+def build_simulation(processed: Path = PROCESSED_DIR, export_csv: bool = False,
+                     scenarios: int = SCENARIOS, horizon: int = HORIZON, seed: int = 0,
+                     workers: int | None = None) -> Path:
+    sales = pd.read_parquet(processed / "sales_clean.parquet", columns=[*KEYS, "invoicedate", "quantity"])
+    purchases = pd.read_parquet(processed / "purchases_clean.parquet",
+                                columns=[*KEYS, "podate", "receivingdate"])
+    policies = pd.read_parquet(processed / POLICY_FILE)
+    start = time.perf_counter()
+    report = simulate_policies(sales, purchases, policies, scenarios, horizon, seed, workers)
+    elapsed = time.perf_counter() - start
+
+    path = processed / f"{REPORT_NAME}.parquet"
+    report.to_parquet(path, index=False, **PARQUET_OPTIONS)
+    if export_csv:
+        report.round(4).to_csv(processed / f"{REPORT_NAME}.csv", index=False)
+    n_keys = len(report) // len(POLICIES)
+    print(f"✅ {REPORT_NAME}: {n_keys} tienda×marca × {scenarios} escenarios × {horizon} días | {path}")
+    print(f"⏱️ {elapsed:.1f}s ({n_keys * scenarios * horizon / max(elapsed, 1e-9) / 1e6:.1f} M clave-escenario-días/s)")
+    summary = report.groupby("policy", sort=False)[["fill_rate", "stockout_days", "total_cost"]].mean()
+    for policy, row in summary.iterrows():
+        print(f"   {policy:<11} fill rate {row['fill_rate']:.1%} | días con quiebre {row['stockout_days']:.1f} "
+              f"| costo medio {row['total_cost']:,.2f}")
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulación Monte Carlo de políticas de inventario")
+    parser.add_argument("--scenarios", type=int, default=SCENARIOS, help="escenarios por tienda×marca")
+    parser.add_argument("--horizon", type=int, default=HORIZON, help="días simulados")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="procesos en paralelo (por defecto: núcleos disponibles)")
+    parser.add_argument("--csv", action="store_true", help="exporta también CSV")
+    args = parser.parse_args()
+    build_simulation(PROCESSED_DIR, args.csv, args.scenarios, args.horizon, args.seed, args.workers)
@@ -0,0 +1,196 @@
+# src/lazy_backend.py
+"""
+Backend perezoso (DuckDB) para transform_template.transform_table.
+
+En vez de materializar la tabla en pandas y limpiarla columna a columna, cada
+tabla se expresa como UNA consulta: lectura del parquet de interim, nombres
+normalizados, textos (strip + espacios + mayúsculas), size -> mL, numéricos
+por nombre, fechas y deduplicación (GROUP BY de todas las columnas con la
+primera fila de cada grupo). DuckDB la ejecuta en paralelo y, si no entra en
+memoria, usa disco (temp_directory). El resultado sale en lotes Arrow y
+sigue por el mismo camino que el modo por lotes: tipos del transform pandas,
+IDs de dimensiones, parquet + diccionario.
+
+La salida coincide con la de pandas columna a columna (nombres, tipos,
+valores y orden de filas). Se activa con --backend duckdb; duckdb es una
+dependencia opcional, solo se importa al usar este backend.
+"""
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pandas.tseries.api import guess_datetime_format
+
+from src.instrument import stage
+
+BATCH_ROWS = 500_000
+TEMP_DIR_NAME = "_duckdb_tmp"
+_WS = "[[:space:]]"
+_ROW = "__row"
+_SIZE_RE = r"^(\d+(?:\.\d+)?)(ml|l|oz)$"
+
+
+def _ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _literal(text: str) -> str:
+    return "'" + text.replace("'", "''") + "'"
+
+def _as_text(col: str) -> str:
+    """Equivalente de normalize_text: astype(str) (nulos -> 'nan'), strip y espacios simples."""
+    text = f"coalesce(CAST({col} AS VARCHAR), 'nan')"
+    text = f"regexp_replace({text}, '^{_WS}+|{_WS}+$', '', 'g')"
+    return f"regexp_replace({text}, '{_WS}+', ' ', 'g')"
+
+def _text_expr(col: str, kind: str) -> str:
+    text = _as_text(col)
+    return f"upper({text})" if kind in ("brand", "classification") else text
+
+def _size_ml_expr(col: str) -> str:
+    """Equivalente de _size_uniques_to_ml (L / mL / oz); nulos -> NULL."""
+    v = f"replace(lower(regexp_replace(CAST({col} AS VARCHAR), '^{_WS}+|{_WS}+$', '', 'g')), ' ', '')"
+    num = f"CAST(regexp_extract({v}, {_literal(_SIZE_RE)}, 1) AS DOUBLE)"
+    unit = f"regexp_extract({v}, {_literal(_SIZE_RE)}, 2)"
+    return (f"CASE {unit} WHEN 'l' THEN {num} * 1000.0 WHEN 'ml' THEN {num} * 1.0 "
+            f"WHEN 'oz' THEN {num} * 29.57 END")
+
+
+def _date_expr(con, scan: str, expr: str) -> str:
+    """
+    Como pd.to_datetime(errors='coerce'): el formato se deduce del primer valor
+    no nulo y las filas que no lo cumplen quedan nulas.
+    """
+    text = f"CAST({expr} AS VARCHAR)"
+    first = con.sql(f"SELECT {text} FROM {scan} WHERE {expr} IS NOT NULL LIMIT 1").fetchone()
+    fmt = guess_datetime_format(first[0]) if first else None
+    if fmt is None:
+        return f"TRY_CAST({text} AS TIMESTAMP)"
+    return f"try_strptime({text}, {_literal(fmt)})"
+
+def _template(src: Path, columns: list[str] | None, text_kinds: dict[str, str],
+              size_ml: bool) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    (tabla vacía de interim, misma tabla limpiada por el transform pandas):
+    la segunda da nombres, orden y tipos exactos de la salida.
+    """
+    from src.transform_template import clean_frame, normalize_columns
+
+    schema = pq.read_schema(src)
+    empty = schema.empty_table().to_pandas()
+    if columns is not None:
+        empty = empty[columns]
+    raw = normalize_columns(empty)
+    return raw, clean_frame(empty.copy(), text_kinds, size_ml)
+
+def build_query(con, src: Path, columns: list[str] | None, text_kinds: dict[str, str],
+                size_ml: bool) -> tuple[str, pd.DataFrame]:
+    """Consulta SQL de toda la limpieza + dedupe de una tabla, y la plantilla de tipos."""
+    from src.transform_template import coerce_numeric_by_name
+
+    raw, template = _template(src, columns, text_kinds, size_ml)
+    originals = list(columns) if columns is not None else pq.read_schema(src).names
+    source = dict(zip(raw.columns, originals))
+    scan = f"read_parquet({_literal(str(src))}, file_row_number = true)"
+
+    exprs = {}
+    for name in raw.columns:
+        col = _ident(source[name])
+        if name in text_kinds:
+            exprs[name] = _text_expr(col, text_kinds[name])
+        else:
+            exprs[name] = col
+    if size_ml and "size" in raw.columns:
+        exprs["size_ml"] = _size_ml_expr(_ident(source["size"]))
+
+    # numéricos por nombre: solo las columnas que el transform pandas convierte
+    coerced = [c for c in coerce_numeric_by_name(raw.copy()).columns
+               if not pd.api.types.is_numeric_dtype(raw[c]) and pd.api.types.is_numeric_dtype(template[c])]
+    for name in coerced:
+        clean = f"regexp_replace({_as_text(_ident(source[name]))}, '[,$]', '', 'g')"
+        # pd.to_numeric da int64 si todo son enteros y no hay nulos; si no, float64
+        integral = con.sql(f"SELECT coalesce(bool_and(regexp_full_match({clean}, '[+-]?[0-9]+')), false) "
+                           f"FROM {scan}").fetchone()[0]
+        exprs[name] = f"CAST({clean} AS BIGINT)" if integral else f"TRY_CAST({clean} AS DOUBLE)"
+        template[name] = template[name].astype("int64" if integral else "float64")
+
+    for name in template.columns:
+        if "date" in name and not pd.api.types.is_datetime64_any_dtype(raw.get(name, template[name])):
+            exprs[name] = _date_expr(con, scan, exprs[name])
+
+    names = list(template.columns)
+    select = ",\n       ".join(f"{exprs[n]} AS {_ident(n)}" for n in names)
+    cols = ", ".join(_ident(n) for n in names)
+    query = f"""
+WITH cleaned AS (
+SELECT {select},
+       file_row_number AS {_ROW}
+FROM {scan}
+),
+firsts AS (
+    SELECT {cols}, min({_ROW}) AS {_ROW} FROM cleaned GROUP BY ALL
+)
+SELECT {cols} FROM firsts ORDER BY {_ROW}
+"""
+    return query, template
+
+
+def _to_template(batch: pa.RecordBatch, template: pd.DataFrame) -> pd.DataFrame:
+    """Lote Arrow -> pandas con los tipos del transform pandas."""
+    arrays = []
+    for name, array in zip(batch.schema.names, batch.columns):
+        if isinstance(template[name].dtype, pd.CategoricalDtype):
+            array = array.dictionary_encode()
+        arrays.append(array)
+    df = pa.RecordBatch.from_arrays(arrays, names=batch.schema.names).to_pandas()
+    for name, dtype in template.dtypes.items():
+        if df[name].dtype != dtype and not isinstance(dtype, pd.CategoricalDtype):
+            df[name] = df[name].astype(dtype)
+    return df
+
+def connect(temp_dir: Path, threads: int | None = None, memory_limit: str | None = None):
+    import duckdb
+
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    con = duckdb.connect()
+    con.execute("SET enable_progress_bar = false")
+    con.execute(f"SET temp_directory = {_literal(str(temp_dir))}")
+    if threads:
+        con.execute(f"SET threads = {int(threads)}")
+    if memory_limit:
+        con.execute(f"SET memory_limit = {_literal(memory_limit)}")
+    return con
+
+def iter_clean(src: Path, text_kinds: dict[str, str], size_ml: bool = False,
+               columns: list[str] | None = None, batch_rows: int | None = None,
+               threads: int | None = None, memory_limit: str | None = None):
+    """Ejecuta la consulta de la tabla y entrega lotes pandas limpios y sin duplicados."""
+    con = connect(src.parent / TEMP_DIR_NAME, threads, memory_limit)
+    try:
+        with stage("duckdb.query"):
+            query, template = build_query(con, src, columns, text_kinds, size_ml)
+            reader = con.sql(query).fetch_record_batch(batch_rows or BATCH_ROWS)
+        while True:
+            with stage("duckdb") as st:            # incluye la ejecución de la consulta
+                try:
+                    batch = reader.read_next_batch()
+                except StopIteration:
+                    break
+                df = _to_template(batch, template)
+                st.rows_out = len(df)
+            yield df
+    finally:
+        con.close()
+
+def transform_table_duckdb(src: Path, processed: Path, base_name: str, text_kinds: dict[str, str],
+                           size_ml: bool = False, columns: list[str] | None = None,
+                           export_csv: bool = False, chunksize: int | None = None) -> tuple[Path, dict]:
+    """Igual que transform_table (modo lotes) pero con la limpieza en DuckDB. Devuelve (ruta, conteos)."""
+    from src.transform_template import intern_keys, write_outputs_chunked
+
+    rows_in = pq.ParquetFile(src).metadata.num_rows
+    batches = (intern_keys(df, processed) for df in iter_clean(src, text_kinds, size_ml, columns, chunksize))
+    out_path, rows_out = write_outputs_chunked(batches, processed, base_name, export_csv)
+    counts = {"rows_in": rows_in, "duplicates_batch": rows_in - rows_out,
+              "duplicates_seen": 0, "rows_out": rows_out}
+    return out_path, counts
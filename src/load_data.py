@@ -1,6 +1,11 @@
+import argparse
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
 from pathlib import Path
-from src.config import RAW_DIR, INTERIM_DIR, FILES
+from src.config import RAW_DIR, INTERIM_DIR, FILES, SCHEMAS, PARQUET_OPTIONS
+from src.instrument import DEFAULT_LOG, instrumented, stage
 
 INTERIM_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -13,99 +18,233 @@ def _to_numeric_safe(s: pd.Series) -> pd.Series:
         s.astype(str).str.replace(r"[,$]", "", regex=True), errors="coerce"
     )
 
+@instrumented(lambda s, formats: f"parse_dates.{s.name}")
+def _parse_dates_safe(s: pd.Series, formats: list[str]) -> pd.Series:
+    out = pd.Series(pd.NaT, index=s.index, dtype="datetime64[ns]")
+    for fmt in formats:
+        out = out.fillna(pd.to_datetime(s, format=fmt, errors="coerce"))
+    return out
+
 def read_csv_safe(path: Path) -> pd.DataFrame:
     return pd.read_csv(path, encoding="utf-8", low_memory=False)
 
-def save_interim(df: pd.DataFrame, name: str):
-    df.to_parquet(INTERIM_DIR / f"{name}.parquet", index=False)
-    df.to_csv(INTERIM_DIR / f"{name}.csv", index=False)
+# -------- lectura tipada (SCHEMAS + pyarrow.csv) --------
+_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+def csv_options(source: str, lenient: bool = False):
+    """
+    ReadOptions/ConvertOptions de pyarrow.csv para SCHEMAS[source].
+    lenient=True lee numéricos y fechas como texto (para limpiarlos después).
+    """
+    schema = SCHEMAS[source]
+    column_types, formats = {}, []
+    for col, alias in schema["dtypes"].items():
+        column_types[col] = pa.string() if lenient else pa.type_for_alias(alias)
+    for col in schema["categoricals"]:
+        column_types[col] = _CATEGORY
+    for col, fmts in schema["dates"].items():
+        column_types[col] = pa.string() if lenient else pa.timestamp("ns")
+        formats += [f for f in fmts if f not in formats]
+    read_opts = pv.ReadOptions(use_threads=True)
+    convert_opts = pv.ConvertOptions(
+        column_types=column_types,
+        timestamp_parsers=formats,
+        strings_can_be_null=True,
+    )
+    return read_opts, convert_opts
+
+def _arrow_to_pandas(table: pa.Table) -> pd.DataFrame:
+    # texto como string[pyarrow] y diccionarios como category: sin etapa object
+    return table.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+
+def _lenient_types(df: pd.DataFrame, source: str, stable: bool = False) -> pd.DataFrame:
+    """
+    Numéricos y fechas leídos como texto -> tipos del esquema; lo que no se
+    pueda convertir queda nulo. stable=True deja todos los numéricos en
+    float64, así todos los lotes de un archivo comparten el mismo tipo.
+    """
+    schema = SCHEMAS[source]
+    for col, alias in schema["dtypes"].items():
+        if col in df and alias != "string" and col not in schema["categoricals"]:
+            df[col] = _to_numeric_safe(df[col])
+            if stable:
+                df[col] = df[col].astype("float64")
+    for col, fmts in schema["dates"].items():
+        if col in df:
+            df[col] = _parse_dates_safe(df[col], fmts)
+    return df
+
+def _read_csv_lenient(path: Path, source: str) -> pd.DataFrame:
+    """Lectura tolerante: lo que no cumpla el esquema queda como nulo (como antes)."""
+    read_opts, convert_opts = csv_options(source, lenient=True)
+    df = _arrow_to_pandas(pv.read_csv(path, read_options=read_opts, convert_options=convert_opts))
+    return _lenient_types(df, source)
+
+@instrumented("read")
+def read_csv_typed(path: Path, source: str) -> pd.DataFrame:
+    """Lee un raw con el esquema de SCHEMAS[source] (multihilo, tipado al leer)."""
+    read_opts, convert_opts = csv_options(source)
+    try:
+        table = pv.read_csv(path, read_options=read_opts, convert_options=convert_opts)
+    except pa.ArrowInvalid as e:
+        print(f"⚠️ {path.name} no cumple el esquema ({e}); uso lectura tolerante")
+        return _read_csv_lenient(path, source)
+    return _arrow_to_pandas(table)
+
+def save_interim(df: pd.DataFrame, name: str, export_csv: bool = False):
+    """Guarda en interim como parquet; el CSV solo si se pide (export_csv)."""
+    outputs = [INTERIM_DIR / f"{name}.parquet"]
+    with stage("write", rows_in=len(df)) as st:
+        df.to_parquet(outputs[0], index=False, **PARQUET_OPTIONS)
+        if export_csv:
+            outputs.append(INTERIM_DIR / f"{name}.csv")
+            df.to_csv(outputs[-1], index=False)
+        st.rows_out, st.bytes_out = len(df), sum(p.stat().st_size for p in outputs)
+
+# -------- modo streaming (por lotes) --------
+def iter_csv_chunks(path: Path, source: str, chunksize: int, lenient: bool = False):
+    """
+    Lee el CSV tipado en lotes de `chunksize` filas (memoria acotada por el lote).
+    pyarrow entrega bloques de tamaño variable; se re-cortan a `chunksize` sin copiar.
+    lenient=True lee numéricos y fechas como texto y los convierte lote a lote
+    como _read_csv_lenient (lo inválido queda nulo).
+    """
+    read_opts, convert_opts = csv_options(source, lenient=lenient)
+    reader = pv.open_csv(path, read_options=read_opts, convert_options=convert_opts)
+    to_pandas = (lambda t: _lenient_types(_arrow_to_pandas(t), source, stable=True)) if lenient else _arrow_to_pandas
+    pending = None
+    for batch in reader:
+        table = pa.Table.from_batches([batch])
+        pending = table if pending is None else pa.concat_tables([pending, table])
+        while pending.num_rows >= chunksize:
+            yield to_pandas(pending.slice(0, chunksize))
+            pending = pending.slice(chunksize)
+    if pending is not None and pending.num_rows:
+        yield to_pandas(pending)
+
+def _stream_schema(table: pa.Table) -> pa.Schema:
+    """
+    Esquema fijo para todo el archivo a partir del primer lote (los tipos ya
+    vienen de SCHEMAS). Solo las columnas sin tipo conocido y 100% nulas en el
+    primer lote se guardan como texto.
+    """
+    return pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f
+                      for f in table.schema])
+
+def save_interim_chunked(chunks, name: str, standardize=None, export_csv: bool = False) -> int:
+    """
+    Escribe lote a lote en interim: parquet con un row group por lote
+    (ParquetWriter) y, si se pide, CSV en modo append. Devuelve el total de filas.
+    """
+    out_parquet = INTERIM_DIR / f"{name}.parquet"
+    out_csv = INTERIM_DIR / f"{name}.csv"
+    writer = None
+    total = 0
+    try:
+        for chunk in chunks:
+            if standardize is not None:
+                chunk = standardize(chunk)
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                schema = _stream_schema(table)
+                writer = pq.ParquetWriter(out_parquet, schema, **PARQUET_OPTIONS)
+            try:
+                table = table.select(writer.schema.names).cast(writer.schema)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError, KeyError) as e:
+                raise ValueError(
+                    f"El lote de '{name}' (filas {total}-{total + len(chunk)}) no es "
+                    f"compatible con el esquema del primer lote: {e}. "
+                    "Prueba con un --chunksize mayor."
+                ) from e
+            writer.write_table(table, row_group_size=len(chunk))
+            if export_csv:
+                chunk.to_csv(out_csv, mode="w" if total == 0 else "a",
+                             header=(total == 0), index=False)
+            total += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return total
 
 # -------- estandarización --------
-def _standardize_sales(df: pd.DataFrame) -> pd.DataFrame:
-    rename_map = {
-        "SalesDate": "InvoiceDate",
-        "SalesQuantity": "Quantity",
-        "SalesPrice": "UnitPrice",
-        "SalesDollars": "TotalAmount",
-        # opcionales: mantiene consistencia
-        "InventoryId": "InventoryId",
-        "Store": "Store",
-        "Brand": "Brand",
-        "Description": "ProductName",
-        "Size": "Size",
-        "Volume": "Volume",
-        "Classification": "Classification",
-        "ExciseTax": "ExciseTax",
-        "VendorNo": "VendorId",
-        "VendorName": "VendorName",
-    }
-    df = df.rename(columns=rename_map)
-
-    # tipados
-    if "InvoiceDate" in df: df["InvoiceDate"] = _to_datetime_safe(df["InvoiceDate"])
+@instrumented("coerce")
+def _coerce_types(df: pd.DataFrame) -> pd.DataFrame:
+    # solo si la columna no vino tipada desde la lectura
+    if "InvoiceDate" in df and not pd.api.types.is_datetime64_any_dtype(df["InvoiceDate"]):
+        df["InvoiceDate"] = _to_datetime_safe(df["InvoiceDate"])
     for col in ("Quantity", "UnitPrice", "TotalAmount"):
-        if col in df: df[col] = _to_numeric_safe(df[col])
-
+        if col in df and not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = _to_numeric_safe(df[col])
     return df
 
+@instrumented("standardize")
+def _standardize_sales(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.rename(columns=SCHEMAS["sales"]["rename"])
+    return _coerce_types(df)
 
-def _standardize_purchases(df: pd.DataFrame) -> pd.DataFrame:
-    rename_map = {
-        "InvoiceDate": "InvoiceDate",
-        "Quantity": "Quantity",
-        "PurchasePrice": "UnitPrice",
-        "Dollars": "TotalAmount",
-        "PONumber": "InvoiceNo",   # usamos PONumber como ID de factura
-        # extras para consistencia
-        "InventoryId": "InventoryId",
-        "Store": "Store",
-        "Brand": "Brand",
-        "Description": "ProductName",
-        "Size": "Size",
-        "VendorNumber": "VendorId",
-        "VendorName": "VendorName",
-        "PODate": "PODate",
-        "ReceivingDate": "ReceivingDate",
-        "PayDate": "PayDate",
-        "Classification": "Classification",
-    }
-    df = df.rename(columns=rename_map)
-
-    # tipados
-    if "InvoiceDate" in df: df["InvoiceDate"] = _to_datetime_safe(df["InvoiceDate"])
-    for col in ("Quantity", "UnitPrice", "TotalAmount"):
-        if col in df: df[col] = _to_numeric_safe(df[col])
 
-    return df
+@instrumented("standardize")
+def _standardize_purchases(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.rename(columns=SCHEMAS["purchases"]["rename"])
+    return _coerce_types(df)
 
 # -------- main --------
-def main():
-    # PRICES
-    prices = read_csv_safe(RAW_DIR / FILES["prices"])
-    save_interim(prices, "prices")
-
-    # INVENTARIOS
-    inv_beg = read_csv_safe(RAW_DIR / FILES["inv_beg"])
-    inv_end = read_csv_safe(RAW_DIR / FILES["inv_end"])
-    save_interim(inv_beg, "inventory_beg")
-    save_interim(inv_end, "inventory_end")
-
-    # INVOICES (purchases header)
-    invoices = read_csv_safe(RAW_DIR / FILES["invoices"])
-    invoices = _standardize_purchases(invoices)
-    save_interim(invoices, "invoice_purchases")
-
-    # PURCHASES (purchases detail)
-    purchases = read_csv_safe(RAW_DIR / FILES["purchases"])
-    purchases = _standardize_purchases(purchases)
-    save_interim(purchases, "purchases")
-
-    # SALES
-    sales = read_csv_safe(RAW_DIR / FILES["sales"])
-    sales = _standardize_sales(sales)
-    save_interim(sales, "sales")
-
-    print("✅ Todos los datos cargados, estandarizados y guardados en data/interim/")
+# (clave en FILES, nombre en interim, estandarización)
+SOURCES = (
+    ("prices", "prices", None),
+    ("inv_beg", "inventory_beg", None),
+    ("inv_end", "inventory_end", None),
+    ("invoices", "invoice_purchases", _standardize_purchases),     # purchases header
+    ("purchases", "purchases", _standardize_purchases),            # purchases detail
+    ("sales", "sales", _standardize_sales),
+)
+
+def load_source(key: str, chunksize: int | None = None, export_csv: bool = False) -> int:
+    """
+    Carga una fuente raw -> interim (una tarea del pipeline).
+    chunksize=None: lee el archivo completo (modo original).
+    chunksize=N: modo streaming, lotes de N filas; el pico de memoria lo fija N.
+    export_csv: además del parquet, deja una copia CSV.
+    """
+    _, name, standardize = next(src for src in SOURCES if src[0] == key)
+    path = RAW_DIR / FILES[key]
+    if chunksize:
+        # lectura, estandarización y escritura van intercaladas: una sola etapa
+        with stage("stream", bytes_in=path.stat().st_size) as st:
+            try:
+                rows = save_interim_chunked(iter_csv_chunks(path, key, chunksize), name, standardize, export_csv)
+            except pa.ArrowInvalid as e:
+                # el error puede aparecer a mitad del archivo: se reescribe entero en modo tolerante
+                print(f"⚠️ {path.name} no cumple el esquema ({e}); uso lectura tolerante por lotes")
+                rows = save_interim_chunked(iter_csv_chunks(path, key, chunksize, lenient=True),
+                                            name, standardize, export_csv)
+            st.rows_in = st.rows_out = rows
+            exts = (".parquet", ".csv") if export_csv else (".parquet",)
+            st.bytes_out = sum((INTERIM_DIR / f"{name}{ext}").stat().st_size for ext in exts)
+        print(f"✅ {name}: {rows} filas en lotes de {chunksize}")
+        return rows
+    df = read_csv_typed(path, key)
+    if standardize is not None:
+        df = standardize(df)
+    save_interim(df, name, export_csv)
+    return len(df)
+
+def main(chunksize: int | None = None, force: bool = False, dry_run: bool = False,
+         export_csv: bool = False, run_log: Path | None = DEFAULT_LOG, profile: str | None = None):
+    """Carga todas las fuentes; salta las que no cambiaron (manifiesto en interim)."""
+    from src import pipeline
+    pipeline.main(workers=1, chunksize=chunksize, force=force, dry_run=dry_run,
+                  export_csv=export_csv, only="load_", run_log=run_log, profile=profile)
+
+    if not dry_run:
+        print("✅ Todos los datos cargados, estandarizados y guardados en data/interim/")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    from src.pipeline import add_run_args
+    parser = argparse.ArgumentParser(description="Carga raw -> interim")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="filas por lote (modo streaming); sin valor lee cada archivo completo")
+    add_run_args(parser)
+    args = parser.parse_args()
+    main(chunksize=args.chunksize, force=args.force, dry_run=args.dry_run, export_csv=args.csv,
+         run_log=args.run_log, profile=args.profile)
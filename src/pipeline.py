@@ -0,0 +1,326 @@
+# src/pipeline.py
+"""
+Orquestador del pipeline raw -> interim -> processed.
+
+Cada paso es una Task con sus archivos de entrada y salida; las dependencias
+se deducen de esos archivos (una tarea espera a quien produce sus entradas).
+Las tareas listas se ejecutan en un pool de procesos, así cada tabla de
+interim alimenta su transform apenas está lista.
+
+Las tareas cuyas entradas y versión de código no cambiaron desde la última
+corrida se saltan (ver src/build_cache.py); --force reconstruye todo y
+--dry-run solo informa qué se reconstruiría.
+
+Cada corrida deja métricas por etapa (tiempo, CPU, memoria, filas, bytes) en
+el run log JSON-lines de src/instrument.py; --profile guarda además perfiles
+cProfile de las etapas que coincidan con un patrón.
+
+Uso:
+    python -m src.pipeline --workers 4 [--chunksize 500000] [--backend duckdb] [--force] [--dry-run] [--csv]
+                           [--simulate 200]
+                           [--run-log data/logs/run_log.jsonl] [--profile 'transform_sales.*']
+"""
+import argparse
+import os
+import time
+from functools import partial
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+from src.config import RAW_DIR, INTERIM_DIR, PROCESSED_DIR, FILES, SCHEMAS, PARQUET_OPTIONS
+from src import build_cache
+from src import instrument
+from src import dedupe
+from src import dimensions
+from src import profiling
+from src import lazy_backend
+from src import load_data
+from src import transform_template as tt
+from src import inventory_policy
+from src import inventory_simulation
+from src import sales_cube
+from src import reconciliation
+
+
+class Task(NamedTuple):
+    name: str
+    fn: Callable
+    args: tuple
+    inputs: tuple[Path, ...]
+    outputs: tuple[Path, ...]
+    version: str = ""
+
+
+# ===================== ejecución =====================
+
+def _timed_call(name: str, fn: Callable, args: tuple) -> float:
+    start = time.perf_counter()
+    with instrument.task(name):
+        fn(*args)
+    return time.perf_counter() - start
+
+def _run_transform(fn: Callable, interim: Path, *args):
+    """Envuelve un transform_* para compartir el memo de normalización entre procesos."""
+    cache = interim / "_norm_cache"
+    tt.load_norm_cache(cache)
+    fn(interim, *args)
+    tt.save_norm_cache(cache)
+
+def _dependencies(tasks: list[Task]) -> dict[str, set[str]]:
+    producer = {out: t.name for t in tasks for out in t.outputs}
+    deps = {t.name: {producer[i] for i in t.inputs if i in producer} - {t.name} for t in tasks}
+    # detectar ciclos antes de arrancar el pool
+    pending, done = dict(deps), set()
+    while pending:
+        ready = [n for n, d in pending.items() if d <= done]
+        if not ready:
+            raise ValueError(f"Ciclo de dependencias entre: {sorted(pending)}")
+        for n in ready:
+            done.add(n)
+            del pending[n]
+    return deps
+
+def run_pipeline(tasks: list[Task], workers: int | None = None,
+                 force: bool = False, dry_run: bool = False) -> dict[str, float]:
+    """
+    Ejecuta las tareas respetando dependencias, con hasta `workers` procesos
+    (workers=1 ejecuta en este mismo proceso). Las tareas vigentes según el
+    manifiesto se saltan salvo `force`. Devuelve el tiempo de pared (s) por
+    tarea ejecutada.
+    """
+    deps = _dependencies(tasks)
+    by_name = {t.name: t for t in tasks}
+    manifests = {}
+    for t in tasks:
+        folder = t.outputs[0].parent
+        if folder not in manifests:
+            manifests[folder] = build_cache.load_manifest(folder)
+
+    done: set[str] = set()
+    rebuilt: set[str] = set()
+    timings: dict[str, float] = {}
+    running = {}
+    workers = workers or os.cpu_count() or 1
+
+    def plan(task: Task) -> tuple[bool, str, dict]:
+        """(hay que construir, motivo, huellas de entradas)."""
+        manifest = manifests[task.outputs[0].parent]
+        fresh, reason, inputs_fp = build_cache.check_entry(
+            manifest.get(task.name), task.inputs, task.version, task.outputs)
+        upstream = sorted(deps[task.name] & rebuilt)
+        if dry_run and upstream:
+            return True, f"se reconstruye {upstream[0]}", inputs_fp
+        if force:
+            return True, "--force", inputs_fp
+        return not fresh, reason, inputs_fp
+
+    def finish(task: Task, inputs_fp: dict, secs: float):
+        timings[task.name] = secs
+        rebuilt.add(task.name)
+        done.add(task.name)
+        folder = task.outputs[0].parent
+        manifests[folder][task.name] = build_cache.make_entry(inputs_fp, task.version, task.outputs)
+        build_cache.save_manifest(folder, manifests[folder])
+        print(f"⏱️ {task.name}: {secs:.2f}s")
+
+    def ready():
+        return [n for n in by_name
+                if n not in done and n not in {r[0] for r in running.values()} and deps[n] <= done]
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 and not dry_run else None
+    try:
+        while len(done) < len(tasks):
+            for name in ready():
+                task = by_name[name]
+                build, reason, inputs_fp = plan(task)
+                if not build:
+                    print(f"⏩ {name}: {reason}")
+                    done.add(name)
+                    continue
+                if dry_run:
+                    print(f"🔁 {name}: se reconstruiría ({reason})")
+                    rebuilt.add(name)
+                    done.add(name)
+                    continue
+                if pool is None:
+                    finish(task, inputs_fp, _timed_call(name, task.fn, task.args))
+                    continue
+                running[pool.submit(_timed_call, name, task.fn, task.args)] = (name, inputs_fp)
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                name, inputs_fp = running.pop(fut)
+                finish(by_name[name], inputs_fp, fut.result())   # propaga la excepción de la tarea
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return timings
+
+def print_report(timings: dict[str, float], wall: float):
+    print("\n=== Tiempos por tarea ===")
+    if not timings:
+        print("(nada que reconstruir)")
+    for name, secs in sorted(timings.items(), key=lambda kv: -kv[1]):
+        print(f"{name:<28}{secs:>9.2f}s")
+    print(f"{'total (pared)':<28}{wall:>9.2f}s | suma tareas {sum(timings.values()):.2f}s")
+
+
+# ===================== grafo =====================
+
+def _interim_outputs(name: str, export_csv: bool) -> tuple[Path, ...]:
+    exts = (".parquet", ".csv") if export_csv else (".parquet",)
+    return tuple(INTERIM_DIR / f"{name}{ext}" for ext in exts)
+
+def _processed_outputs(base: str, export_csv: bool) -> tuple[Path, ...]:
+    exts = (".parquet", "_dictionary.csv") + ((".csv",) if export_csv else ())
+    return tuple(PROCESSED_DIR / f"{base}{ext}" for ext in exts)
+
+def build_tasks(chunksize: int | None = None, export_csv: bool = False,
+                backend: str = "pandas", simulation_scenarios: int | None = None,
+                simulation_workers: int = 1) -> list[Task]:
+    """
+    Grafo completo: carga de cada fuente + su transform + cubo de ventas
+    particionado + políticas de inventario sobre ventas/compras limpias +
+    conciliación de stock. Entre etapas solo viaja parquet; export_csv agrega
+    copias CSV (interim y processed).
+
+    La simulación Monte Carlo de las políticas es opcional (minutos con los
+    datos completos): solo entra si se pide `simulation_scenarios`. Dentro del
+    pool del pipeline corre con `simulation_workers` procesos (1 por defecto:
+    el paralelismo ya lo da --workers).
+    """
+    tasks = []
+    for key, name, _ in load_data.SOURCES:
+        tasks.append(Task(
+            name=f"load_{name}",
+            fn=load_data.load_source,
+            args=(key, chunksize, export_csv),
+            inputs=(RAW_DIR / FILES[key],),
+            outputs=_interim_outputs(name, export_csv),
+            version=build_cache.code_version(load_data.__file__, extra=SCHEMAS[key]),
+        ))
+
+    # todo el código que corre dentro de un transform_*: si cambia, las tablas limpias se rehacen
+    transform_version = build_cache.code_version(tt.__file__, dedupe.__file__, dimensions.__file__,
+                                                 profiling.__file__, lazy_backend.__file__,
+                                                 extra=PARQUET_OPTIONS)
+
+    def transform(name, fn, args, src, base):
+        tasks.append(Task(
+            name=name,
+            fn=_run_transform,
+            args=(partial(fn, export_csv=export_csv, chunksize=chunksize, backend=backend), INTERIM_DIR, *args),
+            inputs=(INTERIM_DIR / f"{src}.parquet",),
+            # carpeta de dimensiones compartida: si se borra, se re-transforma todo
+            outputs=_processed_outputs(base, export_csv) + (dimensions.dims_dir(PROCESSED_DIR),),
+            version=transform_version,
+        ))
+
+    transform("transform_sales", tt.transform_sales, (PROCESSED_DIR,), "sales", "sales_clean")
+    transform("transform_purchases", tt.transform_purchases, (PROCESSED_DIR,), "purchases", "purchases_clean")
+    transform("transform_invoice_purchases", tt.transform_invoice_purchases, (PROCESSED_DIR, RAW_DIR),
+              "invoice_purchases", "invoice_purchases_clean")
+    transform("transform_inventory_beg", tt.transform_inventory, (PROCESSED_DIR, "beg"),
+              "inventory_beg", "inventory_beg_clean")
+    transform("transform_inventory_end", tt.transform_inventory, (PROCESSED_DIR, "end"),
+              "inventory_end", "inventory_end_clean")
+    transform("transform_prices", tt.transform_prices, (PROCESSED_DIR, RAW_DIR), "prices", "prices_clean")
+
+    tasks.append(Task(
+        name="cube_sales",
+        fn=sales_cube.build_cube,
+        args=(PROCESSED_DIR,),
+        inputs=(PROCESSED_DIR / "sales_clean.parquet",),
+        outputs=(sales_cube.cube_dir(PROCESSED_DIR) / sales_cube.META_NAME,),
+        version=sales_cube.cube_version(),
+    ))
+
+    policy_exts = (".parquet", ".csv") if export_csv else (".parquet",)
+    tasks.append(Task(
+        name="policy_inventory",
+        fn=inventory_policy.build_policies,
+        args=(PROCESSED_DIR, export_csv),
+        inputs=(PROCESSED_DIR / "sales_clean.parquet", PROCESSED_DIR / "purchases_clean.parquet"),
+        outputs=tuple(PROCESSED_DIR / f"inventory_policy_{name}{ext}"
+                      for name in inventory_policy.POLICY_KEYS for ext in policy_exts),
+        version=build_cache.code_version(inventory_policy.__file__),
+    ))
+
+    if simulation_scenarios:
+        tasks.append(Task(
+            name="policy_simulation",
+            fn=inventory_simulation.build_simulation,
+            args=(PROCESSED_DIR, export_csv, simulation_scenarios, inventory_simulation.HORIZON, 0,
+                  simulation_workers),
+            inputs=(PROCESSED_DIR / "sales_clean.parquet", PROCESSED_DIR / "purchases_clean.parquet",
+                    PROCESSED_DIR / inventory_simulation.POLICY_FILE),
+            outputs=tuple(PROCESSED_DIR / f"{inventory_simulation.REPORT_NAME}{ext}" for ext in policy_exts),
+            version=build_cache.code_version(inventory_simulation.__file__,
+                                             extra={"scenarios": simulation_scenarios}),
+        ))
+
+    tasks.append(Task(
+        name="report_reconciliation",
+        fn=reconciliation.build_reconciliation,
+        args=(PROCESSED_DIR, export_csv),
+        inputs=tuple(PROCESSED_DIR / f"{t}_clean.parquet" for t in reconciliation.SOURCES),
+        outputs=tuple(PROCESSED_DIR / f"{reconciliation.REPORT_NAME}{ext}" for ext in policy_exts),
+        version=build_cache.code_version(reconciliation.__file__),
+    ))
+    return tasks
+
+def main(workers: int | None = None, chunksize: int | None = None,
+         force: bool = False, dry_run: bool = False, export_csv: bool = False,
+         only: str | None = None, run_log: Path | None = instrument.DEFAULT_LOG,
+         profile: str | None = None, backend: str = "pandas", simulate: int | None = None):
+    """
+    only: prefijo de tareas a ejecutar (p. ej. 'load_', 'transform_', 'cube_', 'policy_' o 'report_').
+    run_log: archivo JSON-lines con las métricas por etapa (None lo desactiva).
+    profile: patrón 'tarea.etapa' de las etapas a perfilar con cProfile.
+    backend: motor de los transform_* ('pandas' o 'duckdb', ver src/lazy_backend.py).
+    simulate: escenarios de la simulación Monte Carlo (None = sin simulación).
+    """
+    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+    tasks = build_tasks(chunksize, export_csv, backend, simulation_scenarios=simulate)
+    if only:
+        tasks = [t for t in tasks if t.name.startswith(only)]
+    run_id = instrument.configure(None if dry_run else run_log, profile)
+    start = time.perf_counter()
+    timings = run_pipeline(tasks, workers, force=force, dry_run=dry_run)
+    if not dry_run:
+        print_report(timings, time.perf_counter() - start)
+        if run_log is not None and timings:
+            print(f"📝 run log: {run_log} (corrida {run_id}); resumen con python -m src.instrument")
+
+def add_run_args(parser: argparse.ArgumentParser):
+    parser.add_argument("--force", action="store_true",
+                        help="reconstruye aunque entradas y código no hayan cambiado")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="solo informa qué tareas se reconstruirían")
+    parser.add_argument("--csv", action="store_true",
+                        help="exporta también CSV (p. ej. para Power BI); por defecto solo parquet")
+    parser.add_argument("--run-log", type=Path, default=instrument.DEFAULT_LOG,
+                        help="run log JSON-lines con métricas por etapa")
+    parser.add_argument("--no-run-log", dest="run_log", action="store_const", const=None,
+                        help="no registra métricas por etapa")
+    parser.add_argument("--profile", nargs="?", const="*", default=None, metavar="PATRÓN",
+                        help="guarda perfiles cProfile de las etapas 'tarea.etapa' que coincidan "
+                             "(sin patrón: cada tarea completa)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline raw -> interim -> processed en paralelo")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="procesos en paralelo (por defecto: núcleos disponibles)")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="filas por lote en la carga y las transformaciones (modo streaming)")
+    parser.add_argument("--backend", choices=("pandas", "duckdb"), default="pandas",
+                        help="motor de los transform_*: pandas o una consulta DuckDB por tabla")
+    parser.add_argument("--simulate", type=int, default=None, metavar="ESCENARIOS",
+                        help="agrega la simulación Monte Carlo de las políticas con estos escenarios")
+    add_run_args(parser)
+    args = parser.parse_args()
+    main(workers=args.workers, chunksize=args.chunksize, force=args.force, dry_run=args.dry_run,
+         export_csv=args.csv, run_log=args.run_log, profile=args.profile, backend=args.backend,
+         simulate=args.simulate)
@@ -0,0 +1,129 @@
+# src/reconciliation.py
+"""
+Conciliación de stock por inventoryid:
+
+    inventario inicial + compras recibidas − ventas  vs.  inventario final
+
+Todo se calcula sobre los IDs enteros de src/dimensions.py (`inventory_id`,
+`store_id`, `brand_id`): cada medida es un `np.bincount` por ID, sin joins
+entre tablas ni comparaciones de texto. Solo se consideran compras recibidas
+y ventas dentro del período de los inventarios (startdate..enddate).
+
+Uso:
+    python -m src.reconciliation [--csv]
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.config import PROCESSED_DIR, PARQUET_OPTIONS
+from src.dimensions import dim_path, load_dim
+from src.instrument import DEFAULT_LOG
+
+REPORT_NAME = "stock_reconciliation"
+SOURCES = {
+    # tabla -> (columna cantidad, columna fecha para el período)
+    "inventory_beg": ("onhand", None),
+    "purchases": ("quantity", "receivingdate"),
+    "sales": ("quantity", "invoicedate"),
+    "inventory_end": ("onhand", None),
+}
+ID_COLUMNS = ["inventory_id", "store_id", "brand_id"]
+
+
+def _read(processed: Path, table: str, columns: list[str]) -> pd.DataFrame:
+    """Lee solo las columnas pedidas; las que falten quedan nulas."""
+    path = processed / f"{table}_clean.parquet"
+    present = set(pq.ParquetFile(path).schema_arrow.names)
+    df = pd.read_parquet(path, columns=[c for c in columns if c in present])
+    for c in columns:
+        if c not in df:
+            df[c] = pd.Series(pd.NA, index=df.index, dtype="Int32")
+    return df
+
+def _dim_values(processed: Path, dim: str, n: int | None = None) -> np.ndarray:
+    """Valores de la dimensión indexados por ID (los IDs son 0..n-1)."""
+    table = load_dim(processed, dim)
+    values = np.empty(max(int(table["id"].max()) + 1 if len(table) else 0, n or 0), dtype=object)
+    values[table["id"].to_numpy()] = table["value"].to_numpy()
+    return values
+
+def stock_reconciliation(processed: Path = PROCESSED_DIR) -> pd.DataFrame:
+    """Una fila por inventoryid presente en alguna tabla, con el descuadre `difference`."""
+    frames = {}
+    for table, (qty, date) in SOURCES.items():
+        cols = ID_COLUMNS + [qty] + ([date] if date else [])
+        frames[table] = _read(processed, table, cols)
+
+    # período: del inventario inicial al final
+    start = pd.to_datetime(pd.read_parquet(processed / "inventory_beg_clean.parquet",
+                                           columns=["startdate"])["startdate"]).min()
+    end = pd.to_datetime(pd.read_parquet(processed / "inventory_end_clean.parquet",
+                                         columns=["enddate"])["enddate"]).max()
+
+    if not dim_path(processed, "inventory").exists():
+        raise FileNotFoundError(f"Falta {dim_path(processed, 'inventory')}: corre primero los transforms")
+    n = len(load_dim(processed, "inventory"))
+    store_of = np.full(n, -1, dtype="int64")
+    brand_of = np.full(n, -1, dtype="int64")
+    totals, seen = {}, np.zeros(n, dtype=bool)
+    for table, (qty, date) in SOURCES.items():
+        df = frames[table]
+        mask = df["inventory_id"].notna().to_numpy()
+        if date is not None and pd.notna(start) and pd.notna(end):
+            dates = pd.to_datetime(df[date])
+            mask &= ((dates >= start) & (dates <= end)).to_numpy()
+        ids = df["inventory_id"].to_numpy(dtype="int64", na_value=-1)[mask]
+        weights = pd.to_numeric(df[qty], errors="coerce").fillna(0).to_numpy(dtype="float64")[mask]
+        totals[table] = np.bincount(ids, weights=weights, minlength=n)
+        seen[ids] = True
+        for target, col in ((store_of, "store_id"), (brand_of, "brand_id")):
+            target[ids] = df[col].to_numpy(dtype="int64", na_value=-1)[mask]
+
+    expected = totals["inventory_beg"] + totals["purchases"] - totals["sales"]
+    idx = np.flatnonzero(seen)
+    stores, brands = _dim_values(processed, "store"), _dim_values(processed, "brand")
+    store_ids, brand_ids = store_of[idx], brand_of[idx]
+    report = pd.DataFrame({
+        "inventory_id": idx.astype("int32"),
+        "inventoryid": _dim_values(processed, "inventory", n)[idx],
+        "store_id": pd.arrays.IntegerArray(store_ids.astype("int32"), store_ids < 0),
+        "brand_id": pd.arrays.IntegerArray(brand_ids.astype("int32"), brand_ids < 0),
+        "store": np.where(store_ids >= 0, stores[np.maximum(store_ids, 0)] if len(stores) else None, None),
+        "brand": np.where(brand_ids >= 0, brands[np.maximum(brand_ids, 0)] if len(brands) else None, None),
+        "begin_onhand": totals["inventory_beg"][idx],
+        "purchased": totals["purchases"][idx],
+        "sold": totals["sales"][idx],
+        "expected_end": expected[idx],
+        "end_onhand": totals["inventory_end"][idx],
+    })
+    report["difference"] = report["end_onhand"] - report["expected_end"]
+    return report
+
+def build_reconciliation(processed: Path = PROCESSED_DIR, export_csv: bool = False) -> Path:
+    report = stock_reconciliation(processed)
+    path = processed / f"{REPORT_NAME}.parquet"
+    report.to_parquet(path, index=False, **PARQUET_OPTIONS)
+    if export_csv:
+        report.to_csv(processed / f"{REPORT_NAME}.csv", index=False)
+    off = report["difference"] != 0
+    print(f"✅ {REPORT_NAME}: {len(report)} inventoryid, {int(off.sum())} con descuadre "
+          f"(neto {report['difference'].sum():+,.0f} u., absoluto {report['difference'].abs().sum():,.0f} u.) | {path}")
+    return path
+
+def main(force: bool = False, dry_run: bool = False, export_csv: bool = False,
+         run_log: Path | None = DEFAULT_LOG, profile: str | None = None):
+    from src import pipeline
+    pipeline.main(workers=1, force=force, dry_run=dry_run, export_csv=export_csv, only="report_",
+                  run_log=run_log, profile=profile)
+
+if __name__ == "__main__":
+    from src.pipeline import add_run_args
+    parser = argparse.ArgumentParser(description="Conciliación de stock por inventoryid")
+    add_run_args(parser)
+    args = parser.parse_args()
+    main(force=args.force, dry_run=args.dry_run, export_csv=args.csv,
+         run_log=args.run_log, profile=args.profile)
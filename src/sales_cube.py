@@ -0,0 +1,235 @@
+# src/sales_cube.py
+"""
+Cubo de ventas preagregado en data/processed/sales_cube/.
+
+Unidades, dólares y registros por (día | semana W-SUN) × tienda × marca ×
+proveedor, en parquet particionado estilo Hive:
+
+    sales_cube/daily/year=2016/month=3/part-0.parquet
+    sales_cube/weekly/year=2016/month=3/part-0.parquet    (mes de fin de semana)
+
+Dentro de cada archivo las filas van ordenadas por tienda, marca y fecha, así
+las estadísticas por row group permiten saltar bloques al filtrar por tienda.
+
+Actualización incremental: por cada mes de ventas se guarda una huella del
+contenido (suma de huellas de fila, src/dedupe.py) en _cube.json; al
+reconstruir solo se reescriben las particiones de los meses que cambiaron
+(y las semanas que tocan esos meses).
+
+Lectura con poda de particiones y filtros empujados al parquet:
+    read_cube("weekly", start="2016-01-01", end="2016-03-31", stores=[1])
+"""
+import argparse
+import functools
+import json
+import operator
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.config import PROCESSED_DIR, PARQUET_OPTIONS
+from src import dedupe
+from src.build_cache import code_version
+from src.dedupe import row_fingerprints
+from src.instrument import DEFAULT_LOG
+
+CUBE_DIR_NAME = "sales_cube"
+META_NAME = "_cube.json"
+GRAINS = {"daily": "date", "weekly": "week"}
+KEYS = ["store", "brand", "vendorid"]
+MEASURES = {"quantity": "quantity", "totalamount": "dollars"}     # columna en sales_clean -> cubo
+DATE_COL = "invoicedate"
+ROW_GROUP_ROWS = 100_000
+PARTITIONING = ds.partitioning(pa.schema([("year", pa.int16()), ("month", pa.int8())]), flavor="hive")
+
+
+def cube_dir(processed: Path = PROCESSED_DIR) -> Path:
+    return processed / CUBE_DIR_NAME
+
+def cube_version() -> str:
+    """Código del cubo + huellas por fila (dedupe.row_fingerprints) + opciones de parquet."""
+    return code_version(__file__, dedupe.__file__, extra=PARQUET_OPTIONS)
+
+def _partition_dir(root: Path, grain: str, ym: int) -> Path:
+    return root / grain / f"year={ym // 100}" / f"month={ym % 100}"
+
+def _year_month(dates: pd.Series) -> np.ndarray:
+    return (dates.dt.year * 100 + dates.dt.month).to_numpy()
+
+def _week_end(dates: pd.Series) -> pd.Series:
+    """Domingo de la semana (W-SUN) de cada fecha."""
+    return dates + pd.to_timedelta(6 - dates.dt.weekday, unit="D")
+
+
+# ===================== construcción =====================
+
+def _read_sales(src: Path) -> pd.DataFrame:
+    cols = [c for c in (DATE_COL, *KEYS, *MEASURES) if c in pq.ParquetFile(src).schema_arrow.names]
+    sales = pd.read_parquet(src, columns=cols)
+    sales[DATE_COL] = pd.to_datetime(sales[DATE_COL], errors="coerce").dt.normalize()
+    sales = sales.dropna(subset=[DATE_COL])
+    for k in KEYS:
+        if k not in sales:
+            sales[k] = pd.NA
+    sales["brand"] = sales["brand"].astype(str)
+    return sales
+
+def _month_digests(sales: pd.DataFrame, months: np.ndarray) -> dict[str, dict]:
+    """Huella del contenido de cada mes (independiente del orden de las filas)."""
+    order = np.argsort(months, kind="stable")
+    fp = row_fingerprints(sales)[order]
+    sorted_months = months[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(sorted_months)) + 1]
+    sums = np.add.reduceat(fp, starts) if len(fp) else np.empty(0, dtype="u8")   # suma módulo 2**64
+    counts = np.diff(np.r_[starts, len(fp)])
+    return {str(int(sorted_months[s])): {"rows": int(n), "digest": f"{int(h):016x}"}
+            for s, n, h in zip(starts, counts, sums)}
+
+def _aggregate(sales: pd.DataFrame, period: pd.Series, period_col: str) -> pd.DataFrame:
+    df = sales[KEYS].assign(**{period_col: period.to_numpy()},
+                            **{out: pd.to_numeric(sales[src], errors="coerce").fillna(0.0).to_numpy()
+                               for src, out in MEASURES.items() if src in sales})
+    agg = {out: "sum" for src, out in MEASURES.items() if src in sales}
+    cube = (df.groupby([*KEYS, period_col], dropna=False, sort=False)
+              .agg(**{k: (k, v) for k, v in agg.items()}, rows=(period_col, "size"))
+              .reset_index()
+              .sort_values([*KEYS, period_col], kind="stable", ignore_index=True))
+    cube["store"] = cube["store"].astype("Int32")
+    cube["vendorid"] = cube["vendorid"].astype("Int32")
+    cube["rows"] = cube["rows"].astype("int32")
+    return cube[[period_col, *KEYS, *agg, "rows"]]
+
+def _write_partition(root: Path, grain: str, ym: int, cube: pd.DataFrame):
+    folder = _partition_dir(root, grain, ym)
+    folder.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(cube, preserve_index=False)
+    tmp = folder / f"_part-0.{os.getpid()}.tmp"      # '_' -> el dataset lo ignora mientras se escribe
+    pq.write_table(table, tmp, row_group_size=ROW_GROUP_ROWS, **PARQUET_OPTIONS)
+    os.replace(tmp, folder / "part-0.parquet")
+
+def _drop_partition(root: Path, grain: str, ym: int):
+    folder = _partition_dir(root, grain, ym)
+    shutil.rmtree(folder, ignore_errors=True)
+    if folder.parent.exists() and not any(folder.parent.iterdir()):
+        folder.parent.rmdir()
+
+def build_cube(processed: Path = PROCESSED_DIR, force: bool = False) -> dict:
+    """
+    Materializa (o actualiza) el cubo desde sales_clean.parquet. Solo reescribe
+    las particiones de los meses cuyo contenido cambió. Devuelve qué meses se
+    reescribieron y borraron por grano.
+    """
+    src = processed / "sales_clean.parquet"
+    root = cube_dir(processed)
+    meta_path = root / META_NAME
+    meta = json.loads(meta_path.read_text()) if meta_path.exists() and not force else {}
+    if meta.get("version") != cube_version():
+        meta = {}                                  # cambió el formato del cubo: se rehace entero
+
+    sales = _read_sales(src)
+    months = _year_month(sales[DATE_COL])
+    digests = _month_digests(sales, months)
+    old = meta.get("months", {})
+    changed = {int(m) for m, d in digests.items()
+               if old.get(m) != d or not (_partition_dir(root, "daily", int(m)) / "part-0.parquet").exists()}
+    removed = {int(m) for m in old if m not in digests}
+
+    # semanas: mes de la fecha de fin; una semana puede juntar días de dos meses
+    week = _week_end(sales[DATE_COL])
+    week_months = _year_month(week)
+    touched = np.isin(months, list(changed))
+    weekly_now = {int(m) for m in np.unique(week_months)}
+    weekly_changed = {int(m) for m in np.unique(week_months[touched])}
+    weekly_changed |= {m for m in weekly_now if not (_partition_dir(root, "weekly", m) / "part-0.parquet").exists()}
+    weekly_removed = set(meta.get("weekly_months", [])) - weekly_now
+
+    for ym in sorted(changed):
+        mask = months == ym
+        _write_partition(root, "daily", ym, _aggregate(sales[mask], sales.loc[mask, DATE_COL], "date"))
+    for ym in sorted(weekly_changed):
+        mask = week_months == ym
+        _write_partition(root, "weekly", ym, _aggregate(sales[mask], week[mask], "week"))
+    for ym in removed:
+        _drop_partition(root, "daily", ym)
+    for ym in weekly_removed:
+        _drop_partition(root, "weekly", ym)
+
+    root.mkdir(parents=True, exist_ok=True)
+    tmp = meta_path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"version": cube_version(), "months": digests,
+                               "weekly_months": sorted(weekly_now)}, indent=1))
+    tmp.replace(meta_path)
+    report = {"daily": sorted(changed), "weekly": sorted(weekly_changed),
+              "removed": sorted(removed | weekly_removed)}
+    print(f"✅ sales_cube: {len(changed)}/{len(digests)} meses reescritos, "
+          f"{len(weekly_changed)} particiones semanales, {len(report['removed'])} borradas | {root}")
+    return report
+
+
+# ===================== lectura =====================
+
+def cube_filter(grain: str = "daily", start=None, end=None, stores=None, brands=None,
+                vendors=None) -> ds.Expression | None:
+    """
+    Filtro para el dataset del cubo: las condiciones sobre year/month podan
+    particiones (carpetas) y las de fecha/tienda/marca se empujan a las
+    estadísticas de cada row group.
+    """
+    date_col = GRAINS[grain]
+    year, month = ds.field("year"), ds.field("month")
+    conditions = []
+    if start is not None:
+        start = pd.Timestamp(start)
+        conditions += [(year > start.year) | ((year == start.year) & (month >= start.month)),
+                       ds.field(date_col) >= pa.scalar(start, pa.timestamp("ns"))]
+    if end is not None:
+        end = pd.Timestamp(end)
+        # en el cubo semanal la partición es el mes del domingo: se extiende una semana
+        part_end = end + pd.Timedelta(days=6) if grain == "weekly" else end
+        conditions += [(year < part_end.year) | ((year == part_end.year) & (month <= part_end.month)),
+                       ds.field(date_col) <= pa.scalar(end, pa.timestamp("ns"))]
+    for col, values in (("store", stores), ("brand", brands), ("vendorid", vendors)):
+        if values is not None:
+            values = [str(v) for v in values] if col == "brand" else [int(v) for v in values]
+            conditions.append(ds.field(col).isin(values))
+    return functools.reduce(operator.and_, conditions) if conditions else None
+
+def open_cube(grain: str = "daily", processed: Path = PROCESSED_DIR) -> ds.Dataset:
+    return ds.dataset(cube_dir(processed) / grain, format="parquet", partitioning=PARTITIONING)
+
+def read_cube(grain: str = "daily", columns: list[str] | None = None, start=None, end=None,
+              stores=None, brands=None, vendors=None, processed: Path = PROCESSED_DIR) -> pd.DataFrame:
+    """Lee el cubo filtrado (fechas inclusivas). Ej.: una tienda y un trimestre."""
+    dataset = open_cube(grain, processed)
+    expr = cube_filter(grain, start, end, stores, brands, vendors)
+    return dataset.to_table(columns=columns, filter=expr).to_pandas()
+
+def cube_files(grain: str = "daily", start=None, end=None, stores=None, brands=None,
+               vendors=None, processed: Path = PROCESSED_DIR) -> list[str]:
+    """Archivos que tocaría una consulta (tras podar particiones)."""
+    dataset = open_cube(grain, processed)
+    expr = cube_filter(grain, start, end, stores, brands, vendors)
+    return [f.path for f in dataset.get_fragments(filter=expr)]
+
+
+# ===================== main =====================
+
+def main(force: bool = False, dry_run: bool = False, export_csv: bool = False,
+         run_log: Path | None = DEFAULT_LOG, profile: str | None = None):
+    from src import pipeline
+    pipeline.main(workers=1, force=force, dry_run=dry_run, export_csv=export_csv, only="cube_",
+                  run_log=run_log, profile=profile)
+
+if __name__ == "__main__":
+    from src.pipeline import add_run_args
+    parser = argparse.ArgumentParser(description="Cubo de ventas diario/semanal particionado")
+    add_run_args(parser)
+    args = parser.parse_args()
+    main(force=args.force, dry_run=args.dry_run, export_csv=args.csv,
+         run_log=args.run_log, profile=args.profile)
@@ -0,0 +1,495 @@
+# src/serving.py
+"""
+API HTTP local de baja latencia para pronósticos y puntos de reorden.
+
+No recalcula nada: sirve los artefactos que ya dejó el pipeline en
+data/processed (políticas inventory_policy_*, pronósticos forecasts_incremental
+o forecasts_weekly y la simulación inventory_simulation).
+
+- Cada parquet se lee una vez a memoria y se indexa por sus claves canónicas
+  (src/dimensions.canonical_keys): clave -> posiciones de fila, así una
+  consulta es un lookup en un dict y no un filtro sobre la tabla. No se usa
+  memory_map: el pipeline reescribe los parquet en el lugar y un mapeo vivo
+  sobre un archivo truncado tumba el proceso.
+- Las respuestas se guardan en un LRU en memoria; la clave incluye la versión
+  de los artefactos, así una recarga nunca devuelve datos viejos.
+- Un hilo revisa cada pocos segundos mtime/tamaño de los archivos; si cambian,
+  se arma el índice nuevo aparte y se reemplaza de una vez (las consultas en
+  curso terminan con el anterior). Si la lectura falla (p. ej. el pipeline
+  todavía está escribiendo) se conserva el índice vigente y se reintenta.
+
+Solo usa la librería estándar (http.server) además de pandas/pyarrow.
+
+Endpoints (JSON):
+    GET  /health                          artefactos cargados, versión y caché
+    GET  /policy?store=1&brand=58         política (nivel según las claves: store, brand,
+                                          store+brand, vendorid, year; sin claves -> overall)
+    GET  /forecast?brand=58[&store=1]     pronóstico semanal de la marca o tienda×marca
+    GET  /sku?store=1&brand=58            política + pronóstico + simulación de la tienda×marca
+    GET  /store?store=1                   política de la tienda, de sus marcas y pronóstico total
+    GET  /keys?limit=100                  muestra de claves tienda×marca (para pruebas de carga)
+    POST /batch  {"queries": [{"type": "sku", "store": 1, "brand": 58}, ...]}
+
+Uso:
+    python -m src.serving [--host 127.0.0.1] [--port 8000] [--cache-size 50000] [--reload-every 2]
+    python -m src.serving_loadtest --requests 20000 --concurrency 8
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.config import PROCESSED_DIR
+from src.dimensions import canonical_keys
+from src.inventory_policy import POLICY_KEYS
+
+CACHE_SIZE = 50_000       # respuestas en el LRU
+RELOAD_EVERY = 2.0        # segundos entre revisiones de los artefactos
+MAX_BATCH = 1_000         # consultas por POST /batch
+MAX_KEYS = 100_000        # claves por GET /keys
+SEP = "|"
+
+FORECAST_FILES = ("forecasts_incremental", "forecasts_weekly")   # el primero que exista
+FORECAST_KEYS = ("level", "store", "brand")
+SIMULATION_FILE = "inventory_simulation"
+SIMULATION_KEYS = ("store", "brand")
+QUERY_KEYS = ("store", "brand", "vendorid", "year")
+
+
+class QueryError(ValueError):
+    """Consulta mal formada (400)."""
+
+
+class NotFound(KeyError):
+    """Clave sin datos en los artefactos (404)."""
+
+
+# ===================== índice =====================
+
+def canonical(value) -> str:
+    """Clave canónica de un parámetro (mismo criterio que las columnas indexadas)."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    # equivalente escalar de canonical_keys (sin pasar por pandas en cada request)
+    return str(value).strip().upper()
+
+def _key_strings(frame: pd.DataFrame, cols) -> pd.Series:
+    """Una cadena por fila con los valores canónicos de `cols` ('' para nulos)."""
+    if not cols:
+        return pd.Series("", index=frame.index)
+    parts = [canonical_keys(frame[c].astype(object)).fillna("").astype(str) for c in cols]
+    return parts[0].str.cat(parts[1:], sep=SEP) if len(parts) > 1 else parts[0]
+
+
+class Table:
+    """Un artefacto en memoria con índices clave -> posiciones de fila."""
+
+    def __init__(self, path: Path, keys: tuple, extra_indexes: tuple = ()):
+        self.path = path
+        self.keys = tuple(keys)
+        self.frame = pq.read_table(path).to_pandas()
+        self.indexes = {}
+        for cols in (self.keys, *extra_indexes):
+            keystr = _key_strings(self.frame, cols)
+            self.indexes[tuple(cols)] = pd.Series(np.arange(len(self.frame))).groupby(keystr.to_numpy()).indices
+
+    def positions(self, cols: tuple, values: tuple) -> np.ndarray:
+        pos = self.indexes[tuple(cols)].get(SEP.join(values))
+        if pos is None:
+            raise NotFound(dict(zip(cols, values)))
+        return pos
+
+    def rows(self, cols: tuple, values: tuple) -> list[dict]:
+        return self.records(self.positions(cols, values))
+
+    def records(self, pos: np.ndarray) -> list[dict]:
+        # to_json ya resuelve NaN/<NA> -> null, fechas ISO y categorías
+        return json.loads(self.frame.take(pos).to_json(orient="records", date_format="iso"))
+
+
+def artifact_paths(processed: Path) -> dict[str, Path]:
+    """Artefactos a servir que existen en `processed` (nombre lógico -> parquet)."""
+    paths = {}
+    for name in POLICY_KEYS:
+        path = processed / f"inventory_policy_{name}.parquet"
+        if path.exists():
+            paths[f"policy_{name}"] = path
+    for stem in FORECAST_FILES:
+        if (processed / f"{stem}.parquet").exists():
+            paths["forecast"] = processed / f"{stem}.parquet"
+            break
+    if (processed / f"{SIMULATION_FILE}.parquet").exists():
+        paths["simulation"] = processed / f"{SIMULATION_FILE}.parquet"
+    return paths
+
+def signature(processed: Path) -> dict[str, tuple]:
+    """(archivo, mtime, tamaño) por artefacto: si cambia, hay que recargar."""
+    out = {}
+    for name, path in artifact_paths(processed).items():
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        out[name] = (path.name, st.st_mtime_ns, st.st_size)
+    return out
+
+
+class ArtifactStore:
+    """Todas las tablas indexadas de una versión de los artefactos."""
+
+    def __init__(self, processed: Path, version: int):
+        start = time.perf_counter()
+        self.processed = processed
+        self.version = version
+        self.signature = signature(processed)
+        self.tables: dict[str, Table] = {}
+        for name, path in artifact_paths(processed).items():
+            if name.startswith("policy_"):
+                keys = POLICY_KEYS[name[len("policy_"):]]
+                extra = (("store",),) if keys == ("store", "brand") else ()
+                self.tables[name] = Table(path, keys, extra)
+            elif name == "forecast":
+                self.tables[name] = Table(path, FORECAST_KEYS, (("level", "store"),))
+            else:
+                self.tables[name] = Table(path, SIMULATION_KEYS)
+        if not self.tables:
+            raise FileNotFoundError(f"No hay artefactos para servir en {processed}")
+        self.loaded_at = time.time()
+        self.load_seconds = time.perf_counter() - start
+
+    def table(self, name: str) -> Table:
+        if name not in self.tables:
+            raise NotFound(f"artefacto {name} no disponible")
+        return self.tables[name]
+
+
+# ===================== caché =====================
+
+class LRUCache:
+    """LRU de respuestas (clave -> dict) con contadores; seguro entre hilos."""
+
+    def __init__(self, max_items: int = CACHE_SIZE):
+        self.max_items = max_items
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "desalojados": 0}
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.stats["misses"] += 1
+                return None
+            self._items.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+                self.stats["desalojados"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def resumen(self) -> dict:
+        consultas = self.stats["hits"] + self.stats["misses"]
+        return {**self.stats, "items": len(self._items),
+                "hit_rate": self.stats["hits"] / consultas if consultas else 0.0}
+
+
+# ===================== consultas =====================
+
+def _params(params: dict, allowed) -> dict[str, str]:
+    unknown = set(params) - set(allowed) - {"type"}
+    if unknown:
+        raise QueryError(f"parámetros desconocidos: {sorted(unknown)}")
+    return {k: canonical(params[k]) for k in allowed if params.get(k) not in (None, "")}
+
+def _single(rows: list[dict]) -> dict:
+    return rows[0] if len(rows) == 1 else {"rows": rows}
+
+def _series(rows: list[dict]) -> dict:
+    """Filas de una serie (una por semana) -> metadatos + listas week / forecast_qty."""
+    meta = {k: v for k, v in rows[0].items() if k not in ("week", "forecast_qty")}
+    return {**meta, "week": [r["week"] for r in rows], "forecast_qty": [r["forecast_qty"] for r in rows]}
+
+def policy(store: ArtifactStore, params: dict) -> dict:
+    keys = _params(params, QUERY_KEYS)
+    level = next((name for name, cols in POLICY_KEYS.items() if set(cols) == set(keys)), None)
+    if level is None:
+        raise QueryError(f"no hay política por {sorted(keys)}")
+    cols = POLICY_KEYS[level]
+    table = store.table(f"policy_{level}")
+    return {"level": level, **_single(table.rows(cols, tuple(keys[c] for c in cols)))}
+
+def forecast(store: ArtifactStore, params: dict) -> dict:
+    keys = _params(params, ("store", "brand"))
+    if "brand" not in keys:
+        raise QueryError("falta brand")
+    level = "store_brand" if "store" in keys else "brand"
+    rows = store.table("forecast").rows(FORECAST_KEYS, (canonical(level), keys.get("store", ""), keys["brand"]))
+    return _series(rows)
+
+def sku(store: ArtifactStore, params: dict) -> dict:
+    keys = _params(params, ("store", "brand"))
+    if set(keys) != {"store", "brand"}:
+        raise QueryError("sku requiere store y brand")
+    out = {"store": keys["store"], "brand": keys["brand"]}
+    found = False
+    for name, fn in (("policy", policy), ("forecast", forecast)):
+        try:
+            out[name] = fn(store, keys)
+            found = True
+        except NotFound:
+            out[name] = None
+    try:
+        out["simulation"] = store.table("simulation").rows(SIMULATION_KEYS, (keys["store"], keys["brand"]))
+        found = True
+    except NotFound:
+        out["simulation"] = []
+    if not found:
+        raise NotFound(keys)
+    out["reorder_point"] = out["policy"]["reorder_point"] if out["policy"] else None
+    return out
+
+def store_view(store: ArtifactStore, params: dict) -> dict:
+    keys = _params(params, ("store",))
+    if "store" not in keys:
+        raise QueryError("falta store")
+    out = {"store": keys["store"], "policy": None, "brands": [], "forecast": None}
+    if "policy_by_store" in store.tables:
+        try:
+            out["policy"] = _single(store.tables["policy_by_store"].rows(("store",), (keys["store"],)))
+        except NotFound:
+            pass
+    if "policy_by_store_brand" in store.tables:
+        try:
+            out["brands"] = store.tables["policy_by_store_brand"].rows(("store",), (keys["store"],))
+        except NotFound:
+            pass
+    if "forecast" in store.tables:
+        table = store.tables["forecast"]
+        try:
+            pos = table.positions(("level", "store"), (canonical("store_brand"), keys["store"]))
+        except NotFound:
+            pass
+        else:
+            # total de la tienda = suma de sus tienda×marca por semana
+            weekly = table.frame.take(pos).groupby("week", as_index=False)["forecast_qty"].sum()
+            out["forecast"] = _series(json.loads(weekly.to_json(orient="records", date_format="iso")))
+    if out["policy"] is None and not out["brands"] and out["forecast"] is None:
+        raise NotFound(keys)
+    return out
+
+QUERIES = {"policy": policy, "forecast": forecast, "sku": sku, "store": store_view}
+
+
+class ForecastService:
+    """Índice vigente + caché + recarga en caliente."""
+
+    def __init__(self, processed: Path = PROCESSED_DIR, cache_size: int = CACHE_SIZE,
+                 reload_every: float = RELOAD_EVERY):
+        self.processed = Path(processed)
+        self.cache = LRUCache(cache_size)
+        self.reload_every = reload_every
+        self.reloads = 0
+        self.store = ArtifactStore(self.processed, version=1)
+        self._stop = threading.Event()
+
+    def query(self, kind: str, params: dict) -> dict:
+        if kind not in QUERIES:
+            raise QueryError(f"tipo de consulta desconocido: {kind}")
+        store = self.store                  # una sola versión durante toda la consulta
+        key = (store.version, kind, tuple(sorted((k, str(v)) for k, v in params.items() if k != "type")))
+        hit = self.cache.get(key)
+        if hit is None:
+            try:
+                hit = QUERIES[kind](store, params)
+            except NotFound as e:
+                hit = e                     # también se cachean las claves sin datos
+            self.cache.put(key, hit)
+        if isinstance(hit, NotFound):
+            raise hit
+        return hit
+
+    def batch(self, queries: list[dict]) -> list[dict]:
+        if len(queries) > MAX_BATCH:
+            raise QueryError(f"máximo {MAX_BATCH} consultas por lote")
+        out = []
+        for q in queries:
+            if not isinstance(q, dict):
+                out.append({"error": "cada consulta debe ser un objeto JSON", "query": q})
+                continue
+            try:
+                out.append(self.query(q.get("type", "sku"), q))
+            except (QueryError, NotFound) as e:
+                out.append({"error": _message(e), "query": q})
+        return out
+
+    def sample_keys(self, limit) -> list[dict]:
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise QueryError(f"limit debe ser un entero: {limit!r}") from None
+        if not 0 <= limit <= MAX_KEYS:
+            raise QueryError(f"limit debe estar entre 0 y {MAX_KEYS}")
+        table = self.store.tables.get("policy_by_store_brand") or self.store.tables.get("simulation")
+        if table is None:
+            return []
+        keys = table.frame[["store", "brand"]].drop_duplicates()
+        keys = keys.sample(min(limit, len(keys)), random_state=0) if limit < len(keys) else keys
+        return [{"store": canonical(s), "brand": canonical(b)} for s, b in keys.itertuples(index=False)]
+
+    def health(self) -> dict:
+        store = self.store
+        return {"status": "ok", "version": store.version, "reloads": self.reloads,
+                "processed": str(self.processed),
+                "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(store.loaded_at)),
+                "load_seconds": round(store.load_seconds, 3),
+                "artifacts": {name: {"file": t.path.name, "rows": len(t.frame)} for name, t in store.tables.items()},
+                "cache": self.cache.resumen()}
+
+    # ---------- recarga en caliente ----------
+
+    def reload_if_changed(self) -> bool:
+        current = self.store
+        if signature(self.processed) == current.signature:
+            return False
+        try:
+            fresh = ArtifactStore(self.processed, version=current.version + 1)
+        except Exception as e:           # archivo a medio escribir: se reintenta en la próxima vuelta
+            print(f"⚠️ Recarga pospuesta ({type(e).__name__}: {e})")
+            return False
+        self.store = fresh
+        self.cache.clear()
+        self.reloads += 1
+        print(f"✅ Artefactos recargados (versión {fresh.version}, {fresh.load_seconds:.2f}s)")
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.reload_every):
+            self.reload_if_changed()
+
+    def start_watcher(self) -> threading.Thread:
+        thread = threading.Thread(target=self._watch, name="artifact-watcher", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+
+# ===================== HTTP =====================
+
+def _message(e: Exception) -> str:
+    return str(e.args[0]) if e.args else type(e).__name__
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"       # conexiones persistentes (keep-alive)
+    disable_nagle_algorithm = True      # encabezados y cuerpo van en dos writes: sin Nagle no hay espera de ~40 ms
+    server_version = "inventario-serving"
+    quiet = True
+
+    def _send(self, status: int, body: dict):
+        data = json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self, fn):
+        service: ForecastService = self.server.service
+        try:
+            self._send(200, fn(service))
+        except QueryError as e:
+            self._send(400, {"error": _message(e)})
+        except NotFound as e:
+            self._send(404, {"error": "sin datos", "key": e.args[0] if e.args else None})
+        except Exception as e:
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        route = url.path.rstrip("/") or "/health"
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if route == "/health":
+            self._dispatch(lambda s: s.health())
+        elif route == "/keys":
+            self._dispatch(lambda s: {"keys": s.sample_keys(params.get("limit", 100))})
+        elif route.lstrip("/") in QUERIES:
+            self._dispatch(lambda s: s.query(route.lstrip("/"), params))
+        else:
+            self._send(404, {"error": f"ruta desconocida: {url.path}"})
+
+    def do_POST(self):
+        if urlsplit(self.path).path.rstrip("/") != "/batch":
+            self._send(404, {"error": f"ruta desconocida: {self.path}"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+            queries = body["queries"]
+            if not isinstance(queries, list):
+                raise TypeError
+        except (ValueError, KeyError, TypeError):
+            self._send(400, {"error": 'se espera JSON {"queries": [...]}'})
+            return
+        self._dispatch(lambda s: {"results": s.batch(queries)})
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(service: ForecastService, host: str = "127.0.0.1", port: int = 8000,
+                verbose: bool = False) -> ThreadingHTTPServer:
+    handler = type("ServingHandler", (Handler,), {"quiet": not verbose})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+def main(host: str = "127.0.0.1", port: int = 8000, cache_size: int = CACHE_SIZE,
+         reload_every: float = RELOAD_EVERY, verbose: bool = False):
+    service = ForecastService(PROCESSED_DIR, cache_size, reload_every)
+    tables = ", ".join(f"{n} ({len(t.frame)})" for n, t in service.store.tables.items())
+    print(f"✅ Artefactos indexados en {service.store.load_seconds:.2f}s: {tables}")
+    if reload_every > 0:
+        service.start_watcher()
+    server = make_server(service, host, port, verbose)
+    print(f"📝 Sirviendo en http://{server.server_address[0]}:{server.server_address[1]} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API local de pronósticos y puntos de reorden")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="respuestas en el LRU")
+    parser.add_argument("--reload-every", type=float, default=RELOAD_EVERY,
+                        help="segundos entre revisiones de artefactos (0 = sin recarga)")
+    parser.add_argument("--verbose", action="store_true", help="registra cada request")
+    args = parser.parse_args()
+    main(args.host, args.port, args.cache_size, args.reload_every, args.verbose)
@@ -0,0 +1,150 @@
+# src/serving_loadtest.py
+"""
+Prueba de carga de la API de src/serving.py: latencia p50/p90/p99 por endpoint.
+
+Toma una muestra de claves tienda×marca del propio servidor (GET /keys) y la
+reparte entre hilos; cada hilo usa una conexión persistente y mide cada
+request de punta a punta (envío + respuesta completa). La mezcla por defecto
+es la de un cliente típico: sobre todo consultas por SKU, algo de política,
+pronóstico y tienda, y opcionalmente lotes POST /batch.
+
+El hit rate del caché sale de /health antes y después de la corrida.
+
+Uso (con el servidor levantado):
+    python -m src.serving_loadtest [--url http://127.0.0.1:8000] [--requests 20000]
+                                   [--concurrency 8] [--keys 1000] [--batch 50] [--json out.json]
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+MIX = {"sku": 0.6, "policy": 0.2, "forecast": 0.1, "store": 0.1}
+
+
+def _get(conn: http.client.HTTPConnection, path: str) -> tuple[int, bytes]:
+    conn.request("GET", path)
+    resp = conn.getresponse()
+    return resp.status, resp.read()
+
+def _post(conn: http.client.HTTPConnection, path: str, body: dict) -> tuple[int, bytes]:
+    data = json.dumps(body).encode()
+    conn.request("POST", path, body=data, headers={"Content-Type": "application/json"})
+    resp = conn.getresponse()
+    return resp.status, resp.read()
+
+def _path(kind: str, key: dict) -> str:
+    params = {"store": key["store"]} if kind == "store" else key
+    return f"/{kind}?{urlencode(params)}"
+
+def _plan(keys: list[dict], n: int, batch: int, seed: int) -> list[tuple[str, object]]:
+    """Lista de (endpoint, request): GET por tipo según MIX y, si batch > 0, ~10% de lotes."""
+    rng = random.Random(seed)
+    kinds, weights = list(MIX), list(MIX.values())
+    plan = []
+    for _ in range(n):
+        if batch and rng.random() < 0.1:
+            queries = [{"type": "sku", **rng.choice(keys)} for _ in range(batch)]
+            plan.append(("batch", {"queries": queries}))
+        else:
+            kind = rng.choices(kinds, weights)[0]
+            plan.append((kind, _path(kind, rng.choice(keys))))
+    return plan
+
+def _worker(host: str, port: int, plan, out: dict, errors: dict, lock: threading.Lock):
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    local, local_err = defaultdict(list), defaultdict(int)
+    for kind, request in plan:
+        start = time.perf_counter()
+        try:
+            if kind == "batch":
+                status, _ = _post(conn, "/batch", request)
+            else:
+                status, _ = _get(conn, request)
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            status = None
+        local[kind].append(time.perf_counter() - start)
+        if status not in (200, 404):       # 404 = clave sin datos en ese artefacto, no es falla
+            local_err[kind] += 1
+    conn.close()
+    with lock:
+        for kind, lat in local.items():
+            out[kind].extend(lat)
+        for kind, n in local_err.items():
+            errors[kind] += n
+
+def _summary(lat: list[float]) -> dict:
+    ms = np.asarray(lat) * 1000
+    return {"n": len(ms), "p50_ms": float(np.percentile(ms, 50)), "p90_ms": float(np.percentile(ms, 90)),
+            "p99_ms": float(np.percentile(ms, 99)), "max_ms": float(ms.max()), "mean_ms": float(ms.mean())}
+
+def run(url: str, requests: int, concurrency: int, n_keys: int, batch: int = 0, seed: int = 0) -> dict:
+    parts = urlsplit(url)
+    host, port = parts.hostname or "127.0.0.1", parts.port or 80
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    keys = json.loads(_get(conn, f"/keys?limit={n_keys}")[1])["keys"]
+    cache_before = json.loads(_get(conn, "/health")[1])["cache"]
+    conn.close()
+    if not keys:
+        raise SystemExit("El servidor no tiene claves tienda×marca para probar")
+
+    plan = _plan(keys, requests, batch, seed)
+    latencies, errors, lock = defaultdict(list), defaultdict(int), threading.Lock()
+    threads = [threading.Thread(target=_worker, args=(host, port, plan[i::concurrency], latencies, errors, lock))
+               for i in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    secs = time.perf_counter() - start
+
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    cache_after = json.loads(_get(conn, "/health")[1])["cache"]
+    conn.close()
+    hits = cache_after["hits"] - cache_before["hits"]
+    lookups = hits + cache_after["misses"] - cache_before["misses"]
+    all_lat = [x for lat in latencies.values() for x in lat]
+    return {
+        "url": url, "requests": len(all_lat), "concurrency": concurrency, "keys": len(keys),
+        "seconds": secs, "requests_per_s": len(all_lat) / max(secs, 1e-9),
+        "errors": sum(errors.values()), "cache_hit_rate": hits / lookups if lookups else 0.0,
+        "overall": _summary(all_lat),
+        "endpoints": {kind: {**_summary(lat), "errors": errors.get(kind, 0)}
+                      for kind, lat in sorted(latencies.items())},
+    }
+
+def report(result: dict):
+    print(f"⏱️ {result['requests']} requests en {result['seconds']:.2f}s "
+          f"({result['requests_per_s']:.0f} req/s, concurrencia {result['concurrency']}, "
+          f"{result['keys']} claves) | errores: {result['errors']} | "
+          f"hit rate caché: {result['cache_hit_rate']:.1%}")
+    print(f"{'endpoint':<10}{'n':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for kind, s in [*result["endpoints"].items(), ("total", result["overall"])]:
+        print(f"{kind:<10}{s['n']:>8}{s['p50_ms']:>10.2f}{s['p90_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['max_ms']:>10.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API de pronósticos (p50/p99)")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=8, help="hilos cliente")
+    parser.add_argument("--keys", type=int, default=1_000, help="claves tienda×marca distintas a consultar")
+    parser.add_argument("--batch", type=int, default=0,
+                        help="consultas por POST /batch (0 = sin lotes; si > 0, ~10%% de los requests)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="guarda el resultado en este archivo")
+    args = parser.parse_args()
+    result = run(args.url, args.requests, args.concurrency, args.keys, args.batch, args.seed)
+    report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"✅ Resultado en {args.json}")
@@ -0,0 +1,263 @@
+# src/synthetic_data.py
+"""
+Generador de datos sintéticos con los seis esquemas raw (ver FILES/SCHEMAS).
+
+Reproduce lo que se ve en data/sample: 80 tiendas con su ciudad, un catálogo
+de ~12.000 marcas (descripción, tamaño tipo '750mL' / '1.75L' / '187mL 4 Pk',
+clasificación, proveedor y precio), ~130 proveedores, ventas con popularidad
+tipo Zipf por marca, tamaño distinto por tienda y estacionalidad semanal y
+anual, y compras con lead time (PODate -> ReceivingDate) de 3 a 14 días.
+
+`scale` multiplica las filas de hechos (ventas, compras, facturas); el
+catálogo y las tiendas quedan fijos, como en la operación real. Escala 1 =
+BASE_ROWS. Las ventas se escriben por lotes, así 100× no necesita tener todo
+en memoria.
+
+Uso:
+    python -m src.synthetic_data --out /tmp/synth/raw --scale 10 [--seed 0]
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+
+from src.config import FILES
+
+BASE_ROWS = {"sales": 200_000, "purchases": 25_000}
+N_STORES = 80
+N_BRANDS = 12_000
+N_VENDORS = 130
+YEAR = 2016
+BATCH_ROWS = 1_000_000
+
+# Tamaños y su frecuencia aproximada en las ventas de la muestra
+SIZES = {
+    "750mL": 0.56, "1.75L": 0.17, "50mL": 0.09, "1.5L": 0.07, "375mL": 0.05, "Liter": 0.02,
+    "5L": 0.01, "3L": 0.007, "187mL 4 Pk": 0.004, "500mL": 0.003, "4L": 0.002,
+    "100mL 4 Pk": 0.002, "200mL": 0.002,
+}
+_SIZE_ML = {"750mL": 750, "1.75L": 1750, "50mL": 50, "1.5L": 1500, "375mL": 375, "Liter": 1000,
+            "5L": 5000, "3L": 3000, "187mL 4 Pk": 748, "500mL": 500, "4L": 4000,
+            "100mL 4 Pk": 400, "200mL": 200}
+
+_CITY_PARTS = (["HARDERS", "BALLY", "CLARC", "GUTH", "CESTER", "MOUNT", "CUL", "EANVER",
+                "LARN", "TARMS", "KELIN", "PITMER", "AB", "DON", "WANT", "FURNES"],
+               ["FIELD", "MENA", "TON", "RAM", "FIELD", "MEND", "CHETH", "HAM", "WORTH", "BY"])
+_WORDS = (["Jim", "Ketel", "Capt", "Tito's", "Smirnoff", "Absolut", "Jack", "Jameson", "Bacardi",
+           "Crown", "Grey", "Maker's", "Patron", "Kahlua", "Chopin", "Herradura", "Rebel", "El"],
+          ["Beam", "One", "Morgan", "Handmade", "Royal", "Goose", "Daniels", "Superior", "Silver",
+           "Black", "Reserve", "Mark", "Yell", "Charro", "Peach", "Gold", "Apple", "Cherry"],
+          ["Vodka", "Whiskey", "Rum", "Tequila", "Bourbon", "Gin", "Brandy", "Liqueur", "Sake",
+           "Scotch", "Wine", "Mezcal"])
+_VENDOR_WORDS = (["DIAGEO", "MARTIGNETTI", "JIM BEAM", "PERNOD", "BACARDI", "CONSTELLATION", "SAZERAC",
+                  "BROWN-FORMAN", "E & J GALLO", "LUXCO", "ALTAMAR", "SHAW ROSS", "MHW", "PROXIMO"],
+                 ["NORTH AMERICA", "COMPANIES", "BRANDS COMPANY", "USA", "USA INC", "CORP", "CO INC",
+                  "WINERY", "SPIRITS", "LTD", "IMPORTS", "INT L IMP LTD"])
+
+
+def _pick(rng, words, n):
+    return np.array([" ".join(w) for w in zip(*(rng.choice(ws, n) for ws in words))], dtype=object)
+
+def build_catalog(seed: int = 0) -> dict[str, pd.DataFrame]:
+    """Tiendas, proveedores y marcas (fijos para cualquier escala)."""
+    rng = np.random.default_rng(seed)
+    stores = pd.DataFrame({
+        "Store": np.arange(1, N_STORES + 1),
+        "City": _pick(rng, _CITY_PARTS, N_STORES),
+        # tamaño relativo de la tienda (lognormal: pocas tiendas grandes)
+        "weight": rng.lognormal(0.0, 0.6, N_STORES),
+    })
+    stores["City"] = stores["City"].str.replace(" ", "", regex=False)
+
+    vendor_ids = np.sort(rng.choice(np.arange(100, 20_000), N_VENDORS, replace=False))
+    vendors = pd.DataFrame({"VendorNumber": vendor_ids,
+                            "VendorName": _pick(rng, _VENDOR_WORDS, N_VENDORS)})
+
+    size = rng.choice(list(SIZES), N_BRANDS, p=np.array(list(SIZES.values())) / sum(SIZES.values()))
+    ml = pd.Series(size).map(_SIZE_ML).to_numpy()
+    price = np.round(np.exp(rng.normal(2.6, 0.6, N_BRANDS)) * (ml / 750) ** 0.7, 0) - 0.01
+    price = np.maximum(price, 0.49)
+    brands = pd.DataFrame({
+        "Brand": np.sort(rng.choice(np.arange(58, 90_000), N_BRANDS, replace=False)),
+        "Description": _pick(rng, _WORDS, N_BRANDS),
+        "Size": size,
+        "Volume": ml,
+        "Classification": rng.choice([1, 2], N_BRANDS, p=[0.58, 0.42]),
+        "VendorNumber": vendor_ids[rng.zipf(1.4, N_BRANDS) % N_VENDORS],
+        "Price": price,
+        "PurchasePrice": np.round(price * rng.uniform(0.65, 0.8, N_BRANDS), 2),
+        # popularidad tipo Zipf: unas pocas marcas concentran las ventas
+        "weight": 1.0 / rng.permutation(np.arange(1, N_BRANDS + 1)) ** 0.9,
+    }).merge(vendors, on="VendorNumber", how="left")
+    return {"stores": stores, "vendors": vendors, "brands": brands}
+
+def _day_weights(days: pd.DatetimeIndex) -> np.ndarray:
+    weekly = np.array([0.8, 0.8, 0.85, 0.95, 1.2, 1.35, 1.05])[days.dayofweek.to_numpy()]   # lun..dom
+    annual = 1.0 + 0.25 * np.cos(2 * np.pi * (days.dayofyear.to_numpy() - 355) / 366)      # pico en diciembre
+    w = weekly * annual
+    return w / w.sum()
+
+def _write(df: pd.DataFrame, path: Path, append: bool = False):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if not append:
+        pv.write_csv(table, path, write_options=pv.WriteOptions(quoting_style="needed"))
+        return
+    with open(path, "ab") as f:
+        pv.write_csv(table, f, write_options=pv.WriteOptions(include_header=False, quoting_style="needed"))
+
+def _sales_batch(rng, catalog, days, day_w, n: int) -> pd.DataFrame:
+    stores, brands = catalog["stores"], catalog["brands"]
+    s = rng.choice(len(stores), n, p=stores["weight"] / stores["weight"].sum())
+    b = rng.choice(len(brands), n, p=brands["weight"] / brands["weight"].sum())
+    d = rng.choice(len(days), n, p=day_w)
+    qty = 1 + rng.poisson(0.6, n) + (brands["Volume"].to_numpy()[b] <= 200) * rng.poisson(2.0, n)
+    price = brands["Price"].to_numpy()[b]
+    ml = brands["Volume"].to_numpy()[b]
+    store_id, city = stores["Store"].to_numpy()[s], stores["City"].to_numpy()[s]
+    brand_id = brands["Brand"].to_numpy()[b]
+    date_str = np.array([f"{x.month}/{x.day}/{x.year}" for x in days], dtype=object)[d]
+    return pd.DataFrame({
+        "InventoryId": pd.Series(store_id).astype(str) + "_" + city + "_" + pd.Series(brand_id).astype(str),
+        "Store": store_id,
+        "Brand": brand_id,
+        "Description": brands["Description"].to_numpy()[b],
+        "Size": brands["Size"].to_numpy()[b],
+        "SalesQuantity": qty,
+        "SalesDollars": np.round(qty * price, 2),
+        "SalesPrice": price,
+        "SalesDate": date_str,
+        "Volume": ml,
+        "Classification": brands["Classification"].to_numpy()[b],
+        "ExciseTax": np.round(qty * ml / 1000 * 1.05, 2),
+        "VendorNo": brands["VendorNumber"].to_numpy()[b],
+        # en el raw el nombre del proveedor viene con relleno a ancho fijo
+        "VendorName": pd.Series(brands["VendorName"].to_numpy()[b]).str.ljust(28),
+    })
+
+def _purchases(rng, catalog, days, n: int) -> pd.DataFrame:
+    stores, brands = catalog["stores"], catalog["brands"]
+    s = rng.choice(len(stores), n, p=stores["weight"] / stores["weight"].sum())
+    b = rng.choice(len(brands), n, p=brands["weight"] / brands["weight"].sum())
+    po = days[0] - pd.Timedelta(days=14) + pd.to_timedelta(rng.integers(0, len(days), n), "D")
+    received = po + pd.to_timedelta(rng.integers(3, 15, n), "D")
+    invoiced = received + pd.to_timedelta(rng.integers(0, 11, n), "D")
+    paid = invoiced + pd.to_timedelta(rng.integers(30, 46, n), "D")
+    qty = rng.choice([6, 12, 24, 48, 120], n, p=[0.3, 0.35, 0.2, 0.1, 0.05])
+    cost = brands["PurchasePrice"].to_numpy()[b]
+    vendor = brands["VendorNumber"].to_numpy()[b]
+    # un PO por proveedor y día de pedido
+    po_key = pd.Series(vendor).astype(str) + "|" + pd.Series(po.strftime("%Y-%m-%d"))
+    po_number = 8000 + pd.factorize(po_key)[0]
+    fmt = "%Y-%m-%d"
+    store_id, brand_id = stores["Store"].to_numpy()[s], brands["Brand"].to_numpy()[b]
+    return pd.DataFrame({
+        "InventoryId": (pd.Series(store_id).astype(str) + "_" + stores["City"].to_numpy()[s]
+                        + "_" + pd.Series(brand_id).astype(str)),
+        "Store": store_id,
+        "Brand": brand_id,
+        "Description": brands["Description"].to_numpy()[b],
+        "Size": brands["Size"].to_numpy()[b],
+        "VendorNumber": vendor,
+        "VendorName": brands["VendorName"].to_numpy()[b],
+        "PONumber": po_number,
+        "PODate": po.strftime(fmt),
+        "ReceivingDate": received.strftime(fmt),
+        "InvoiceDate": invoiced.strftime(fmt),
+        "PayDate": paid.strftime(fmt),
+        "PurchasePrice": cost,
+        "Quantity": qty,
+        "Dollars": np.round(qty * cost, 2),
+        "Classification": brands["Classification"].to_numpy()[b],
+    })
+
+def _invoices(rng, purchases: pd.DataFrame) -> pd.DataFrame:
+    """Una factura por PO, agregando las líneas de compra."""
+    inv = (purchases.groupby("PONumber", sort=True)
+           .agg(VendorNumber=("VendorNumber", "first"), VendorName=("VendorName", "first"),
+                InvoiceDate=("InvoiceDate", "max"), PODate=("PODate", "first"),
+                PayDate=("PayDate", "max"), Quantity=("Quantity", "sum"), Dollars=("Dollars", "sum"))
+           .reset_index())
+    inv["Dollars"] = inv["Dollars"].round(2)
+    inv["Freight"] = np.round(inv["Dollars"] * rng.uniform(0.003, 0.008, len(inv)), 2)
+    inv["Approval"] = np.where(rng.random(len(inv)) < 0.9, None, "Frank Delahunt")
+    return inv[["VendorNumber", "VendorName", "InvoiceDate", "PONumber", "PODate", "PayDate",
+                "Quantity", "Dollars", "Freight", "Approval"]]
+
+def _inventory(rng, catalog, date_col: str, date: str, share: float) -> pd.DataFrame:
+    """Stock por tienda × marca para una fracción `share` de los pares."""
+    stores, brands = catalog["stores"], catalog["brands"]
+    n = int(N_STORES * N_BRANDS * share)
+    pairs = np.unique(rng.choice(N_STORES * N_BRANDS, n, replace=False))
+    s, b = pairs // N_BRANDS, pairs % N_BRANDS
+    store_id, city = stores["Store"].to_numpy()[s], stores["City"].to_numpy()[s]
+    brand_id = brands["Brand"].to_numpy()[b]
+    return pd.DataFrame({
+        "InventoryId": pd.Series(store_id).astype(str) + "_" + city + "_" + pd.Series(brand_id).astype(str),
+        "Store": store_id,
+        "City": city,
+        "Brand": brand_id,
+        "Description": brands["Description"].to_numpy()[b],
+        "Size": brands["Size"].to_numpy()[b],
+        "onHand": rng.negative_binomial(2, 0.12, len(pairs)),
+        "Price": brands["Price"].to_numpy()[b],
+        date_col: date,
+    })
+
+def _prices(rng, catalog) -> pd.DataFrame:
+    brands = catalog["brands"]
+    volume = brands["Volume"].astype(str).to_numpy(dtype=object)
+    volume[rng.random(len(volume)) < 0.001] = "Unknown"      # como en el archivo real
+    return pd.DataFrame({
+        "Brand": brands["Brand"], "Description": brands["Description"], "Price": brands["Price"],
+        "Size": brands["Size"], "Volume": volume, "Classification": brands["Classification"],
+        "PurchasePrice": brands["PurchasePrice"], "VendorNumber": brands["VendorNumber"],
+        "VendorName": brands["VendorName"],
+    })
+
+def generate_raw(out_dir: Path, scale: float = 1.0, seed: int = 0) -> dict[str, int]:
+    """Escribe los seis CSV raw en `out_dir`. Devuelve filas escritas por fuente."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    catalog = build_catalog(seed)
+    days = pd.date_range(f"{YEAR}-01-01", f"{YEAR}-12-31", freq="D")
+    rows = {}
+
+    n_sales = int(BASE_ROWS["sales"] * scale)
+    day_w = _day_weights(days)
+    for start in range(0, n_sales, BATCH_ROWS):
+        n = min(BATCH_ROWS, n_sales - start)
+        _write(_sales_batch(rng, catalog, days, day_w, n), out_dir / FILES["sales"], append=start > 0)
+    rows["sales"] = n_sales
+
+    purchases = _purchases(rng, catalog, days, int(BASE_ROWS["purchases"] * scale))
+    _write(purchases, out_dir / FILES["purchases"])
+    rows["purchases"] = len(purchases)
+    invoices = _invoices(rng, purchases)
+    _write(invoices, out_dir / FILES["invoices"])
+    rows["invoices"] = len(invoices)
+    del purchases, invoices
+
+    beg = _inventory(rng, catalog, "startDate", f"{YEAR}-01-01", 0.20)
+    end = _inventory(rng, catalog, "endDate", f"{YEAR}-12-31", 0.21)
+    _write(beg, out_dir / FILES["inv_beg"])
+    _write(end, out_dir / FILES["inv_end"])
+    rows["inv_beg"], rows["inv_end"] = len(beg), len(end)
+
+    prices = _prices(rng, catalog)
+    _write(prices, out_dir / FILES["prices"])
+    rows["prices"] = len(prices)
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera los CSV raw sintéticos a la escala pedida")
+    parser.add_argument("--out", type=Path, required=True, help="carpeta destino de los CSV")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help=f"multiplicador de filas (1 = {BASE_ROWS['sales']:,} ventas)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for key, n in generate_raw(args.out, args.scale, args.seed).items():
+        print(f"✅ {FILES[key]}: {n:,} filas")
@@ -1,11 +1,21 @@
 # src/transform_template.py
+import os
 from pathlib import Path
-from shutil import copyfile
 import re
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+from src.config import PARQUET_OPTIONS
+from src.dedupe import FingerprintSet, dedupe
+from src.dimensions import add_key_ids
+from src.instrument import DEFAULT_LOG, instrumented, stage
+from src.profiling import TableProfile
 
 # ===================== utilidades comunes =====================
 
+@instrumented("normalize_columns")
 def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
     df.columns = (
@@ -43,16 +53,102 @@ def size_to_ml(val):
         return float(m.group(1)) * 29.57
     return None
 
+# ===================== motor de normalización (por valores únicos) =====================
+# brand/description/size/vendorname tienen pocos miles de valores distintos en
+# millones de filas: se normaliza cada valor único una sola vez y se reparte por
+# código. El memo se comparte entre tablas y se persiste entre corridas.
+
+def _size_uniques_to_ml(u: pd.Series) -> pd.Series:
+    """Versión vectorizada de size_to_ml (L / mL / oz) sobre un Series de texto."""
+    v = u.str.strip().str.lower().str.replace(" ", "", regex=False)
+    m = v.str.extract(r"^(\d+(?:\.\d+)?)(ml|l|oz)$")
+    factor = m[1].map({"l": 1000.0, "ml": 1.0, "oz": 29.57})
+    return m[0].astype(float) * factor
+
+_NORMALIZERS = {
+    "text": normalize_text,
+    "brand": normalize_brand,
+    "classification": normalize_classification,
+    "size_ml": _size_uniques_to_ml,
+}
+
+_NORM_MEMO: dict[str, dict] = {kind: {} for kind in _NORMALIZERS}
+
+def _norm_cache_path(cache_dir: Path, kind: str) -> Path:
+    return cache_dir / f"normalize_{kind}.parquet"
+
+def load_norm_cache(cache_dir: Path):
+    """Carga el memo persistido (raw -> normalizado) de corridas anteriores."""
+    for kind in _NORMALIZERS:
+        path = _norm_cache_path(cache_dir, kind)
+        if path.exists():
+            memo = pd.read_parquet(path)
+            _NORM_MEMO[kind].update(zip(memo["raw"], memo["value"]))
+
+def save_norm_cache(cache_dir: Path):
+    """
+    Persiste el memo. Se mezcla con lo que ya esté en disco para que varios
+    procesos (pipeline en paralelo) puedan guardar sin pisarse.
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    for kind, memo in _NORM_MEMO.items():
+        if not memo:
+            continue
+        path = _norm_cache_path(cache_dir, kind)
+        if path.exists():
+            on_disk = pd.read_parquet(path)
+            memo = {**dict(zip(on_disk["raw"], on_disk["value"])), **memo}
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        pd.DataFrame({"raw": list(memo.keys()), "value": list(memo.values())}).to_parquet(tmp, index=False)
+        tmp.replace(path)
+
+@instrumented(lambda s, kind: f"normalize.{s.name}")
+def normalize_column(s: pd.Series, kind: str) -> pd.Series:
+    """
+    Normaliza `s` con el normalizador `kind` evaluando solo sus valores únicos.
+    Devuelve category para los textos y float para 'size_ml'. Mismo resultado
+    que aplicar normalize_text/normalize_brand/size_to_ml fila a fila.
+    """
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes, uniques = s.cat.codes.to_numpy(), s.cat.categories
+    else:
+        codes, uniques = pd.factorize(s)
+    # los nulos se tratan como un valor más (normalize_text los deja como "nan")
+    raw = pd.Series(uniques.astype(str) if len(uniques) else [], dtype=object)
+    if (codes == -1).any():
+        codes = np.where(codes == -1, len(raw), codes)
+        raw = pd.concat([raw, pd.Series(["nan"], dtype=object)], ignore_index=True)
+
+    memo = _NORM_MEMO[kind]
+    values = raw.map(memo).astype(object)
+    missing = ~raw.isin(memo.keys())
+    if missing.any():
+        fresh = _NORMALIZERS[kind](raw[missing])
+        if kind == "size_ml":
+            fresh = fresh.where(raw[missing] != "nan")   # size_to_ml(NaN) -> None
+        memo.update(zip(raw[missing], fresh))
+        values[missing] = fresh
+
+    if kind == "size_ml":
+        return pd.Series(values.to_numpy(dtype=float)[codes], index=s.index, name=s.name)
+    cat_codes, cats = pd.factorize(values)
+    return pd.Series(pd.Categorical.from_codes(cat_codes[codes], cats),
+                     index=s.index, name=s.name)
+
+@instrumented(lambda s: f"coerce.{s.name}")
 def safe_to_numeric_series(s: pd.Series) -> pd.Series:
     s = normalize_text(s)
     s = s.str.replace(r"[,$]", "", regex=True)
     return pd.to_numeric(s, errors="coerce")
 
+@instrumented("coerce")
 def coerce_numeric_by_name(df: pd.DataFrame) -> pd.DataFrame:
     """Convierte a numérico columnas que 'parecen' numéricas por nombre."""
     num_hints = ("qty", "quantity", "units", "price", "cost", "amount",
                  "total", "volume", "onhand", "on_hand", "cases", "unitprice")
     for c in df.columns:
+        if pd.api.types.is_numeric_dtype(df[c]):
+            continue   # ya viene tipada (p. ej. desde parquet)
         if any(h in c for h in num_hints):
             try:
                 df[c] = safe_to_numeric_series(df[c])
@@ -60,30 +156,107 @@ def coerce_numeric_by_name(df: pd.DataFrame) -> pd.DataFrame:
                 pass
     return df
 
+@instrumented("parse_dates")
 def parse_possible_dates(df: pd.DataFrame) -> pd.DataFrame:
     for c in df.columns:
-        if "date" in c:
-            df[c] = pd.to_datetime(df[c], errors="coerce")
+        if "date" in c and not pd.api.types.is_datetime64_any_dtype(df[c]):
+            with stage(f"parse_dates.{c}", rows_in=len(df)):
+                df[c] = pd.to_datetime(df[c], errors="coerce")
     return df
 
-def write_outputs(df: pd.DataFrame, out_base: Path, base_name: str):
+def drop_duplicates(df: pd.DataFrame, seen: FingerprintSet | None = None) -> tuple[pd.DataFrame, dict]:
+    """
+    Quita filas repetidas por huella de fila (src/dedupe.py); con `seen`
+    también las que ya salieron en lotes anteriores. Devuelve (df, conteos).
+    """
+    with stage("dedupe", rows_in=len(df)) as st:
+        df, counts = dedupe(df, seen)
+        st.rows_out = len(df)
+        st.extra.update(duplicates_batch=counts["duplicates_batch"], duplicates_seen=counts["duplicates_seen"])
+    return df, counts
+
+@instrumented("intern")
+def intern_keys(df: pd.DataFrame, processed: Path) -> pd.DataFrame:
+    """IDs enteros de inventoryid/tienda/marca/proveedor (dimensiones en processed/dims)."""
+    return add_key_ids(df, processed)
+
+@instrumented("read")
+def read_interim(src: Path, columns: list[str] | None = None) -> pd.DataFrame:
+    """Lee una tabla de interim (parquet) leyendo solo `columns` si se indican."""
+    return pd.read_parquet(src, columns=columns)
+
+def iter_interim(src: Path, columns: list[str] | None = None, chunksize: int = 500_000):
+    """Lee una tabla de interim en lotes de hasta `chunksize` filas."""
+    pf = pq.ParquetFile(src)
+    metadata = pf.schema_arrow.metadata      # metadata pandas: mismos dtypes que pd.read_parquet
+    for batch in pf.iter_batches(batch_size=chunksize, columns=columns):
+        with stage("read") as st:
+            df = batch.replace_schema_metadata(metadata).to_pandas()
+            st.rows_out = len(df)
+        yield df
+
+def write_outputs(df: pd.DataFrame, out_base: Path, base_name: str, export_csv: bool = False):
+    """
+    Escribe la tabla limpia en parquet (+ diccionario). El CSV es opcional
+    (export_csv) para quien consuma desde Power BI.
+    """
+    out_parquet = out_base / f"{base_name}.parquet"
+    outputs = [out_parquet, out_base / f"{base_name}_dictionary.csv"]
+    with stage("write", rows_in=len(df)) as st:
+        df.to_parquet(out_parquet, index=False, **PARQUET_OPTIONS)
+        if export_csv:
+            outputs.append(out_base / f"{base_name}.csv")
+            df.to_csv(outputs[-1], index=False)
+        profile_table(df).to_frame().to_csv(outputs[1], index=False)
+        st.rows_out, st.bytes_out = len(df), sum(p.stat().st_size for p in outputs)
+    return out_parquet
+
+@instrumented("profile")
+def profile_table(df: pd.DataFrame, profile: TableProfile | None = None) -> TableProfile:
+    """Suma un lote al perfil de columnas (src/profiling.py) del diccionario."""
+    return (profile or TableProfile()).update(df)
+
+def _stream_field(field: pa.Field) -> pa.Field:
+    """Tipo fijo para todos los lotes: nulos -> texto, categorías con índice int32."""
+    if pa.types.is_null(field.type):
+        return field.with_type(pa.string())
+    if pa.types.is_dictionary(field.type):
+        return field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+    return field
+
+def write_outputs_chunked(batches, out_base: Path, base_name: str, export_csv: bool = False):
+    """
+    Igual que write_outputs pero lote a lote: parquet con un row group por
+    lote (esquema fijo del primer lote) y diccionario con el perfil acumulado.
+    Devuelve (ruta parquet, filas escritas).
+    """
+    out_parquet = out_base / f"{base_name}.parquet"
     out_csv = out_base / f"{base_name}.csv"
-    df.to_csv(out_csv, index=False)
+    writer, profile, total = None, TableProfile(), 0
     try:
-        df.to_parquet(out_base / f"{base_name}.parquet", index=False)
-    except Exception:
-        pass
-    dd = pd.DataFrame({
-        "column": df.columns,
-        "dtype": [str(t) for t in df.dtypes],
-        "nulls": df.isna().sum().values
-    })
-    dd.to_csv(out_base / f"{base_name}_dictionary.csv", index=False)
-    return out_csv
+        for df in batches:
+            with stage("write", rows_in=len(df)):
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    schema = pa.schema([_stream_field(f) for f in table.schema], table.schema.metadata)
+                    writer = pq.ParquetWriter(out_parquet, schema, **PARQUET_OPTIONS)
+                writer.write_table(table.select(writer.schema.names).cast(writer.schema), row_group_size=len(df))
+                if export_csv:
+                    df.to_csv(out_csv, mode="w" if total == 0 else "a", header=(total == 0), index=False)
+            profile_table(df, profile)
+            total += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:                      # tabla vacía
+        return write_outputs(pd.DataFrame(), out_base, base_name, export_csv), 0
+    profile.to_frame().to_csv(out_base / f"{base_name}_dictionary.csv", index=False)
+    return out_parquet, total
 
 def ensure_interim_file(interim: Path, raw: Path, raw_name: str, interim_name: str) -> Path | None:
     """
-    Devuelve la ruta en interim. Si no existe, intenta copiar desde raw con el nombre estandarizado.
+    Devuelve la ruta en interim. Si no existe, la genera desde raw (CSV -> parquet)
+    con el nombre estandarizado.
     """
     dst = interim / interim_name
     if dst.exists():
@@ -91,170 +264,168 @@ def ensure_interim_file(interim: Path, raw: Path, raw_name: str, interim_name: s
     src = raw / raw_name
     if src.exists():
         interim.mkdir(parents=True, exist_ok=True)
-        copyfile(src, dst)
-        print(f"ℹ️ Copié {src} → {dst}")
+        pq.write_table(pv.read_csv(src), dst, **PARQUET_OPTIONS)
+        print(f"ℹ️ Convertí {src} → {dst}")
         return dst
     print(f"⚠️ No encontré ni {dst} ni {src}")
     return None
 
 # ===================== transforms =====================
+# Todas las tablas siguen los mismos pasos (columnas, textos, numéricos,
+# fechas, duplicados); cambia qué columnas de texto se normalizan y cómo.
 
-def transform_sales(interim: Path, processed: Path):
-    src = interim / "sales.csv"
-    if not src.exists():
-        print(f"⚠️ No encontré {src} (salto ventas)")
-        return
-    df = pd.read_csv(src)
-    before = len(df)
-
+def clean_frame(df: pd.DataFrame, text_kinds: dict[str, str], size_ml: bool = False) -> pd.DataFrame:
+    """Pasos de limpieza de un lote (o de la tabla completa), sin deduplicar."""
     df = normalize_columns(df)
-    if "brand" in df.columns: df["brand"] = normalize_brand(df["brand"])
-    if "classification" in df.columns: df["classification"] = normalize_classification(df["classification"])
-    if "description" in df.columns: df["description"] = normalize_text(df["description"])
-    if "size" in df.columns: df["size_ml"] = df["size"].apply(size_to_ml)
-
+    for col, kind in text_kinds.items():
+        if col in df.columns:
+            df[col] = normalize_column(df[col], kind)
+    if size_ml and "size" in df.columns:
+        df["size_ml"] = normalize_column(df["size"], "size_ml")
     df = coerce_numeric_by_name(df)
-    df = parse_possible_dates(df)
-    df = df.drop_duplicates()
-    dropped = before - len(df)
+    return parse_possible_dates(df)
 
-    out_csv = write_outputs(df, processed, "sales_clean")
-    print(f"✅ sales: {before} -> {len(df)} (quitadas {dropped}) | {out_csv}")
+def transform_table(src: Path, processed: Path, base_name: str, text_kinds: dict[str, str],
+                    size_ml: bool = False, columns: list[str] | None = None,
+                    export_csv: bool = False, chunksize: int | None = None,
+                    backend: str = "pandas") -> dict:
+    """
+    interim -> processed para una tabla. chunksize=None procesa la tabla
+    completa; chunksize=N la procesa por lotes (memoria acotada por el lote) y
+    los duplicados entre lotes se detectan con un FingerprintSet. Las claves
+    se internan como `<dim>_id` (src/dimensions.py).
+    backend='duckdb' hace la limpieza y el dedupe en una sola consulta
+    (src/lazy_backend.py); chunksize es entonces el tamaño de los lotes de salida.
+    Devuelve los conteos de filas y duplicados.
+    """
+    if backend == "duckdb":
+        from src.lazy_backend import transform_table_duckdb
+        out_path, counts = transform_table_duckdb(src, processed, base_name, text_kinds, size_ml,
+                                                  columns, export_csv, chunksize)
+    elif backend != "pandas":
+        raise ValueError(f"backend desconocido: {backend!r} (pandas o duckdb)")
+    elif not chunksize:
+        df = clean_frame(read_interim(src, columns), text_kinds, size_ml)
+        df, counts = drop_duplicates(df)
+        df = intern_keys(df, processed)
+        out_path = write_outputs(df, processed, base_name, export_csv)
+    else:
+        seen = FingerprintSet()
+        counts = dict.fromkeys(("rows_in", "duplicates_batch", "duplicates_seen", "rows_out"), 0)
+
+        def batches():
+            for df in iter_interim(src, columns, chunksize):
+                df, batch_counts = drop_duplicates(clean_frame(df, text_kinds, size_ml), seen)
+                for k, v in batch_counts.items():
+                    counts[k] += v
+                yield intern_keys(df, processed)
+
+        out_path, _ = write_outputs_chunked(batches(), processed, base_name, export_csv)
+    label = base_name.removesuffix("_clean")
+    dropped = counts["rows_in"] - counts["rows_out"]
+    detail = f", {counts['duplicates_seen']} entre lotes" if chunksize and backend == "pandas" else ""
+    print(f"✅ {label}: {counts['rows_in']} -> {counts['rows_out']} (quitadas {dropped}{detail}) | {out_path}")
+    return counts
+
+_PURCHASE_TEXT = {"brand": "brand", "classification": "classification",
+                  "description": "text", "vendorname": "text"}
+_SOFT_TEXT = dict.fromkeys(("brand", "description", "classification", "vendorname"), "text")
+
+def transform_sales(interim: Path, processed: Path, columns: list[str] | None = None,
+                    export_csv: bool = False, chunksize: int | None = None, backend: str = "pandas"):
+    src = interim / "sales.parquet"
+    if not src.exists():
+        print(f"⚠️ No encontré {src} (salto ventas)")
+        return
+    kinds = {"brand": "brand", "classification": "classification", "description": "text"}
+    return transform_table(src, processed, "sales_clean", kinds, True, columns, export_csv, chunksize, backend)
 
-def transform_purchases(interim: Path, processed: Path):
-    src = interim / "purchases.csv"
+def transform_purchases(interim: Path, processed: Path, columns: list[str] | None = None,
+                        export_csv: bool = False, chunksize: int | None = None, backend: str = "pandas"):
+    src = interim / "purchases.parquet"
     if not src.exists():
         print(f"⚠️ No encontré {src} (salto compras)")
         return
-    df = pd.read_csv(src)
-    before = len(df)
-
-    df = normalize_columns(df)
-    for col in ("brand", "classification", "description", "vendorname"):
-        if col in df.columns:
-            if col == "brand":
-                df[col] = normalize_brand(df[col])
-            elif col == "classification":
-                df[col] = normalize_classification(df[col])
-            else:
-                df[col] = normalize_text(df[col])
-    if "size" in df.columns: df["size_ml"] = df["size"].apply(size_to_ml)
+    return transform_table(src, processed, "purchases_clean", _PURCHASE_TEXT, True,
+                           columns, export_csv, chunksize, backend)
 
-    df = coerce_numeric_by_name(df)
-    df = parse_possible_dates(df)
-    df = df.drop_duplicates()
-    dropped = before - len(df)
-
-    out_csv = write_outputs(df, processed, "purchases_clean")
-    print(f"✅ purchases: {before} -> {len(df)} (quitadas {dropped}) | {out_csv}")
-
-def transform_invoice_purchases(interim: Path, processed: Path, raw: Path):
-    # Estándar: data/interim/invoice_purchases.csv
+def transform_invoice_purchases(interim: Path, processed: Path, raw: Path,
+                                columns: list[str] | None = None, export_csv: bool = False,
+                                chunksize: int | None = None, backend: str = "pandas"):
+    # Estándar: data/interim/invoice_purchases.parquet
     src = ensure_interim_file(
         interim=interim,
         raw=raw,
         raw_name="InvoicePurchases12312016.csv",
-        interim_name="invoice_purchases.csv",
+        interim_name="invoice_purchases.parquet",
     )
     if not src:
         print("⚠️ Salto invoice_purchases (no hay fuente)")
         return
 
     print(f"→ Ejecutando transform_invoice_purchases. Fuente: {src}")
-    df = pd.read_csv(src)
-    before = len(df)
-
-    df = normalize_columns(df)
-    for col in ("brand", "classification", "description", "vendorname"):
-        if col in df.columns:
-            if col == "brand":
-                df[col] = normalize_brand(df[col])
-            elif col == "classification":
-                df[col] = normalize_classification(df[col])
-            else:
-                df[col] = normalize_text(df[col])
+    return transform_table(src, processed, "invoice_purchases_clean", _PURCHASE_TEXT, False,
+                           columns, export_csv, chunksize, backend)
 
-    df = coerce_numeric_by_name(df)
-    df = parse_possible_dates(df)
-    df = df.drop_duplicates()
-    dropped = before - len(df)
-
-    out_csv = write_outputs(df, processed, "invoice_purchases_clean")
-    print(f"✅ invoice_purchases: {before} -> {len(df)} (quitadas {dropped}) | {out_csv}")
-
-def transform_inventory(interim: Path, processed: Path, kind: str):
+def transform_inventory(interim: Path, processed: Path, kind: str,
+                        columns: list[str] | None = None, export_csv: bool = False,
+                        chunksize: int | None = None, backend: str = "pandas"):
     """
     kind: 'beg' o 'end'
-    Lee 'inventory_beg.csv' / 'inventory_end.csv'
+    Lee 'inventory_beg.parquet' / 'inventory_end.parquet'
     """
-    fname = f"inventory_{kind}.csv"
+    fname = f"inventory_{kind}.parquet"
     src = interim / fname
     if not src.exists():
         print(f"⚠️ No encontré {src} (salto inventario {kind})")
         return
-    df = pd.read_csv(src)
-    before = len(df)
-
-    df = normalize_columns(df)
     # textos suaves
-    for col in ("brand", "description", "classification", "vendorname"):
-        if col in df.columns:
-            df[col] = normalize_text(df[col])
+    return transform_table(src, processed, f"inventory_{kind}_clean", _SOFT_TEXT, False,
+                           columns, export_csv, chunksize, backend)
 
-    df = coerce_numeric_by_name(df)
-    df = parse_possible_dates(df)
-    df = df.drop_duplicates()
-    dropped = before - len(df)
-
-    out_csv = write_outputs(df, processed, f"inventory_{kind}_clean")
-    print(f"✅ inventory_{kind}: {before} -> {len(df)} (quitadas {dropped}) | {out_csv}")
-
-def transform_prices(interim: Path, processed: Path, raw: Path):
+def transform_prices(interim: Path, processed: Path, raw: Path,
+                     columns: list[str] | None = None, export_csv: bool = False,
+                     chunksize: int | None = None, backend: str = "pandas"):
     """
-    Precios de compra. Estandar: 'prices.csv' en interim.
-    Si no existe, intenta copiar de raw '2017PurchasePricesDec.csv'.
+    Precios de compra. Estandar: 'prices.parquet' en interim.
+    Si no existe, lo genera desde raw '2017PurchasePricesDec.csv'.
     """
     src = ensure_interim_file(
         interim=interim,
         raw=raw,
         raw_name="2017PurchasePricesDec.csv",
-        interim_name="prices.csv",
+        interim_name="prices.parquet",
     )
     if not src:
         print("⚠️ Salto prices (no hay fuente)")
         return
-
-    df = pd.read_csv(src)
-    before = len(df)
-
-    df = normalize_columns(df)
-    for col in ("brand", "description", "classification", "vendorname"):
-        if col in df.columns:
-            df[col] = normalize_text(df[col])
-
-    df = coerce_numeric_by_name(df)   # price, cost, unitprice, etc.
-    df = parse_possible_dates(df)
-    df = df.drop_duplicates()
-    dropped = before - len(df)
-
-    out_csv = write_outputs(df, processed, "prices_clean")
-    print(f"✅ prices: {before} -> {len(df)} (quitadas {dropped}) | {out_csv}")
+    return transform_table(src, processed, "prices_clean", _SOFT_TEXT, False, columns, export_csv,
+                           chunksize, backend)
 
 # ===================== main =====================
 
-def main():
-    root = Path(".")
-    raw = root / "data" / "raw"
-    interim = root / "data" / "interim"
-    processed = root / "data" / "processed"
-    processed.mkdir(parents=True, exist_ok=True)
-
-    transform_sales(interim, processed)
-    transform_purchases(interim, processed)
-    transform_invoice_purchases(interim, processed, raw)
-    transform_inventory(interim, processed, "beg")
-    transform_inventory(interim, processed, "end")
-    transform_prices(interim, processed, raw)
+def main(force: bool = False, dry_run: bool = False, export_csv: bool = False,
+         chunksize: int | None = None, run_log: Path | None = DEFAULT_LOG, profile: str | None = None,
+         backend: str = "pandas"):
+    """
+    Transforma todas las tablas de interim (en serie, mismo orden que el
+    pipeline). Las tablas cuyas entradas y código no cambiaron se saltan
+    según el manifiesto de data/processed. chunksize=N procesa por lotes;
+    backend='duckdb' limpia cada tabla con una consulta DuckDB.
+    """
+    from src import pipeline
+    pipeline.main(workers=1, chunksize=chunksize, force=force, dry_run=dry_run, export_csv=export_csv,
+                  only="transform_", run_log=run_log, profile=profile, backend=backend)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    from src.pipeline import add_run_args
+    parser = argparse.ArgumentParser(description="Transforma interim -> processed")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="filas por lote (modo streaming); sin valor procesa cada tabla completa")
+    parser.add_argument("--backend", choices=("pandas", "duckdb"), default="pandas",
+                        help="motor de limpieza: pandas o una consulta DuckDB por tabla")
+    add_run_args(parser)
+    args = parser.parse_args()
+    main(force=args.force, dry_run=args.dry_run, export_csv=args.csv, chunksize=args.chunksize,
+         run_log=args.run_log, profile=args.profile, backend=args.backend)